@@ -3,10 +3,22 @@
 
 import pandas as pd
 import numpy as np # 需要用到 concat
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, bindparam
 from urllib.parse import quote_plus
 import config 
 import os  # <--- 新增这个库，用来新建文件夹
+from correlation import update_correlation
+from fund_matrix import PriceMatrix
+from risk_metrics import risk_table, format_risk_line
+from forecast import ForecastService, format_forecast_line
+from estimate_accuracy import update_accuracy
+from seasonality import SeasonalityCache, upcoming_windows, seasonal_hints
+from planner import FreshnessPlanner
+from volume_price import DEFAULT_FUND_ETF_MAP, load_etf_bars, obv_table, format_obv_line
+from fund_meta import etf_map
+from watchlist import union_funds
+from overview import classify, update_overview
+from report_builder import ThumbnailCache, chart_payload, build_pages
 
 # --- 引入画图库 ---
 import matplotlib.pyplot as plt
@@ -164,46 +176,257 @@ class FundAnalyzer:
         
         return full_path
 
-    def run_analysis(self):
-        """指挥官：批量分析"""
+    def risk_report(self, codes):
+        """风险体检：全部基金的完整历史拼成一个矩阵，一次算完 (不填充，每只基金按自己的净值日期算收益)"""
+        try:
+            matrix = PriceMatrix.from_db(self.engine, codes, ffill=False)
+            return risk_table(matrix, level=getattr(config, 'VAR_LEVEL', 0.95))
+        except Exception as e:
+            print(f"⚠️ 风险指标计算失败: {e}")
+            return pd.DataFrame()
+
+    def forecast_report(self, codes, changed=None):
+        """ARIMA 批量预测 (多进程)，净值没更新的基金直接读上次的结果；失败不影响日报其它部分"""
+        try:
+            service = ForecastService(
+                self.engine,
+                lookback=getattr(config, 'FORECAST_LOOKBACK', 120),
+                workers=getattr(config, 'FORECAST_WORKERS', None),
+            )
+            if changed is None:
+                return service.run(codes)
+            refit = [c for c in codes if c in changed]
+            results = service.load_latest([c for c in codes if c not in changed])
+            if refit:
+                results.update(service.run(refit))
+            return results
+        except Exception as e:
+            print(f"⚠️ ARIMA 预测失败: {e}")
+            return {}
+
+    def volume_report(self, codes):
+        """量价背离：读库里的 ETF 日线算 OBV，返回 {基金代码: 一行文字}"""
+        try:
+            # 名录里自动配上的联接关系 + config.FUND_ETF_MAP 手动指定的
+            fund_etf = etf_map(self.engine, codes, getattr(config, 'FUND_ETF_MAP', DEFAULT_FUND_ETF_MAP))
+            if not fund_etf:
+                return {}
+            start = pd.Timestamp.today() - pd.Timedelta(days=365)
+            bars = load_etf_bars(self.engine, set(fund_etf.values()), start)
+            if bars.empty:
+                return {}
+            table = obv_table(bars, lookback=getattr(config, 'OBV_LOOKBACK', 20))
+        except Exception as e:
+            print(f"⚠️ 量价指标计算失败: {e}")
+            return {}
+        return {code: format_obv_line(symbol, table.loc[symbol])
+                for code, symbol in fund_etf.items() if symbol in table.index}
+
+    def seasonality_report(self, codes):
+        """日历效应：缓存里没更新的基金不重算；只挑下一个交易日落进的、历史上显著的窗口"""
+        try:
+            # 节前/节后/月末标签、下一个交易日、月末都按同一份交易日历算 (节假日不当交易日)
+            planner = FreshnessPlanner(self.engine)
+            table = SeasonalityCache(self.engine, planner.calendar).refresh(codes)
+        except Exception as e:
+            print(f"⚠️ 季节性统计失败: {e}")
+            return {}
+        next_day = planner.next_trading_day()
+        windows = upcoming_windows(next_day, planner.days_left_in_month(next_day))
+        min_t = getattr(config, 'SEASONAL_MIN_T', 2.0)
+        hints = {}
+        for code in codes:
+            lines = seasonal_hints(table, code, windows, min_t=min_t)
+            if lines:
+                hints[code] = lines
+        return hints
+
+    def overview_report(self, funds, changed=None):
+        """给看板总览页预先算好每只基金的一行 (存 fund_overview_snapshot)，失败不影响日报"""
+        try:
+            update_overview(self.engine, funds, changed, rsi_threshold=getattr(config, 'OVERVIEW_RSI', 37))
+        except Exception as e:
+            print(f"⚠️ 总览快照更新失败: {e}")
+
+    def accuracy_report(self, funds):
+        """
+        盘中估值体检：估值跟官方涨幅差太多的基金列出来 (实时端会自动给它们的信号打折)
+        返回 [(基金代码, 一行文字)]
+        """
+        try:
+            table = update_accuracy(
+                self.engine, list(funds),
+                min_days=getattr(config, 'ESTIMATE_MIN_DAYS', 10),
+                err_tolerance=getattr(config, 'ESTIMATE_ERR_TOLERANCE', 2.0),
+            )
+        except Exception as e:
+            print(f"⚠️ 估值体检失败: {e}")
+            return []
+
+        if table.empty:
+            return []
+        lines = []
+        for code, row in table.sort_values('reliability').iterrows():
+            if row['reliability'] >= 1:
+                continue
+            name = funds.get(code, code)
+            hit = "N/A" if pd.isna(row['signal_hit']) else f"{row['signal_hit']:.0%}"
+            lines.append((code, f"{name}: 偏差 {row['bias']:+.2f}% | MAE {row['mae']:.2f}% | "
+                         f"方向 {row['direction_hit']:.0%} | RSI信号 {hit} -> 可信度 {row['reliability']:.0%}"))
+        return lines
+
+    def correlation_report(self, funds):
+        """
+        持仓相关性：增量更新 N×N 相关矩阵并存快照 (所有清单的并集算一次)
+        返回越线的基金对 [(代码a, 代码b, 一行文字)]，每份清单只取两只都在自己清单里的
+        """
+        window = getattr(config, 'CORR_WINDOW', 60)
+        hedge = getattr(config, 'CORR_HEDGE', -0.3)
+        danger = getattr(config, 'CORR_DANGER', 0.8)
+        names = funds
+        if len(names) < 2:
+            return []
+
+        try:
+            rc = update_correlation(self.engine, list(names), window)
+        except Exception as e:
+            print(f"⚠️ 相关性计算失败: {e}")
+            return []
+
+        lines = []
+        for kind, a, b, value in rc.flag_pairs(hedge, danger):
+            tag = "⚠️ 高度同步" if kind == 'danger' else "🛡️ 天然对冲"
+            lines.append((a, b, f"{tag}: {names.get(a, a)} × {names.get(b, b)} = {value:.2f}"))
+        return lines
+
+    def _init_report_cache(self):
+        """内部方法：每只基金上次算好的指标/信号 (净值没变就直接复用)"""
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS fund_report_cache (
+                fund_code VARCHAR(10),
+                nav_date DATE,
+                price DOUBLE,
+                rsi DOUBLE,
+                signal_text VARCHAR(50),
+                predict_msg VARCHAR(100)
+            );
+            """))
+            conn.commit()
+
+    def _load_report_cache(self, codes):
+        if not codes:
+            return {}
+        stmt = text("SELECT * FROM fund_report_cache WHERE fund_code IN :codes")
+        stmt = stmt.bindparams(bindparam('codes', expanding=True))
+        with self.engine.connect() as conn:
+            df = pd.read_sql(stmt, conn, params={'codes': list(codes)})
+        return {row['fund_code']: row.to_dict() for _, row in df.iterrows()}
+
+    def _save_report_cache(self, rows):
+        """先删后存"""
+        if not rows:
+            return
+        with self.engine.connect() as conn:
+            stmt = text("DELETE FROM fund_report_cache WHERE fund_code IN :codes")
+            stmt = stmt.bindparams(bindparam('codes', expanding=True))
+            conn.execute(stmt, parameters={"codes": [r['fund_code'] for r in rows]})
+            conn.commit()
+        pd.DataFrame(rows).to_sql('fund_report_cache', self.engine, if_exists='append', index=False)
+
+    def analyze_fund(self, code, name, charts=None):
+        """
+        单只基金：取数 -> 算指标 -> 画图 -> 信号 + 倒推，返回可缓存的一行
+        charts: 传一个 dict 进来，顺手把画缩略图要用的数据放进去 (charts[code])
+        """
+        # 1. 取数
+        df = self.get_fund_data(code)
+        if df.empty:
+            print(f"⚠️ {name}: 没数据")
+            return None
+        
+        # 2. 算指标
+        df = self.calculate_indicators(df)
+        
+        # 3. 画图
+        self.plot_and_save(df, code, name)
+        if charts is not None:
+            charts[code] = chart_payload(df)
+        
+        # 4. 生成报告
+        latest = df.iloc[-1]
+        price = latest['nav_value']
+        rsi = latest['rsi']
+        lower = latest['lower']
+        
+        # 算距离
+        if pd.isna(lower): dist_to_low = 0
+        else: dist_to_low = (price - lower) / lower * 100
+
+        # 策略逻辑 (跟看板总览共用一套判定)
+        signal = classify(rsi, dist_to_low)
+        
+        # 🔮 调用预测算法 (倒推明日)
+        target_drop, target_price = self.predict_next_rsi_target(df, target_rsi=37)
+        predict_msg = "安全(跌停也不破37)"
+        if target_drop is not None:
+            predict_msg = f"跌 {target_drop:.1f}% (价位{target_price:.4f}) 破37"
+
+        return {
+            'fund_code': code,
+            'nav_date': latest['nav_date'].date(),
+            'price': float(price),
+            'rsi': float(rsi),
+            'signal_text': signal,
+            'predict_msg': predict_msg,
+        }
+
+    def analyze(self, funds=None, changed=None):
+        """
+        指挥官：批量分析 (多份自选清单时传并集，每只基金只算一次)
+        funds: {代码: 名称}，默认所有自选清单的并集
+        changed: 这次 ETL 真正有新数据的基金 (DataEngine.run_all 的 updated)；
+                 其余基金直接用上次缓存的指标和图，不查库、不重算、不重画。None = 全部重算
+        返回 dict: items {基金代码: 单条报告}、rows {基金代码: 指标行}、thumbs {基金代码: 缩略图路径}、
+                   corr [(a, b, 文字)]、accuracy [(代码, 文字)]
+                   用 compose_report 拼成纯文字日报，compose_pages 拼成带汇总表和缩略图的 HTML
+        """
         print("🧠 === 开始量化分析 ===")
-        results = [] # 这是一个列表，用来装所有的文字报告
+        funds = funds if funds is not None else union_funds()
+        items, rows, charts = {}, {}, {}
+        codes = list(funds)
         
-        for code, name in config.MY_FUNDS.items():
-            # 1. 取数
-            df = self.get_fund_data(code)
-            if df.empty:
-                print(f"⚠️ {name}: 没数据")
-                continue
-            
-            # 2. 算指标
-            df = self.calculate_indicators(df)
-            
-            # 3. 画图
-            self.plot_and_save(df, code, name)
-            
-            # 4. 生成报告
-            latest = df.iloc[-1]
-            price = latest['nav_value']
-            rsi = latest['rsi']
-            lower = latest['lower']
-            date_str = latest['nav_date'].strftime('%Y-%m-%d')
-            
-            # 算距离
-            if pd.isna(lower): dist_to_low = 0
-            else: dist_to_low = (price - lower) / lower * 100
-
-            # 策略逻辑
-            signal = "☁️ 观望"
-            if rsi < 37: signal = "💎 极度超卖"
-            elif dist_to_low < 0: signal = "🔥 跌破下轨"
-            elif rsi > 70: signal = "🚨 过热"
-            
-            # 🔮 调用预测算法 (倒推明日)
-            target_drop, target_price = self.predict_next_rsi_target(df, target_rsi=37)
-            predict_msg = "安全(跌停也不破37)"
-            if target_drop is not None:
-                predict_msg = f"跌 {target_drop:.1f}% (价位{target_price:.4f}) 破37"
+        # 0. 风险体检 (批量算，不放进循环里)
+        risk = self.risk_report(codes)
+        forecasts = self.forecast_report(codes, changed)
+        volume_lines = self.volume_report(codes)
+        seasonal = self.seasonality_report(codes)
+
+        self._init_report_cache()
+        cached = self._load_report_cache([c for c in codes if changed is not None and c not in changed])
+        if changed is not None:
+            print(f"⏭️ {len(cached)} 只基金净值无变化，复用上次的指标和图表")
+        fresh_rows = []
+        
+        for code, name in funds.items():
+            core = cached.get(code)
+            if core is None:
+                core = self.analyze_fund(code, name, charts)
+                if core is None:
+                    continue
+                fresh_rows.append(core)
+            rows[code] = core
+            price, rsi = core['price'], core['rsi']
+            signal, predict_msg = core['signal_text'], core['predict_msg']
+            date_str = pd.Timestamp(core['nav_date']).strftime('%Y-%m-%d')
+
+            risk_msg = format_risk_line(risk.loc[code]) if code in risk.index else "📉 风险: 数据不足"
+            if code in forecasts:
+                risk_msg += "\n" + format_forecast_line(forecasts[code], price)
+            if code in volume_lines:
+                risk_msg += "\n" + volume_lines[code]
+            for hint in seasonal.get(code, []):
+                risk_msg += "\n" + hint
 
             # 组装单条报告
             report_item = (
@@ -211,15 +434,36 @@ class FundAnalyzer:
                 f"日期: {date_str} | RSI: {rsi:.1f}\n"
                 f"信号: {signal}\n"
                 f"🔮 {predict_msg}\n"
+                f"{risk_msg}\n"
                 f"----------------"
             )
             print(report_item)
+            items[code] = report_item
             
-            # 【关键一步】把这一条塞进列表里！之前就是漏了逻辑或者没塞进去
-            results.append(report_item)
-            
+        self._save_report_cache(fresh_rows)
+        # 看板总览页的快照 (只重算有新净值的基金)
+        self.overview_report(funds, changed)
+
+        # 缩略图：重算过的基金画新图 (多进程、数据没变的直接复用)，其余沿用上次的图
+        try:
+            thumbs = ThumbnailCache(fmt=getattr(config, 'THUMB_FORMAT', 'png')).render(charts, rows)
+        except Exception as e:
+            print(f"⚠️ 缩略图生成失败，日报只发文字: {e}")
+            thumbs = {}
+
+        # 5. 持仓相关性 (同涨同跌 = 风险集中，负相关 = 天然对冲)
+        # 6. 盘中估值体检 (估值 vs 官方净值)
+        result = {'items': items, 'rows': rows, 'thumbs': thumbs,
+                  'corr': self.correlation_report(funds), 'accuracy': self.accuracy_report(funds)}
         print("🏁 === 分析结束 ===")
-        
+        return result
+
+    @staticmethod
+    def compose_report(result, codes):
+        """从 analyze 的结果里挑出一份清单的基金，拼成日报文字"""
+        codes = list(codes)
+        results = [result['items'][c] for c in codes if c in result['items']] + FundAnalyzer._sections(result, codes)
+
         # 如果列表是空的，说明出问题了，手动加一条报错
         if not results:
             return "⚠️ 分析结果为空，请检查数据库数据！"
@@ -227,6 +471,42 @@ class FundAnalyzer:
         # 把列表拼成字符串返回
         return "\n".join(results)
 
+    @staticmethod
+    def _sections(result, codes):
+        """日报末尾的组合级段落：持仓相关性、估值可信度"""
+        wanted = set(codes)
+        results = []
+        corr_lines = [line for a, b, line in result['corr'] if a in wanted and b in wanted]
+        if corr_lines:
+            results.append(f"🔗 持仓相关性 (近{getattr(config, 'CORR_WINDOW', 60)}日)\n" + "\n".join(corr_lines) + "\n----------------")
+
+        acc_lines = [line for code, line in result['accuracy'] if code in wanted]
+        if acc_lines:
+            results.append("🎯 估值可信度 (盘中信号会打折)\n" + "\n".join(acc_lines) + "\n----------------")
+        return results
+
+    @staticmethod
+    def compose_pages(result, funds, note=""):
+        """
+        一份清单的 HTML 日报：汇总表 (按信号轻重排序) + 每只基金的文字和缩略图
+        按 PUSH_MAX_CHARS 控制每页长度，最多 REPORT_MAX_PAGES 页，返回页列表
+        """
+        items = {c: result['items'][c] for c in funds if c in result['items']}
+        if not items:
+            return ["⚠️ 分析结果为空，请检查数据库数据！" + ("<br>" + note.replace('\n', '<br>') if note else "")]
+        return build_pages(
+            result['rows'], items, funds, result.get('thumbs'),
+            extras=FundAnalyzer._sections(result, list(funds)),
+            max_chars=getattr(config, 'PUSH_MAX_CHARS', 15000) - 500,  # 标题、JSON 包装留点余量
+            max_pages=getattr(config, 'REPORT_MAX_PAGES', 3),
+            head_note=note,
+        )
+
+    def run_analysis(self, changed=None, funds=None):
+        """单份清单的日报 (默认所有自选的并集)：analyze + compose_report"""
+        funds = funds if funds is not None else union_funds()
+        return self.compose_report(self.analyze(funds, changed), funds)
+
 # --- 测试代码 ---
 if __name__ == "__main__":
     brain = FundAnalyzer()
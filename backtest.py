@@ -6,17 +6,28 @@ import matplotlib.pyplot as plt
 from sqlalchemy import create_engine
 from urllib.parse import quote_plus
 import config 
+from fund_matrix import PriceMatrix
+from risk_metrics import risk_table, format_risk_line
+from strategy_lang import compile_strategy, run_strategy, run_variants, equity_curves
+from walk_forward import WalkForward, summarize
+from monte_carlo import MonteCarlo, confidence_table, beat_probability, actual_rank
+
+# 默认策略：经典 RSI 30/70 (可以换成任意表达式，见 strategy_lang.py)
+DEFAULT_STRATEGY = "buy: rsi(14) < 30; sell: rsi(14) > 70"
 
 # 中文设置
 plt.rcParams['font.sans-serif'] = ['SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
 class Backtest:
-    def __init__(self, fund_code, initial_cash=1000):
+    def __init__(self, fund_code, initial_cash=1000, strategy=DEFAULT_STRATEGY):
         """
         fund_code: 要回测的基金
         initial_cash: 初始本金 (比如 1000元)
+        strategy: 策略表达式，例如 "buy: close > ma(20) and rsi(14) < 45; sell: rsi(14) > 70"
         """
+        self.strategy_text = strategy
+        self.strategy = compile_strategy(strategy)  # 只编译一次
         self.code = fund_code
         self.cash = initial_cash
         self.share = 0 # 持有份额
@@ -29,67 +40,43 @@ class Backtest:
         self.engine = create_engine(conn_str)
 
     def prepare_data(self):
-        """准备数据：算出 RSI"""
+        """准备数据：按日期排好的净值 (指标由策略表达式自己算)"""
         print(f"📊 正在准备 {self.code} 的历史数据...")
         sql = f"SELECT nav_date, nav_value FROM fund_nav_history WHERE fund_code = '{self.code}' ORDER BY nav_date ASC"
         df = pd.read_sql(sql, self.engine)
-        
-        # 算 RSI (直接复用之前的逻辑)
-        df['change'] = df['nav_value'].diff()
-        df['gain'] = df['change'].clip(lower=0)
-        df['loss'] = df['change'].clip(upper=0).abs()
-        avg_gain = df['gain'].ewm(alpha=1/14, adjust=False).mean()
-        avg_loss = df['loss'].ewm(alpha=1/14, adjust=False).mean()
-        rs = avg_gain / avg_loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        return df.dropna()
+        df['nav_date'] = pd.to_datetime(df['nav_date'])
+        df['nav_value'] = pd.to_numeric(df['nav_value'])
+        return df.dropna().reset_index(drop=True)
 
     def run(self):
         """开始模拟交易"""
         df = self.prepare_data()
         
-        # 记录每一天的总资产
-        portfolio_values = []
-        buy_signals = [] # 记录买点
-        sell_signals = [] # 记录卖点
+        print(f"🎮 回测开始！策略: {self.strategy_text}")
         
-        print("🎮 回测开始！模拟交易中...")
+        # 整段历史一次向量化算完：信号 -> 持仓 -> 资金曲线
+        prices = df['nav_value'].to_numpy(dtype=float)
+        result = run_strategy(self.strategy, prices)
+        # 跟原来一样丢掉第一行 (没有涨跌，RSI 是 NaN)：指标用整段算，策略和死拿都从第二个净值起算
+        df = df.iloc[1:].reset_index(drop=True)
+        position = result['position'][:, 1:]
+        df['position'] = position[0]
+        df['total_value'] = self.initial_cash * equity_curves(prices[1:], position)[0]
         
-        # 遍历每一天
-        for i in range(len(df)):
-            today = df.iloc[i]
-            price = today['nav_value']
-            rsi = today['rsi']
-            date = today['nav_date']
-            
-            # --- 策略逻辑 (RSI) ---
-            
-            # 买入信号：RSI < 30 且 还有钱
-            if rsi < 30 and self.cash > 0:
-                # 全仓买入 (为了简化计算，假设每次都梭哈)
-                # 实际上你可以写成 "买300元"
-                buy_share = self.cash / price
-                self.share += buy_share
-                self.cash = 0
-                buy_signals.append((date, price))
-                # print(f"💎 {date} 买入: 价格 {price:.4f}, RSI {rsi:.2f}")
-                
-            # 卖出信号：RSI > 70 且 有持仓
-            elif rsi > 70 and self.share > 0:
-                # 全仓卖出
-                sell_amount = self.share * price
-                self.cash += sell_amount
-                self.share = 0
-                sell_signals.append((date, price))
-                # print(f"🔥 {date} 卖出: 价格 {price:.4f}, RSI {rsi:.2f}")
-            
-            # 计算当天总资产 (现金 + 持仓市值)
-            total_value = self.cash + (self.share * price)
-            portfolio_values.append(total_value)
+        # 持仓从 0 变 1 = 买点，从 1 变 0 = 卖点
+        flips = df['position'].diff().fillna(df['position'])
+        buy_signals = list(zip(df.loc[flips > 0, 'nav_date'], df.loc[flips > 0, 'nav_value']))
+        sell_signals = list(zip(df.loc[flips < 0, 'nav_date'], df.loc[flips < 0, 'nav_value']))
+        
+        # 期末状态 (满仓 = 全是份额，空仓 = 全是现金)
+        last = df.iloc[-1]
+        if last['position'] > 0:
+            self.cash, self.share = 0, last['total_value'] / last['nav_value']
+        else:
+            self.cash, self.share = last['total_value'], 0
+        print(f"🔁 共买入 {len(buy_signals)} 次，卖出 {len(sell_signals)} 次")
             
         # --- 结果结算 ---
-        df['total_value'] = portfolio_values
         final_value = df.iloc[-1]['total_value']
         profit = (final_value - self.initial_cash) / self.initial_cash * 100
         
@@ -105,6 +92,15 @@ class Backtest:
         print(f"🤖 策略收益率: {profit:.2f}%")
         print(f"🐢 死拿收益率: {base_profit:.2f}%")
         
+        # 风险体检：收益高不高之外，还要看回撤和尾部风险
+        curves = PriceMatrix(
+            ['strategy', 'hold'], df['nav_date'],
+            [df['total_value'].to_numpy(dtype=float), df['nav_value'].to_numpy(dtype=float)]
+        )
+        risk = risk_table(curves)
+        print("🤖 策略风险:\n" + format_risk_line(risk.loc['strategy']))
+        print("🐢 死拿风险:\n" + format_risk_line(risk.loc['hold']))
+        
         if profit > base_profit:
             print("✅ 结论：瞎折腾比死拿强！策略有效！")
         else:
@@ -122,13 +118,85 @@ class Backtest:
             for date, price in buy_signals:
                 plt.axvline(x=date, color='gray', linestyle=':', alpha=0.5)
         
-        plt.title(f'RSI 策略回测资金曲线 (最终: {final_value:.0f})', fontsize=15)
+        plt.title(f'策略回测资金曲线 (最终: {final_value:.0f})', fontsize=15)
         plt.legend()
         plt.grid(True)
         plt.show()
 
+    def compare(self, variants):
+        """
+        一次比较多个策略变体：{变体名: 表达式}
+        公共指标只算一次，不写循环、不改代码
+        """
+        df = self.prepare_data()
+        prices = df['nav_value'].to_numpy(dtype=float)
+        curves = run_variants(variants, prices)
+        
+        hold = (prices[-1] - prices[0]) / prices[0] * 100
+        table = pd.DataFrame({
+            '策略': list(variants.values()),
+            '收益率%': [(c[0, -1] - 1) * 100 for c in curves.values()],
+        }, index=list(variants.keys()))
+        table['跑赢死拿%'] = table['收益率%'] - hold
+        table = table.sort_values('收益率%', ascending=False)
+        
+        print(f"🏁 {self.code} 策略变体对比 (死拿: {hold:.2f}%)")
+        print(table)
+        return table
+
+    def walk_forward(self, **kwargs):
+        """
+        样本外验证：滚动切 [训练|测试] 窗口，训练窗挑参数、测试窗验货 (参数见 walk_forward.WalkForward)
+        比 run() 的结论可信：每一段收益都是用 "当时还不知道" 的数据挣的
+        """
+        df = self.prepare_data()
+        results = WalkForward(**kwargs).run({self.code: df})
+        if self.code not in results:
+            print("⚠️ 历史太短，切不出完整的训练+测试窗口")
+            return None
+        r = results[self.code]
+        print(r['folds'].round(3).to_string())
+        print(summarize(results).round(2).to_string())
+        oos = (r['oos_equity'].iloc[-1] - 1) * 100
+        hold = (r['hold_equity'].iloc[-1] - 1) * 100
+        if oos > hold:
+            print(f"✅ 样本外 {oos:.2f}% > 同期死拿 {hold:.2f}%：参数优化经得起检验")
+        else:
+            print(f"❌ 样本外 {oos:.2f}% <= 同期死拿 {hold:.2f}%：样本内的好成绩多半是过拟合")
+        return r
+
+    def monte_carlo(self, n_paths=10000, years=None, **kwargs):
+        """
+        运气检验：历史收益重抽样出 n_paths 条平行历史，看策略跑赢死拿的概率和收益/回撤的置信区间
+        其余参数见 monte_carlo.MonteCarlo (method / block / chunk / seed)
+        """
+        df = self.prepare_data()
+        prices = df['nav_value'].to_numpy(dtype=float)
+        span = f"{years} 年" if years else "跟历史一样长"
+        print(f"🎲 蒙特卡洛: {n_paths} 条路径，每条{span}，策略: {self.strategy_text}")
+        results = MonteCarlo(self.strategy, n_paths=n_paths, years=years, **kwargs).run(prices)
+        print(confidence_table(results).round(2).to_string())
+
+        # 真实历史在模拟分布里的位置
+        real = run_strategy(self.strategy, prices)['equity'][0, -1] - prices[-1] / prices[0]
+        prob = beat_probability(results)
+        print(f"🎯 跑赢死拿的概率: {prob:.0%} | 真实超额 {real * 100:+.2f}% 排在模拟的 {actual_rank(results, real):.0%} 分位")
+        if prob >= 0.6:
+            print("✅ 大多数平行历史里都跑赢了，策略不全靠运气")
+        else:
+            print("❌ 换一种历史就未必跑得赢，真实的好成绩可能只是运气")
+        return results
+
 # --- 运行 ---
 if __name__ == "__main__":
     # 回测一下国泰证券
     bot = Backtest('012363', initial_cash=1000)
-    bot.run()
\ No newline at end of file
+    bot.run()
+    
+    # 顺手比一比几个变体 (改字符串就行，不用写代码)
+    bot.compare({
+        'RSI 30/70': DEFAULT_STRATEGY,
+        '均线+RSI': "buy: close > ma(20) and rsi(14) < 45; sell: rsi(14) > 70",
+        '金叉死叉': "buy: cross_up(ma(5), ma(20)); sell: cross_down(ma(5), ma(20))",
+        '布林破轨': "buy: close < boll_low(20, 2); sell: close > boll_up(20, 2)",
+    })
\ No newline at end of file
@@ -0,0 +1,160 @@
+# compare.py
+# --- 多基金对比引擎：一组基金对齐成一张 日期×基金 价格表，任意窗口归一化 = 切片 + 除法 ---
+# practice_lab 里的 compare_new / global_radar 每跑一次都把每只基金重新下载、各自 tail(30)、各自除以首日，
+# 再靠 DataFrame 按索引隐式拼起来：QDII 和 A 股交易日不一样，拼出来的行有的是 NaN、有的错位。
+# 这里一组基金只查一次库、按明确的日历规则对齐一次，之后换窗口只是取一段视图再除以起点；
+# 结果按 (基金组合, 窗口) 缓存，看板里拖滑块、加减基金都是即时的。
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from fund_matrix import load_nav_long
+
+CALENDARS = ('union', 'intersection', 'anchor')
+
+
+class AlignedPrices:
+    """
+    对齐后的价格表：values[t, i] = 第 t 个日期、第 i 只基金的净值
+    filled[t, i] = True 表示这个点是沿用前一天的 (那天这只基金没发净值)
+    """
+
+    def __init__(self, dates, codes, values, filled):
+        self.dates = pd.DatetimeIndex(dates)
+        self.codes = list(codes)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.filled = np.asarray(filled, dtype=bool)
+        # first_valid[t, i]: 从第 t 行往后，第 i 只基金第一个有值的行号 (没有 = 行数)
+        # 窗口起点那天某只基金还没上市/没数据时，用它找归一化的基准，不用逐行扫
+        n = len(self.dates)
+        idx = np.where(np.isnan(self.values), n, np.arange(n)[:, None])
+        self.first_valid = np.minimum.accumulate(idx[::-1], axis=0)[::-1]
+
+    @classmethod
+    def from_long(cls, df, codes=None, calendar='union', anchor=None, max_gap=5):
+        """
+        长表 (load_nav_long) -> 对齐价格表
+        calendar:
+          'union'        任何一只基金有净值的日子都保留 (A 股 + QDII 混看时不丢日子)
+          'intersection' 所有基金都有净值的日子才保留 (完全不填充)
+          'anchor'       用 anchor 这只基金的交易日 (比如以 A 股持仓为准)
+        max_gap: 连续缺几天以内用前一个净值补 (ffill)，缺得更久的留 NaN；第一个净值之前永远不补
+        """
+        if calendar not in CALENDARS:
+            raise ValueError(f"日历只能是 {CALENDARS}: {calendar}")
+        wide = df.pivot_table(index='nav_date', columns='fund_code', values='nav_value', aggfunc='last').sort_index()
+        codes = [c for c in (codes or wide.columns) if c in wide.columns]
+        wide = wide[codes]
+        raw = wide.notna()
+
+        if calendar == 'intersection':
+            wide = wide[raw.all(axis=1)]
+        elif calendar == 'anchor':
+            if anchor not in wide.columns:
+                raise ValueError(f"基准基金没有数据: {anchor}")
+            # 先在全部日子上补，再取基准基金的交易日：基准那天别的基金没发净值，也能用它最近的值
+            filled = wide.ffill(limit=max_gap)
+            keep = raw[anchor].to_numpy()
+            return cls(wide.index[keep], codes, filled.to_numpy()[keep], (~raw & filled.notna()).to_numpy()[keep])
+
+        filled = wide.ffill(limit=max_gap)
+        return cls(wide.index, codes, filled.to_numpy(), (~raw.loc[wide.index] & filled.notna()).to_numpy())
+
+    @classmethod
+    def from_db(cls, engine, codes, start_date=None, **kwargs):
+        return cls.from_long(load_nav_long(engine, codes, start_date), codes, **kwargs)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def window_start(self, window):
+        """window: 最近多少行 (int) 或起始日期；返回起点行号"""
+        if window is None:
+            return 0
+        if isinstance(window, (int, np.integer)):
+            return max(len(self.dates) - int(window), 0)
+        return int(self.dates.searchsorted(pd.Timestamp(window)))
+
+    def rebase(self, window=None):
+        """
+        从窗口起点归一化到 1.0：一段视图切片 + 一次广播除法
+        起点那天没数据的基金，以它在窗口内第一个净值为基准，之前保持 NaN
+        返回 日期×基金 的 DataFrame
+        """
+        start = self.window_start(window)
+        block = self.values[start:]
+        if not len(block):
+            return pd.DataFrame(columns=self.codes)
+        first = self.first_valid[start]
+        base = np.full(len(self.codes), np.nan)
+        ok = first < len(self.dates)
+        base[ok] = self.values[first[ok], np.flatnonzero(ok)]
+        return pd.DataFrame(block / base, index=self.dates[start:], columns=self.codes)
+
+    def summary(self, window=None):
+        """窗口内每只基金的区间收益、最大回撤、补值天数，按收益从高到低"""
+        rebased = self.rebase(window)
+        start = self.window_start(window)
+        curve = rebased.to_numpy()
+        with np.errstate(invalid='ignore'):
+            peak = np.fmax.accumulate(curve, axis=0)
+            dd = np.fmin.reduce(curve / peak - 1, axis=0) if len(curve) else np.full(len(self.codes), np.nan)
+        last = rebased.ffill().iloc[-1] if len(rebased) else pd.Series(np.nan, index=self.codes)
+        table = pd.DataFrame({
+            'return_pct': (last.to_numpy() - 1) * 100,
+            'max_dd_pct': dd * 100,
+            'filled_days': self.filled[start:].sum(axis=0),
+        }, index=self.codes)
+        return table.sort_values('return_pct', ascending=False)
+
+
+class ComparisonCache:
+    """
+    对比结果缓存 (LRU)
+      对齐表按 (基金组合, 日历规则) 缓存：同一组基金换窗口不再查库
+      归一化结果按 (基金组合, 日历规则, 窗口) 缓存：来回拖滑块直接命中
+    """
+
+    def __init__(self, engine, maxsize=32):
+        self.engine = engine
+        self.maxsize = maxsize
+        self._aligned = OrderedDict()
+        self._rebased = OrderedDict()
+        self.hits = self.misses = 0
+
+    def _get(self, store, key, build):
+        if key in store:
+            store.move_to_end(key)
+            self.hits += 1
+            return store[key]
+        self.misses += 1
+        value = store[key] = build()
+        if len(store) > self.maxsize:
+            store.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _key(codes, calendar, anchor, max_gap):
+        return tuple(sorted(set(codes))), calendar, anchor if calendar == 'anchor' else None, max_gap
+
+    def aligned(self, codes, calendar='union', anchor=None, max_gap=5):
+        key = self._key(codes, calendar, anchor, max_gap)
+        return self._get(self._aligned, key, lambda: AlignedPrices.from_db(
+            self.engine, list(key[0]), calendar=calendar, anchor=anchor, max_gap=max_gap))
+
+    def rebased(self, codes, window=None, calendar='union', anchor=None, max_gap=5):
+        """返回 (归一化曲线 DataFrame, 汇总表)，列顺序跟传进来的 codes 一致"""
+        def build():
+            aligned = self.aligned(codes, calendar, anchor, max_gap)
+            return aligned.rebase(window), aligned.summary(window)
+
+        key = self._key(codes, calendar, anchor, max_gap) + (window,)
+        curves, table = self._get(self._rebased, key, build)
+        order = [c for c in codes if c in curves.columns]
+        return curves[order], table
+
+    def clear(self):
+        self._aligned.clear()
+        self._rebased.clear()
@@ -0,0 +1,235 @@
+# correlation.py
+# --- 相关性雷达：维护全体持仓的 N×N 滚动相关矩阵 ---
+# 每来一天新收益，只做一次外积加减 (O(N²))，不再把整个窗口重算一遍。
+# 没发净值的日子是缺失，不是 0 收益：每对基金只用两边都有数的日子 (成对有效)。
+
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from fund_matrix import PriceMatrix, load_nav_long
+
+STATE_PATH = os.path.join("data", "corr_state.npz")
+
+
+STATE_VERSION = 2  # 2: 缺失值不再当 0 收益；老状态文件一律重新灌满
+MIN_PAIR_DAYS = 10  # 两只基金在窗口里共同有收益的天数少于这个，相关系数记 NaN
+
+
+class RollingCorrelation:
+    def __init__(self, codes, window=60):
+        """
+        codes: 基金代码列表 (矩阵的行列顺序)
+        window: 滚动窗口 (交易日)
+        缺失值 (那天没发净值) 按 "成对有效" 处理：每一对基金只用两边都有收益的日子，
+        所以每个累加量都是 N×N 的 (第 i 行 j 列 = 只数 i、j 都有数的那些天)
+        """
+        self.codes = list(codes)
+        self.window = window
+        n = len(self.codes)
+        self.buf = np.full((window, n), np.nan)  # 环形缓冲区，存窗口内每天的收益向量 (NaN = 没数据)
+        self.pos = 0                       # 下一个写入位置
+        self.count = 0                     # 窗口里已有多少天
+        self.n_xy = np.zeros((n, n))       # Σ m_i·m_j        (共同有数的天数)
+        self.sum_x = np.zeros((n, n))      # Σ x_i·m_i·m_j
+        self.sum_xx = np.zeros((n, n))     # Σ x_i²·m_i·m_j
+        self.sum_xy = np.zeros((n, n))     # Σ x_i·x_j·m_i·m_j
+        self.last_date = None
+        self._since_rebuild = 0
+
+    def _accumulate(self, x, sign):
+        m = ~np.isnan(x)
+        xm = np.where(m, x, 0.0)
+        mf = m.astype(np.float64)
+        self.n_xy += sign * np.outer(mf, mf)
+        self.sum_x += sign * np.outer(xm, mf)
+        self.sum_xx += sign * np.outer(xm * xm, mf)
+        self.sum_xy += sign * np.outer(xm, xm)
+
+    def update(self, returns, date=None):
+        """
+        喂入一天的收益向量 (长度 N)，NaN = 这只基金那天没有收益 (没发净值)，不参与任何一对的统计
+        """
+        x = np.asarray(returns, dtype=np.float64)
+        if self.count == self.window:
+            self._accumulate(self.buf[self.pos], -1)
+        else:
+            self.count += 1
+        self.buf[self.pos] = x
+        self._accumulate(x, 1)
+        self.pos = (self.pos + 1) % self.window
+        self.last_date = date
+
+        # 加加减减久了会有浮点误差，每滚完一整个窗口就用缓冲区校准一次
+        self._since_rebuild += 1
+        if self._since_rebuild >= self.window:
+            self._rebuild()
+
+    def _rebuild(self):
+        data = self.buf if self.count == self.window else self.buf[:self.count]
+        m = ~np.isnan(data)
+        xm = np.where(m, data, 0.0)
+        mf = m.astype(np.float64)
+        self.n_xy = mf.T @ mf
+        self.sum_x = xm.T @ mf
+        self.sum_xx = (xm * xm).T @ mf
+        self.sum_xy = xm.T @ xm
+        self._since_rebuild = 0
+
+    def seed(self, returns, dates=None):
+        """
+        用历史收益矩阵 (N × T) 灌满窗口，只取最后 window 天
+        """
+        returns = np.asarray(returns, dtype=np.float64)[:, -self.window:]
+        tail_dates = list(dates[-returns.shape[1]:]) if dates is not None else [None] * returns.shape[1]
+        for j in range(returns.shape[1]):
+            self.update(returns[:, j], tail_dates[j])
+
+    def covariance(self):
+        """成对有效的样本协方差矩阵 (共同天数不足 2 的为 NaN)"""
+        n = self.n_xy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self.sum_xy - self.sum_x * self.sum_x.T / n) / (n - 1)
+        return np.where(n >= 2, cov, np.nan)
+
+    def correlation(self, min_days=MIN_PAIR_DAYS):
+        """相关系数矩阵：共同天数不足 min_days、或某只基金在这些天里完全没波动 -> NaN"""
+        n = self.n_xy
+        sx, sxx = self.sum_x, self.sum_xx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            num = n * self.sum_xy - sx * sx.T
+            den = np.sqrt(np.clip(n * sxx - sx * sx, 0, None) * np.clip(n * sxx.T - sx.T * sx.T, 0, None))
+            corr = num / den
+        corr = np.where(n >= max(min_days, 2), np.clip(corr, -1, 1), np.nan)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def to_frame(self):
+        return pd.DataFrame(self.correlation(), index=self.codes, columns=self.codes)
+
+    def flag_pairs(self, hedge=-0.3, danger=0.8):
+        """
+        找出越线的基金对 (只看上三角，不重复；NaN 的对不算)
+        corr >= danger: 同涨同跌，风险集中
+        corr <= hedge : 互为对冲
+        """
+        corr = self.correlation()
+        iu, ju = np.triu_indices(len(self.codes), k=1)
+        vals = corr[iu, ju]
+        flags = []
+        for kind, mask in (('danger', vals >= danger), ('hedge', vals <= hedge)):
+            for i, j, v in zip(iu[mask], ju[mask], vals[mask]):
+                flags.append((kind, self.codes[i], self.codes[j], float(v)))
+        return flags
+
+    # --- 状态持久化 (本地文件，下次只需补新的几天) ---
+
+    def save_state(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(
+            path, codes=np.array(self.codes), window=self.window, buf=self.buf,
+            pos=self.pos, count=self.count, last_date=str(self.last_date or ''), version=STATE_VERSION,
+        )
+
+    @classmethod
+    def load_state(cls, path=STATE_PATH):
+        if not os.path.exists(path):
+            return None
+        z = np.load(path)
+        if 'version' not in z.files or int(z['version']) != STATE_VERSION:
+            return None
+        obj = cls(z['codes'].tolist(), int(z['window']))
+        obj.buf = z['buf']
+        obj.pos = int(z['pos'])
+        obj.count = int(z['count'])
+        obj.last_date = pd.Timestamp(str(z['last_date'])) if str(z['last_date']) else None
+        obj._rebuild()
+        return obj
+
+
+def complete_through(matrix, max_lag=5):
+    """
+    所有基金都已发布净值的最后一天 (= 各基金最后一个净值日期里最早的那个)
+    晚发布的基金 (QDII T+1/T+2) 还没到的日子先不喂：等它的真实净值到了再一起喂，不会把 "还没发" 当成 "没涨跌"
+    超过 max_lag 个交易日都没更新的基金 (停牌/清盘) 不拖住大家
+    """
+    has = ~np.isnan(matrix.values)
+    if not has.any():
+        return None
+    last = np.where(has.any(axis=1), has.shape[1] - 1 - np.argmax(has[:, ::-1], axis=1), -1)
+    newest = last.max()
+    active = last[(last >= 0) & (last >= newest - max_lag)]
+    return matrix.dates[active.min()]
+
+
+def save_snapshot(engine, corr_df, calc_date):
+    """把当天的相关矩阵存进数据库 (长表)，看板和日报直接读，不用重算"""
+    with engine.connect() as conn:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fund_corr_matrix (
+            calc_date DATE,
+            fund_a VARCHAR(10),
+            fund_b VARCHAR(10),
+            corr_value DECIMAL(6, 4)
+        );
+        """))
+        conn.execute(text("DELETE FROM fund_corr_matrix WHERE calc_date = :d"), parameters={"d": calc_date})
+        conn.commit()
+
+    long_df = corr_df.stack().reset_index()
+    long_df.columns = ['fund_a', 'fund_b', 'corr_value']
+    long_df = long_df.dropna()
+    long_df.insert(0, 'calc_date', calc_date)
+    long_df.to_sql('fund_corr_matrix', engine, if_exists='append', index=False)
+
+
+def load_snapshot(engine):
+    """读取最新一天的相关矩阵 (宽表)"""
+    sql = text("""
+    SELECT fund_a, fund_b, corr_value FROM fund_corr_matrix
+    WHERE calc_date = (SELECT MAX(calc_date) FROM fund_corr_matrix)
+    """)
+    df = pd.read_sql(sql, engine)
+    if df.empty:
+        return df
+    df['corr_value'] = pd.to_numeric(df['corr_value'])
+    return df.pivot(index='fund_a', columns='fund_b', values='corr_value')
+
+
+def update_correlation(engine, codes, window=60, path=STATE_PATH):
+    """
+    指挥官：加载本地状态 -> 只补新的、所有基金都已发布的交易日 -> 存快照
+    收益按每只基金自己的净值日期算 (没发净值的日子是 NaN，不是 0)
+    状态对不上 (换了持仓/窗口/文件丢了/老版本) 就从数据库重新灌满一次
+    """
+    codes = sorted(codes)
+    # 多取一些自然日，保证能凑够 window 个交易日
+    start = pd.Timestamp.today() - pd.Timedelta(days=window * 2 + 30)
+    matrix = PriceMatrix.from_long(load_nav_long(engine, codes, start_date=start), ffill=False).reindex(codes)
+    rets = matrix.own_returns()
+    ret_dates = matrix.dates[1:]
+    frontier = complete_through(matrix)
+    if frontier is None:
+        return RollingCorrelation(codes, window)
+    ready = np.flatnonzero(ret_dates <= frontier)
+    rets, ret_dates = rets[:, ready], ret_dates[ready]
+
+    rc = RollingCorrelation.load_state(path)
+    if rc is None or rc.codes != codes or rc.window != window or rc.last_date is None:
+        rc = RollingCorrelation(codes, window)
+        rc.seed(rets, ret_dates)
+    else:
+        new = np.flatnonzero(ret_dates > rc.last_date)
+        if len(new) > window:
+            rc = RollingCorrelation(codes, window)
+            rc.seed(rets, ret_dates)
+        else:
+            for j in new:
+                rc.update(rets[:, j], ret_dates[j])
+
+    rc.save_state(path)
+    if rc.last_date is not None:
+        save_snapshot(engine, rc.to_frame(), pd.Timestamp(rc.last_date).date())
+    return rc
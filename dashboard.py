@@ -6,13 +6,48 @@ import plotly.graph_objects as go # 交互式画图库
 from datetime import datetime
 from sqlalchemy import create_engine
 from config import DB_URL
+from correlation import load_snapshot
+from estimate_store import get_store, load_day_db
+from fund_meta import FundIndex, load_meta_db
+from overview import load_overview
+from compare import ComparisonCache, CALENDARS
+from watchlist import union_funds
 
 # --- 1. 网页基础设置 ---
 st.set_page_config(page_title='符清华的量化看板',layout='wide')
 # 侧边栏 (Sidebar)
 st.sidebar.title = ('🎛️ 基金指挥舱')
-fund_code = st.sidebar.text_input('输入基金代码',value = '012363')
-fund_name = st.sidebar.text_input('基金名称 (备注)',value='国泰证券')
+PAGE_OVERVIEW, PAGE_FUND, PAGE_COMPARE = '📋 自选总览', '📈 单只基金', '🆚 多基金对比'
+page = st.sidebar.radio('页面', [PAGE_FUND, PAGE_OVERVIEW, PAGE_COMPARE], key='page')
+# 侧边栏输入框的默认值 (总览页点某一行会改写它们，跳到单只基金页)
+st.session_state.setdefault('fund_query', '012363')
+st.session_state.setdefault('manual_code', '012363')
+st.session_state.setdefault('manual_name', '国泰证券')
+# 基金名录的索引建一次全程复用 (晚间任务每周刷新 fund_meta 表)
+@st.cache_resource(ttl=86400)
+def get_fund_index():
+    try:
+        meta = load_meta_db(create_engine(DB_URL))
+        return FundIndex(meta) if not meta.empty else None
+    except Exception:
+        return None
+fund_index = get_fund_index()
+if fund_index is not None:
+    # 代码 / 拼音缩写 / 名称随便敲，候选即时出来
+    query = st.sidebar.text_input('搜索基金 (代码/拼音/名称)', key='fund_query')
+    candidates = fund_index.search(query, limit=20)
+    if candidates.empty:
+        st.sidebar.warning('没有匹配的基金')
+        fund_code, fund_name = query.strip(), query.strip()
+    else:
+        labels = [f"{r.fund_code} {r.fund_name} · {r.category}" for r in candidates.itertuples()]
+        picked = st.sidebar.selectbox('选择基金', range(len(labels)), format_func=lambda i: labels[i])
+        fund_code = candidates.iloc[picked]['fund_code']
+        fund_name = candidates.iloc[picked]['fund_name']
+else:
+    # 名录还没建好：手动输入
+    fund_code = st.sidebar.text_input('输入基金代码', key='manual_code')
+    fund_name = st.sidebar.text_input('基金名称 (备注)', key='manual_name')
 days = st.sidebar.slider('查看最近多少天?',min_value = 30,max_value=365,value=120)
 st.sidebar.markdown('---')
 st.sidebar.subheader('🛠️ 策略实验室')
@@ -49,6 +84,39 @@ def get_data(code):
     except Exception as e:
         st.error(f"数据库读取失败: {e}")
         return pd.DataFrame()
+# 相关矩阵由晚间任务算好存库，这里只读快照
+@st.cache_data(ttl=3600)
+def get_corr_snapshot():
+    engine = create_engine(DB_URL)
+    try:
+        return load_snapshot(engine)
+    except Exception:
+        return pd.DataFrame()
+# 盘中估值：本机跑 realtime.py 时直接读本地仓库；否则读晚间任务同步进库的 fund_estimate_log
+@st.cache_data(ttl=60)
+def get_intraday(code):
+    store = get_store()
+    days = store.days()
+    if days:
+        df = store.read_day(days[-1], [code])
+        if not df.empty:
+            return days[-1], df
+    try:
+        return load_day_db(create_engine(DB_URL), [code])
+    except Exception:
+        return None, pd.DataFrame()
+# 自选总览：晚间任务算好的快照，一条 SELECT，基金再多也一样快
+@st.cache_data(ttl=600)
+def get_overview():
+    engine = create_engine(DB_URL)
+    try:
+        return load_overview(engine, list(union_funds()))
+    except Exception:
+        return pd.DataFrame()
+# 多基金对比：对齐表按基金组合缓存，换窗口只是切片 + 除法 (晚间数据更新后一小时内自动换新)
+@st.cache_resource(ttl=3600)
+def get_comparison_cache():
+    return ComparisonCache(create_engine(DB_URL))
 # --- 3. 核心函数: 计算指标 ---
 def calculate_indicators(df,rsi_threshold=30):
     # 算 RSI
@@ -78,6 +146,87 @@ def calculate_indicators(df,rsi_threshold=30):
 
     return df
 # --- 4. 主界面逻辑 ---
+# 4.1 自选总览页
+def drill_down():
+    """总览表点了某一行：把这只基金填进侧边栏，切到单只基金页 (回调里改 session_state，下一轮生效)"""
+    picked = st.session_state['overview_table'].selection.rows
+    if picked:
+        row = st.session_state['overview_rows'].iloc[picked[0]]
+        st.session_state['page'] = PAGE_FUND
+        st.session_state['fund_query'] = row['fund_code']
+        st.session_state['manual_code'] = row['fund_code']
+        st.session_state['manual_name'] = row['fund_name']
+
+if page == PAGE_OVERVIEW:
+    st.title('📋 自选总览')
+    snap = get_overview()
+    if snap.empty:
+        st.warning('⚠️ 还没有总览快照。')
+        st.info('💡 解决办法：先跑一次 main.py (晚间任务)，分析完会自动生成。')
+        st.stop()
+    snap = snap.sort_values('excess', ascending=False).reset_index(drop=True)
+    st.session_state['overview_rows'] = snap
+    st.caption(f"快照时间 {pd.Timestamp(snap['updated_at'].max()):%Y-%m-%d %H:%M} · "
+               f"策略 = RSI<{snap['rsi_threshold'].iloc[0]:.0f} 持有 · 点表头排序，点一行看详情")
+    table = snap.rename(columns={
+        'fund_code': '代码', 'fund_name': '名称', 'nav_date': '日期', 'nav_value': '最新净值',
+        'rsi': 'RSI', 'dist_to_low': '距下轨%', 'signal_text': '信号',
+        'strategy_return': '策略%', 'hold_return': '持有%', 'excess': '超额%',
+    })[['代码', '名称', '日期', '最新净值', 'RSI', '距下轨%', '信号', '策略%', '持有%', '超额%']]
+    st.dataframe(
+        table.style.format({'最新净值': '{:.4f}', 'RSI': '{:.1f}', '距下轨%': '{:.2f}',
+                            '策略%': '{:.2f}', '持有%': '{:.2f}', '超额%': '{:+.2f}'}),
+        use_container_width=True, hide_index=True, key='overview_table',
+        on_select=drill_down, selection_mode='single-row',
+    )
+    st.stop()
+
+# 4.2 多基金对比页
+if page == PAGE_COMPARE:
+    st.title('🆚 多基金对比 (起点 = 1.0)')
+    names = dict(union_funds())
+    extra = st.text_input('再加几只 (代码，逗号分隔)', '')
+    for code in [c.strip() for c in extra.replace('，', ',').split(',') if c.strip()]:
+        meta = fund_index.lookup(code) if fund_index is not None else None
+        names.setdefault(code, meta['fund_name'] if meta else code)
+    codes = st.multiselect('对比哪些基金', list(names), default=list(names)[:20],
+                           format_func=lambda c: f"{c} {names[c]}")
+    c1, c2, c3 = st.columns(3)
+    window = c1.select_slider('窗口 (交易日)', [20, 30, 60, 120, 250, 500, 1000], value=60)
+    calendar_labels = {'union': '并集 (任一基金有净值就算一天)', 'intersection': '交集 (都有净值才算)', 'anchor': '以某只基金的交易日为准'}
+    calendar = c2.radio('日历对齐', CALENDARS, format_func=calendar_labels.get)
+    max_gap = c3.number_input('缺净值最多沿用几天', min_value=0, max_value=20, value=5)
+    anchor = None
+    if calendar == 'anchor' and codes:
+        anchor = st.selectbox('基准基金', codes, format_func=lambda c: f"{c} {names[c]}")
+    if not codes:
+        st.info('💡 先选几只基金。')
+        st.stop()
+    try:
+        curves, table = get_comparison_cache().rebased(codes, window, calendar, anchor, int(max_gap))
+    except Exception as e:
+        st.error(f'对比数据读取失败：{e}')
+        st.stop()
+    if curves.empty:
+        st.warning('⚠️ 这个窗口里没有数据 (交集对齐时，基金越多共同交易日越少)。')
+        st.stop()
+
+    fig_cmp = go.Figure()
+    for code in curves.columns:
+        fig_cmp.add_trace(go.Scatter(x=curves.index, y=curves[code], mode='lines', name=names[code], connectgaps=False))
+    fig_cmp.add_hline(y=1.0, line_dash='dot', line_color='gray')
+    fig_cmp.update_layout(height=550, xaxis_title='日期', yaxis_title='累计收益倍数', hovermode='x unified')
+    st.plotly_chart(fig_cmp, use_container_width=True)
+
+    st.subheader('🏆 区间战力榜')
+    board = table.rename(columns={'return_pct': '区间收益%', 'max_dd_pct': '最大回撤%', 'filled_days': '补值天数'})
+    board.insert(0, '名称', [names.get(c, c) for c in board.index])
+    st.dataframe(board.style.format({'区间收益%': '{:+.2f}', '最大回撤%': '{:.2f}'}), use_container_width=True)
+    st.caption(f'{curves.index[0]:%Y-%m-%d} → {curves.index[-1]:%Y-%m-%d} · {len(curves)} 个对齐后的交易日 · '
+               '补值天数 = 那天没发净值、沿用前一天的天数')
+    st.stop()
+
+# 4.3 单只基金页
 st.title(f'📈 {fund_name} ({fund_code}) 实战分析')
 
 # [修复1] 加上 try-except 捕获所有潜在错误
@@ -177,6 +326,32 @@ try:
         else:
             st.info('☁️ 目前处于垃圾时间 (震荡区)。建议：多看少动，喝杯茶。')
 
+        # --- 8. 盘中估值走势 ---
+        est_day, intraday = get_intraday(fund_code)
+        if not intraday.empty:
+            st.subheader(f'⏱️ 盘中估值走势 ({est_day})')
+            fig_est = go.Figure(go.Scatter(
+                x=intraday['est_time'], y=intraday['est_growth'],
+                mode='lines+markers', name='估值涨幅 (%)', line=dict(color='orange', width=2)
+            ))
+            fig_est.add_hline(y=0, line_dash='dot', line_color='gray')
+            fig_est.update_layout(height=300, xaxis_title='时间', yaxis_title='估值涨幅 (%)', hovermode='x unified')
+            st.plotly_chart(fig_est, use_container_width=True)
+
+        # --- 9. 持仓相关性热力图 ---
+        corr = get_corr_snapshot()
+        if not corr.empty:
+            st.subheader('🔗 持仓相关性热力图')
+            names = union_funds()
+            labels = [names.get(c, c) for c in corr.columns]
+            fig_corr = go.Figure(go.Heatmap(
+                z=corr.values, x=labels, y=[names.get(c, c) for c in corr.index],
+                zmin=-1, zmax=1, colorscale='RdBu_r',
+                text=corr.round(2).values, texttemplate='%{text}'
+            ))
+            fig_corr.update_layout(height=400)
+            st.plotly_chart(fig_corr, use_container_width=True)
+
 except Exception as e:
     # 这里会捕获 SQL 连接失败等系统级错误
     st.error(f'系统崩溃了：{e}')
@@ -3,12 +3,64 @@
 
 import akshare as ak
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, bindparam
 from urllib.parse import quote_plus
 import time
+import hashlib
+import os
+import argparse
+import subprocess
+import sys
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # 导入你的配置文件 (这就是为什么要分开写 config.py)
 import config 
+from fetch_client import get_client, EASTMONEY_HOST, EASTMONEY_QUOTE_HOST, not_empty
+from volume_price import DEFAULT_FUND_ETF_MAP
+from db_writer import BatchWriter
+from fund_meta import etf_map
+from watchlist import union_funds
+
+ETF_START_DATE = '20180101'  # 首次入库从这天开始抓
+FINGERPRINT_TAIL = 30  # 指纹只哈希最后 30 行：新净值、近期修订都会改变它
+
+
+def fingerprint(df, tail=FINGERPRINT_TAIL):
+    """一只基金抓回来的数据的指纹：(最新日期, 行数, 尾部哈希)"""
+    recent = df[['nav_date', 'nav_value']].tail(tail)
+    payload = recent.to_csv(index=False, header=False, date_format='%Y-%m-%d', float_format='%.4f')
+    return (
+        df['nav_date'].iloc[-1].date(),
+        len(df),
+        hashlib.sha1(payload.encode('utf-8')).hexdigest(),
+    )
+
+def shard_of(code, n_shards):
+    """基金属于哪个分片：按代码的 md5 取模 (Python 自带的 hash() 每个进程不一样，不能用)"""
+    return int(hashlib.md5(code.encode('utf-8')).hexdigest(), 16) % n_shards
+
+
+def select_shard(funds, index, n_shards):
+    """{代码: 名称} 里属于第 index 片 (从 0 数) 的那部分"""
+    return {code: name for code, name in funds.items() if shard_of(code, n_shards) == index}
+
+
+def parse_shard(value):
+    """'i/N' -> (i, N)，i 从 0 数"""
+    try:
+        index, n_shards = (int(x) for x in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 i/N，比如 0/4: {value}")
+    if n_shards < 1 or not 0 <= index < n_shards:
+        raise argparse.ArgumentTypeError(f"分片序号要在 0 ~ N-1 之间: {value}")
+    return index, n_shards
+
+
+def default_run_id():
+    """同一轮分片共用的批次号：GitHub Actions 里用 run_id，本地按日期"""
+    return os.environ.get('GITHUB_RUN_ID') or datetime.now().strftime('%Y%m%d')
+
 
 class DataEngine:
     def __init__(self):
@@ -40,7 +92,8 @@ class DataEngine:
         safe_pass = quote_plus(password)
         self.conn_str = f"mysql+pymysql://{user}:{safe_pass}@{host}:{port}/{database}"
         self.engine = create_engine(self.conn_str)
-        # ...
+        # 抓取客户端：重试/熔断/自适应并发都在里面
+        self.client = get_client()
 
     def _init_table(self):
         """内部方法：确保表结构存在"""
@@ -55,14 +108,213 @@ class DataEngine:
         """)
         with self.engine.connect() as conn:
             conn.execute(sql)
+            conn.commit()
+
+    def _init_meta_table(self):
+        """内部方法：每只基金上次入库时的指纹"""
+        sql = text("""
+        CREATE TABLE IF NOT EXISTS fund_etl_meta (
+            fund_code VARCHAR(10),
+            last_date DATE,
+            row_count INT,
+            tail_hash CHAR(40),
+            updated_at DATETIME
+        );
+        """)
+        with self.engine.connect() as conn:
+            conn.execute(sql)
+            conn.commit()
+
+    def _load_meta(self):
+        """{基金代码: (最新日期, 行数, 尾部哈希)}，一条 SQL 读完"""
+        df = pd.read_sql(text("SELECT fund_code, last_date, row_count, tail_hash FROM fund_etl_meta"), self.engine)
+        return {
+            row['fund_code']: (pd.Timestamp(row['last_date']).date(), int(row['row_count']), row['tail_hash'])
+            for _, row in df.iterrows()
+        }
+
+    def last_nav_dates(self):
+        """{基金代码: 库里最新净值日期} (读指纹表，不扫净值大表)"""
+        self._init_meta_table()
+        return {code: fp[0] for code, fp in self._load_meta().items()}
+
+    def _save_meta(self, fingerprints):
+        """批量更新指纹 (先删后存)"""
+        if not fingerprints:
+            return
+        now = datetime.now()
+        df = pd.DataFrame([
+            {'fund_code': code, 'last_date': fp[0], 'row_count': fp[1], 'tail_hash': fp[2], 'updated_at': now}
+            for code, fp in fingerprints.items()
+        ])
+        with self.engine.connect() as conn:
+            stmt = text("DELETE FROM fund_etl_meta WHERE fund_code IN :codes")
+            stmt = stmt.bindparams(bindparam('codes', expanding=True))
+            conn.execute(stmt, parameters={"codes": list(fingerprints)})
+            conn.commit()
+        df.to_sql('fund_etl_meta', self.engine, if_exists='append', index=False)
+
+    def _init_progress_table(self):
+        """内部方法：分片进度 (每个分片跑完记一行，合并时按它查缺)"""
+        sql = text("""
+        CREATE TABLE IF NOT EXISTS etl_shard_progress (
+            run_id VARCHAR(32),
+            shard_index INT,
+            shard_count INT,
+            fund_count INT,
+            updated INT,
+            skipped INT,
+            failed INT,
+            failed_codes TEXT,
+            started_at DATETIME,
+            finished_at DATETIME
+        );
+        """)
+        with self.engine.connect() as conn:
+            conn.execute(sql)
+            conn.commit()
 
-    def update_single_fund(self, code, name):
-        """核心逻辑：更新单只基金的数据"""
+    def _save_progress(self, run_id, shard, summary, started_at):
+        """记一笔分片进度 (先删后存，同一分片重跑会覆盖)"""
+        index, n_shards = shard
+        df = pd.DataFrame([{
+            'run_id': run_id,
+            'shard_index': index,
+            'shard_count': n_shards,
+            'fund_count': sum(len(v) for v in summary.values()),
+            'updated': len(summary['updated']),
+            'skipped': len(summary['skipped']),
+            'failed': len(summary['failed']),
+            'failed_codes': ','.join(summary['failed']),
+            'started_at': started_at,
+            'finished_at': datetime.now(),
+        }])
+        with self.engine.connect() as conn:
+            conn.execute(text("DELETE FROM etl_shard_progress WHERE run_id = :r AND shard_index = :i"),
+                         parameters={"r": run_id, "i": index})
+            conn.commit()
+        df.to_sql('etl_shard_progress', self.engine, if_exists='append', index=False)
+
+    def merge_shards(self, n_shards, run_id=None, funds=None):
+        """
+        合并检查：N 个分片是不是都跑完了，每片处理的基金数对不对得上
+        返回 {'complete': bool, 'missing_shards': [...], 'short_shards': [...], 'failed': [...], 'summary': {...}}
+        """
+        run_id = run_id or default_run_id()
+        funds = funds if funds is not None else union_funds()
+        self._init_progress_table()
+        df = pd.read_sql(text("SELECT * FROM etl_shard_progress WHERE run_id = :r"), self.engine,
+                         params={"r": run_id})
+        df = df[df['shard_count'] == n_shards].set_index('shard_index')
+
+        missing = [i for i in range(n_shards) if i not in df.index]
+        # 基金清单是确定的，每片应该有几只也是确定的：对不上说明中途崩了或清单变了
+        expected = {i: len(select_shard(funds, i, n_shards)) for i in range(n_shards)}
+        short = [i for i in df.index if int(df.loc[i, 'fund_count']) != expected[i]]
+        failed = [c for codes in df['failed_codes'].dropna() for c in codes.split(',') if c]
+        summary = {k: int(df[k].sum()) for k in ('updated', 'skipped', 'failed')}
+
+        complete = not missing and not short
+        status = "✅ 全部到齐" if complete else "⚠️ 不完整"
+        print(f"🧩 分片合并 ({run_id}, {n_shards} 片): {status} | 更新 {summary['updated']} | "
+              f"跳过 {summary['skipped']} | 失败 {summary['failed']}")
+        if missing:
+            print(f"   缺分片: {missing}")
+        if short:
+            print(f"   基金数对不上的分片: {short}")
+        return {'complete': complete, 'missing_shards': missing, 'short_shards': short,
+                'failed': failed, 'summary': summary}
+
+    def _init_etf_table(self):
+        """内部方法：ETF 日线表 (按 代码+日期 唯一)"""
+        sql = text("""
+        CREATE TABLE IF NOT EXISTS etf_daily_bar (
+            symbol VARCHAR(10),
+            bar_date DATE,
+            open DECIMAL(10, 4),
+            high DECIMAL(10, 4),
+            low DECIMAL(10, 4),
+            close DECIMAL(10, 4),
+            volume BIGINT,
+            PRIMARY KEY (symbol, bar_date)
+        );
+        """)
+        with self.engine.connect() as conn:
+            conn.execute(sql)
+            conn.commit()
+
+    def _etf_last_dates(self):
+        """每个 ETF 库里最新的日期 (一条 SQL 查完)"""
+        df = pd.read_sql(text("SELECT symbol, MAX(bar_date) AS last_date FROM etf_daily_bar GROUP BY symbol"), self.engine)
+        return {row['symbol']: pd.Timestamp(row['last_date']) for _, row in df.iterrows()}
+
+    def update_etf(self, symbol, last_date=None):
+        """
+        增量更新单个 ETF 的日线：只抓库里最新日期之后的 (最新那天重抓一遍，防止当时拿到的是盘中数据)
+        返回新写入的行数，失败返回 None
+        """
+        start = last_date.strftime('%Y%m%d') if last_date is not None else ETF_START_DATE
+        end = pd.Timestamp.today().strftime('%Y%m%d')
+        try:
+            df = self.client.call(
+                EASTMONEY_QUOTE_HOST, ak.fund_etf_hist_em,
+                symbol=symbol, period='daily', start_date=start, end_date=end
+            )
+            if df is None or df.empty:
+                print(f"💤 ETF {symbol} 没有新数据")
+                return 0
+
+            df = df.rename(columns={'日期': 'bar_date', '开盘': 'open', '最高': 'high',
+                                    '最低': 'low', '收盘': 'close', '成交量': 'volume'})
+            df['bar_date'] = pd.to_datetime(df['bar_date'])
+            for col in ('open', 'high', 'low', 'close'):
+                df[col] = pd.to_numeric(df[col])
+            df['volume'] = pd.to_numeric(df['volume']).astype('int64')
+            df['symbol'] = symbol
+            df = df[['symbol', 'bar_date', 'open', 'high', 'low', 'close', 'volume']].sort_values('bar_date')
+
+            # 先删后存：只删这次重抓的日期段
+            with self.engine.connect() as conn:
+                conn.execute(text("DELETE FROM etf_daily_bar WHERE symbol = :s AND bar_date >= :d"),
+                             parameters={"s": symbol, "d": df['bar_date'].iloc[0].date()})
+                conn.commit()
+            # 批量插入 (一条 INSERT 带多行)，首次入库几千行也很快
+            df.to_sql('etf_daily_bar', self.engine, if_exists='append', index=False, method='multi', chunksize=1000)
+            print(f"✅ ETF {symbol} 写入 {len(df)} 行 (最新日期: {df['bar_date'].iloc[-1].date()})")
+            return len(df)
+
+        except Exception as e:
+            print(f"❌ ETF {symbol} 更新失败: {e}")
+            return None
+
+    def run_etf(self):
+        """第二个数据集：联接基金对应的场内 ETF 日线 (量价指标用)"""
+        fund_etf = etf_map(self.engine, union_funds(), getattr(config, 'FUND_ETF_MAP', DEFAULT_FUND_ETF_MAP))
+        symbols = sorted(set(fund_etf.values()))
+        if not symbols:
+            return
+        print(f"📦 ETF 日线增量更新: {', '.join(symbols)}")
+        self._init_etf_table()
+        last = self._etf_last_dates()
+        for symbol in symbols:
+            self.update_etf(symbol, last.get(symbol))
+
+    def update_single_fund(self, code, name, last_fp=None, writer=None):
+        """
+        核心逻辑：更新单只基金的数据
+        last_fp: 上次入库时的指纹；这次抓回来的一模一样就不碰数据库
+        writer: 批量入库线程 (BatchWriter)；给了就只管抓和洗，写库交给它，不给就当场写
+        返回 'updated' / 'skipped' / 'failed'，新指纹记在 self.fingerprints 里
+        """
         print(f"🔄 [ETL] 正在处理: {name} ({code})...")
         
         try:
             # 1. Extract (抓取)
-            df = ak.fund_open_fund_info_em(symbol=code, indicator="单位净值走势")
+            # 偶发错误会自动退避重试，被限流会自动降并发
+            df = self.client.call(
+                EASTMONEY_HOST, ak.fund_open_fund_info_em,
+                symbol=code, indicator="单位净值走势", validate=not_empty
+            )
             
             # 2. Transform (清洗)
             # 改名
@@ -79,8 +331,19 @@ class DataEngine:
             df['fund_name'] = name
             # 过滤字段
             df = df[['fund_code', 'fund_name', 'nav_date', 'nav_value', 'daily_growth']]
+
+            # 没有新净值 (QDII 晚发、节假日) -> 跳过入库，后面的指标和画图也跟着跳过
+            fp = fingerprint(df)
+            if fp == last_fp:
+                print(f"⏭️ {name} 没有变化 (最新日期: {fp[0]})，跳过")
+                return 'skipped'
             
             # 3. Load (入库 - 先删后存)
+            if writer is not None:
+                writer.put(code, df)  # 写库线程攒批提交；队列满了这里会等 (背压)
+                self.fingerprints[code] = fp
+                print(f"📥 {name} 清洗完成，排队入库 (最新日期: {fp[0]})")
+                return 'updated'
             with self.engine.connect() as conn:
                 # 删旧的
                 del_sql = text("DELETE FROM fund_nav_history WHERE fund_code = :code")
@@ -90,26 +353,97 @@ class DataEngine:
                 # 存新的
                 df.to_sql('fund_nav_history', self.engine, if_exists='append', index=False)
             
+            self.fingerprints[code] = fp
             print(f"✅ {name} 更新成功！(最新日期: {df['nav_date'].iloc[-1].date()})")
-            return True
+            return 'updated'
 
         except Exception as e:
             print(f"❌ {name} 更新失败: {e}")
-            return False
+            return 'failed'
 
-    def run_all(self):
-        """指挥官：批量更新所有基金"""
+    def run_all(self, funds=None, with_etf=True, shard=None, run_id=None):
+        """
+        指挥官：批量更新所有基金
+        funds: 只更新这些 {代码: 名称} (规划器挑出来的)，默认所有自选清单的并集
+        with_etf: 顺便增量更新 ETF 日线 (重试晚发布基金时不用再抓)
+        shard: (i, N) 只跑第 i 片 (多进程 / 多 runner 分摊)，跑完记一笔进度；ETF 只由第 0 片负责
+        返回 {'updated': [...], 'skipped': [...], 'failed': [...]}，分析阶段只需要重算 updated 的
+        """
         print("🚀 === 全量更新任务开始 ===")
-        funds = config.MY_FUNDS # 从配置里读取清单
+        started_at = datetime.now()
+        funds = funds if funds is not None else union_funds() # 所有自选清单的并集
+        if shard is not None:
+            funds = select_shard(funds, *shard)
+            with_etf = with_etf and shard[0] == 0
+            print(f"🧩 分片 {shard[0]}/{shard[1]}: 本片 {len(funds)} 只基金")
+        self._init_table()
+        self._init_meta_table()
+        meta = self._load_meta()
+        self.fingerprints = {}
         
-        for code, name in funds.items():
-            self.update_single_fund(code, name)
-            # 稍微歇一下，防止请求太快被封IP
-            time.sleep(1)
-            
+        # 不再每只基金固定歇 1 秒：并发由抓取客户端按上游健康度自动调节 (AIMD)
+        workers = getattr(config, 'ETL_MAX_WORKERS', 8)
+        # 抓取/清洗 和 写库 分两段流水线：抓取线程只管往队列里放，写库线程攒批提交
+        writer = BatchWriter(
+            self.engine,
+            batch_rows=getattr(config, 'DB_BATCH_ROWS', 20000),
+            flush_seconds=getattr(config, 'DB_FLUSH_SECONDS', 5.0),
+            max_pending=getattr(config, 'DB_QUEUE_SIZE', 16),
+        )
+        with writer, ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda item: self.update_single_fund(*item, meta.get(item[0]), writer),
+                                    funds.items()))
+        writer.print_stats()
+
+        summary = {'updated': [], 'skipped': [], 'failed': []}
+        for code, status in zip(funds, results):
+            # 排队成功但那一批写库失败的，算失败，指纹也不能记 (下次还得重写)
+            if code in writer.failed:
+                status = 'failed'
+                self.fingerprints.pop(code, None)
+            summary[status].append(code)
+        self._save_meta(self.fingerprints)
+        print(f"📊 更新 {len(summary['updated'])} | 无变化跳过 {len(summary['skipped'])} | 失败 {len(summary['failed'])} (共 {len(funds)})")
+        if shard is not None:
+            self._init_progress_table()
+            self._save_progress(run_id or default_run_id(), shard, summary, started_at)
+        if with_etf:
+            self.run_etf()
+        self.client.print_stats()
+        self.client.export_stats()
         print("🏁 === 全量更新任务结束 ===")
+        return summary
 
-# --- 测试代码 (只有直接运行这个文件时才会执行) ---
+def run_parallel(n_shards, run_id=None):
+    """本机起 N 个进程各跑一片 (各自的抓取客户端和 CPU)，全部结束后合并检查"""
+    run_id = run_id or default_run_id()
+    print(f"🧩 本机并行: {n_shards} 个分片进程 (批次 {run_id})")
+    procs = [subprocess.Popen([sys.executable, __file__, '--shard', f"{i}/{n_shards}", '--run-id', run_id])
+             for i in range(n_shards)]
+    codes = [p.wait() for p in procs]
+    if any(codes):
+        print(f"⚠️ 有分片进程异常退出: {[i for i, c in enumerate(codes) if c]}")
+    return DataEngine().merge_shards(n_shards, run_id)
+
+
+# --- 命令行 ---
+# python data_engine.py                 全量更新 (单进程)
+# python data_engine.py --shard 0/4     只跑第 0 片 (GitHub Actions matrix 里每个 runner 跑一片)
+# python data_engine.py --merge 4       所有分片跑完后，检查这一批是不是齐了
+# python data_engine.py --parallel 4    本机 4 个进程并行跑完再合并检查
 if __name__ == "__main__":
-    engine = DataEngine()
-    engine.run_all()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="基金净值 ETL")
+    parser.add_argument('--shard', type=parse_shard, help="只跑第 i 片，共 N 片 (i 从 0 数)，例如 0/4")
+    parser.add_argument('--merge', type=int, metavar='N', help="检查 N 个分片是否全部完成")
+    parser.add_argument('--parallel', type=int, metavar='N', help="本机起 N 个进程分片并行")
+    parser.add_argument('--run-id', default=None, help="分片批次号 (默认 GITHUB_RUN_ID 或当天日期)")
+    args = parser.parse_args()
+
+    if args.parallel:
+        result = run_parallel(args.parallel, args.run_id)
+        sys.exit(0 if result['complete'] else 1)
+    elif args.merge:
+        result = DataEngine().merge_shards(args.merge, args.run_id)
+        sys.exit(0 if result['complete'] else 1)
+    else:
+        DataEngine().run_all(shard=args.shard, run_id=args.run_id)
\ No newline at end of file
@@ -0,0 +1,171 @@
+# db_writer.py
+# --- 批量入库线程：抓取和写库分开跑，攒一批再提交 ---
+# 以前每只基金 "抓 -> 洗 -> DELETE -> to_sql -> commit" 串在一起，远程 RDS 一次往返几十毫秒，
+# 每只基金都得等。现在抓取线程洗好数据就往有界队列里一扔，写库线程把多只基金并成一个事务：
+# 一条 DELETE ... IN (...) + 多行 INSERT，攒够 N 行或者等了 T 秒就提交一次。
+# 队列满了 put() 会阻塞 = 背压：数据库跟不上时抓取自动放慢，内存不会无限涨。
+# 写库线程要是整个挂了 (比如连接断了、异常漏出了单批的 try)，put() 不会傻等：
+# 它按 PUT_POLL_SECONDS 一轮轮检查写库线程还活着没有，挂了就把这份记成失败直接返回；
+# 挂的时候手里和队列里没写进去的，也都记进 failed，run_all 照样能拿到完整的失败名单。
+
+import queue
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+_STOP = object()
+PUT_POLL_SECONDS = 0.5  # 队列满时每隔多久看一眼写库线程还在不在
+
+
+class BatchWriter:
+    def __init__(self, engine, table='fund_nav_history', key='fund_code',
+                 batch_rows=20000, flush_seconds=5.0, max_pending=16):
+        """
+        table / key: 写哪张表，按哪一列 "先删后存"
+        batch_rows: 攒够这么多行就提交
+        flush_seconds: 最早那份数据等了这么久就提交 (不管攒没攒够)
+        max_pending: 队列里最多排几份数据，满了生产者就得等
+        """
+        self.engine = engine
+        self.table = table
+        self.key = key
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=max_pending)
+
+        self.written = []   # 已提交的 key
+        self.failed = {}    # {key: 错误信息}
+        self.batches = 0
+        self.rows = 0
+        self.wait_seconds = 0.0  # 生产者被背压卡住的总时长
+        self.error = None        # 写库线程异常退出时的异常
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def put(self, key, df):
+        """
+        交一份数据 (队列满了会等，直到写库线程腾出位置)
+        写库线程没启动或者已经挂了：这份记成失败，返回 False
+        """
+        started = time.monotonic()
+        while True:
+            if not self.alive():
+                self._fail([key], self._dead_reason())
+                return False
+            try:
+                self.queue.put((key, df), timeout=PUT_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        waited = time.monotonic() - started
+        if waited > 0.01:
+            with self._lock:
+                self.wait_seconds += waited
+        return True
+
+    def close(self):
+        """把剩下的都写完再返回；写库线程挂了的话，队列里剩下的都记成失败"""
+        if self._thread is not None:
+            while self._thread.is_alive():
+                try:
+                    self.queue.put(_STOP, timeout=PUT_POLL_SECONDS)
+                    break
+                except queue.Full:
+                    continue
+            self._thread.join()
+            self._thread = None
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._fail([item[0]], self._dead_reason())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- 写库线程 ---
+
+    def _fail(self, keys, reason):
+        with self._lock:
+            for k in keys:
+                self.failed[k] = reason
+
+    def _dead_reason(self):
+        if self.error is None:
+            return "写库线程没有在运行"
+        return f"写库线程异常退出: {type(self.error).__name__}: {str(self.error).splitlines()[0][:150]}"
+
+    def _loop(self):
+        pending = []
+        try:
+            self._run(pending)
+        except BaseException as e:
+            # 手里攒着还没提交的都算失败；之后的 put() 看到线程没了也会直接记失败
+            self.error = e
+            print(f"❌ {self._dead_reason()}")
+            self._fail([k for k, _ in pending], self._dead_reason())
+
+    def _run(self, pending):
+        rows, first_at = 0, None
+        while True:
+            timeout = None if not pending else max(first_at + self.flush_seconds - time.monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None  # 等够了 flush_seconds
+
+            if item is not None and item is not _STOP:
+                if not pending:
+                    first_at = time.monotonic()
+                pending.append(item)
+                rows += len(item[1])
+            if pending and (item is None or item is _STOP or rows >= self.batch_rows):
+                self._flush(pending)
+                pending.clear()
+                rows = 0
+            if item is _STOP:
+                return
+
+    def _flush(self, pending):
+        """一批数据一个事务：先删这批 key 的旧数据，再一次插入"""
+        # 同一个 key 在一批里出现两次，以后到的为准
+        latest = dict(pending)
+        keys = list(latest)
+        df = pd.concat(latest.values(), ignore_index=True)
+        try:
+            with self.engine.connect() as conn:
+                stmt = text(f"DELETE FROM {self.table} WHERE {self.key} IN :keys")
+                stmt = stmt.bindparams(bindparam('keys', expanding=True))
+                conn.execute(stmt, parameters={"keys": keys})
+                df.to_sql(self.table, conn, if_exists='append', index=False, method='multi', chunksize=1000)
+                conn.commit()
+            self.written.extend(keys)
+            self.batches += 1
+            self.rows += len(df)
+            print(f"💾 批量入库: {len(keys)} 只 / {len(df)} 行")
+        except Exception as e:
+            reason = str(e).splitlines()[0][:200]  # 多行 INSERT 的报错会把整条 SQL 带出来
+            print(f"❌ 批量入库失败 ({len(keys)} 只，已回滚): {reason}")
+            self._fail(keys, reason)
+
+    def print_stats(self):
+        print(f"💾 入库统计: {self.batches} 次提交 | {self.rows} 行 | {len(self.written)} 只成功 | "
+              f"{len(self.failed)} 只失败 | 背压等待 {self.wait_seconds:.1f}s")
+        if self.error is not None:
+            print(f"⚠️ {self._dead_reason()}")
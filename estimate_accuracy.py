@@ -0,0 +1,219 @@
+# estimate_accuracy.py
+# --- 估值体检：盘中估值 (gszzl) 跟当晚官方涨幅到底差多少？ ---
+# 把 estimate_store 里存的盘中估值按 (基金, 日期) 跟官方净值对齐，全部历史一次性向量化算完：
+# 偏差、误差分布、方向命中率、RSI 信号命中率 -> 可信度权重。
+# realtime.py 读这个权重：估值不靠谱的基金 (典型是 QDII) 先扣掉系统偏差，RSI 再往 50 收缩，信号自动打折。
+# realtime.py 不连库，权重走 data/estimate_accuracy.json：CI 上 data/ 由 actions/cache 在晚间任务和盘中任务之间接力，
+# 晚间算完写进去，第二天 14:45 的 runner 恢复缓存后就能读到；库里 fund_estimate_accuracy 留一份完整历史。
+
+import json
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from estimate_store import get_store
+from fund_matrix import load_nav_long
+
+ACCURACY_PATH = os.path.join("data", "estimate_accuracy.json")
+
+DECISION_TIME = "14:50"   # 跟 job_1450 一样，只看决策时刻能拿到的最后一条估值
+RSI_PERIOD = 14
+OVERSOLD, OVERBOUGHT = 30, 70
+MIN_SIGNALS = 5  # 信号天数少于这个数时，信号命中率不参与打折
+
+
+def _rsi_zone(rsi):
+    """-1 超卖 / 0 中性 / 1 超买"""
+    return np.where(rsi < OVERSOLD, -1, np.where(rsi > OVERBOUGHT, 1, 0))
+
+
+def decision_estimates(store, start_day, end_day, codes=None, cutoff=DECISION_TIME):
+    """每只基金每天在 cutoff 之前的最后一条估值"""
+    df = store.read_range(start_day, end_day, codes)
+    if df.empty:
+        return pd.DataFrame(columns=['fund_code', 'nav_date', 'est_growth'])
+    hh, mm = (int(x) for x in cutoff.split(':'))
+    minutes = df['est_time'].dt.hour * 60 + df['est_time'].dt.minute
+    df = df[minutes <= hh * 60 + mm].copy()
+    df['nav_date'] = df['est_time'].dt.normalize()
+    # read_range 已按 (基金, 时间) 排好序，每组最后一条就是决策时刻的估值
+    return df.groupby(['fund_code', 'nav_date'], sort=False).tail(1)[['fund_code', 'nav_date', 'est_growth']]
+
+
+def official_with_rsi(engine, codes=None, start_date=None):
+    """
+    官方净值 + 当天官方涨幅 + 前一天收盘时的 RSI 平滑状态 (用来把估值代进去算 "估值版 RSI")
+    注：这里用全部历史做 EWM，实时端只用最近 30 个净值，两者差异很小，不影响命中率统计
+    """
+    df = load_nav_long(engine, codes, start_date)
+    g = df.groupby('fund_code', sort=False)['nav_value']
+    df['prev_nav'] = g.shift(1)
+    df['daily_growth'] = (df['nav_value'] / df['prev_nav'] - 1) * 100  # 与 DataEngine 入库的 daily_growth 同口径
+
+    change = df['nav_value'] - df['prev_nav']
+    df['_gain'] = change.clip(lower=0)
+    df['_loss'] = (-change).clip(lower=0)
+    by = df.groupby('fund_code', sort=False)
+    avg_gain = by['_gain'].transform(lambda s: s.ewm(com=RSI_PERIOD - 1, adjust=False).mean())
+    avg_loss = by['_loss'].transform(lambda s: s.ewm(com=RSI_PERIOD - 1, adjust=False).mean())
+    df['rsi'] = 100 - 100 / (1 + avg_gain / avg_loss)
+    df['prev_gain'] = avg_gain.groupby(df['fund_code'], sort=False).shift(1)
+    df['prev_loss'] = avg_loss.groupby(df['fund_code'], sort=False).shift(1)
+    return df.drop(columns=['_gain', '_loss'])
+
+
+def join_estimates(est, official):
+    """按 (基金, 日期) 对齐估值和官方数据，顺便算出 "如果按估值收盘" 的 RSI"""
+    df = est.merge(official, on=['fund_code', 'nav_date'], how='inner')
+    df = df.dropna(subset=['prev_nav', 'prev_gain', 'prev_loss'])
+    a = 1 / RSI_PERIOD
+    est_change = df['prev_nav'] * df['est_growth'] / 100
+    gain = df['prev_gain'] + a * (est_change.clip(lower=0) - df['prev_gain'])
+    loss = df['prev_loss'] + a * ((-est_change).clip(lower=0) - df['prev_loss'])
+    df['est_rsi'] = 100 - 100 / (1 + gain / loss)
+    df['error'] = df['est_growth'] - df['daily_growth']
+    return df
+
+
+def accuracy_table(joined, min_days=10, err_tolerance=2.0):
+    """
+    每只基金一行：
+      n_days          样本天数
+      bias            平均误差 (估值 - 官方)，正数 = 估值习惯性偏高
+      mae / rmse      平均绝对误差 / 均方根误差 (百分点)
+      p90_abs_err     90% 的日子误差不超过这个数
+      direction_hit   涨跌方向猜对的比例
+      signal_hit      估值 RSI 给出超买/超卖信号的日子里，官方 RSI 也在同一区间的比例
+      reliability     可信度权重 0~1：扣掉偏差后的误差标准差达到 err_tolerance 时为 0，信号命中率再打一次折
+    """
+    cols = ['n_days', 'bias', 'mae', 'rmse', 'p90_abs_err', 'direction_hit', 'signal_hit', 'reliability']
+    if joined.empty:
+        return pd.DataFrame(columns=cols)
+
+    df = joined.assign(
+        abs_err=joined['error'].abs(),
+        sq_err=joined['error'] ** 2,
+        dir_hit=(np.sign(joined['est_growth']) == np.sign(joined['daily_growth'])).astype(float),
+    )
+    est_zone = _rsi_zone(df['est_rsi'].to_numpy())
+    off_zone = _rsi_zone(df['rsi'].to_numpy())
+    signaled = est_zone != 0
+    df['signaled'] = signaled.astype(float)
+    df['sig_hit'] = (signaled & (est_zone == off_zone)).astype(float)
+
+    g = df.groupby('fund_code')
+    out = pd.DataFrame({
+        'n_days': g.size(),
+        'bias': g['error'].mean(),
+        'mae': g['abs_err'].mean(),
+        'rmse': np.sqrt(g['sq_err'].mean()),
+        'p90_abs_err': g['abs_err'].quantile(0.9),
+        'direction_hit': g['dir_hit'].mean(),
+        'signal_hit': g['sig_hit'].sum() / g['signaled'].sum().replace(0, np.nan),
+    })
+    # 系统偏差实时端会扣掉，真正影响判断的是扣完偏差后剩下的误差 (= 标准差)
+    residual = g['error'].std(ddof=0).fillna(0)
+    weight = np.clip(1 - residual / err_tolerance, 0, 1)
+    # 信号命中率只在信号天数够多时参与打折 (0% 命中 -> 再打五折)
+    n_signals = g['signaled'].sum()
+    hit = out['signal_hit'].where(n_signals >= MIN_SIGNALS, 1.0).fillna(1.0)
+    weight = weight * (0.5 + 0.5 * hit)
+    # 样本太少的按满分处理，不误伤
+    out['reliability'] = np.where(out['n_days'] >= min_days, weight, 1.0)
+    return out[cols]
+
+
+def save_accuracy(engine, table, calc_date=None, min_days=10, path=ACCURACY_PATH):
+    """存库 (先删后存) + 写一份 JSON 给不连库的 realtime.py 用"""
+    calc_date = calc_date or date.today()
+    if table.empty:
+        return
+    df = table.reset_index().rename(columns={'index': 'fund_code'})
+    df.insert(1, 'calc_date', calc_date)
+    with engine.connect() as conn:
+        conn.execute(text("DELETE FROM fund_estimate_accuracy WHERE calc_date = :d"), parameters={"d": calc_date})
+        conn.commit()
+    df.to_sql('fund_estimate_accuracy', engine, if_exists='append', index=False)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 样本不够的基金不扣偏差 (几天的平均值说明不了问题)
+    payload = {
+        code: {'bias': round(float(r['bias']), 4) if r['n_days'] >= min_days else 0.0,
+               'reliability': round(float(r['reliability']), 4),
+               'n_days': int(r['n_days'])}
+        for code, r in table.iterrows()
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'calc_date': str(calc_date), 'funds': payload}, f, ensure_ascii=False, indent=2)
+
+
+def init_table(engine):
+    with engine.connect() as conn:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fund_estimate_accuracy (
+            fund_code VARCHAR(10),
+            calc_date DATE,
+            n_days INT,
+            bias DOUBLE,
+            mae DOUBLE,
+            rmse DOUBLE,
+            p90_abs_err DOUBLE,
+            direction_hit DOUBLE,
+            signal_hit DOUBLE,
+            reliability DOUBLE
+        );
+        """))
+        conn.commit()
+
+
+def update_accuracy(engine, codes, lookback_days=365, min_days=10, err_tolerance=2.0, store=None):
+    """晚间任务：拿全部存量估值重新体检一遍，存库 + 存 JSON，返回体检表"""
+    store = store or get_store()
+    end = pd.Timestamp.today().normalize()
+    start = end - pd.Timedelta(days=lookback_days)
+    est = decision_estimates(store, start, end, codes)
+    if est.empty:
+        return pd.DataFrame()
+    official = official_with_rsi(engine, codes, start - pd.Timedelta(days=120))
+    table = accuracy_table(join_estimates(est, official), min_days, err_tolerance)
+    init_table(engine)
+    save_accuracy(engine, table, min_days=min_days)
+    return table
+
+
+def load_reliability(path=ACCURACY_PATH):
+    """
+    实时端用：{基金代码: {'bias':..., 'reliability':...}}，没有体检结果就返回空 (不打折)
+    读到/没读到都打印一行，缓存没接上的时候一眼能看出来
+    """
+    if not os.path.exists(path):
+        print(f"⚠️ 没有估值体检结果 ({path})，今天估值不扣偏差、RSI 不打折")
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 估值体检结果读取失败，今天不打折: {e}")
+        return {}
+    funds = data.get('funds', {})
+    print(f"🩺 估值体检结果: {len(funds)} 只基金 (计算于 {data.get('calc_date')})")
+    return funds
+
+
+def debias(code, growth, reliability):
+    """估值扣掉该基金的历史系统偏差 (在算 RSI 之前做)"""
+    return growth - reliability.get(code, {}).get('bias', 0.0)
+
+
+def shrink_rsi(codes, rsi, reliability):
+    """
+    向量化打折：RSI 按可信度往 50 收缩
+    可信度 1 = 原样；0.5 = RSI 偏离 50 的幅度减半，只有很极端的信号才能过线
+    返回 (打折后的 rsi, 权重)
+    """
+    rsi = np.asarray(rsi, dtype=np.float64)
+    w = np.array([reliability.get(c, {}).get('reliability', 1.0) for c in codes], dtype=np.float64)
+    return 50 + w * (rsi - 50), w
@@ -0,0 +1,269 @@
+# estimate_store.py
+# --- 盘中估值仓库：每次抓到的估值都落盘，按天一个只追加的二进制日志 ---
+# 每条记录定长 16 字节 (基金代码, 估值时间, 估值涨幅)，写入就是文件末尾追加一次；
+# 读取用内存映射，不整文件读进来；过了当天再压缩成按列存放的 .npy，方便按基金切片。
+# 有了它，盘中走势图、估值 vs 官方净值的对比都不用再去请求上游。
+# CI 上 data/ 靠 actions/cache 在 14:45 盘中任务和 22:00 晚间任务之间接力；
+# 晚间任务再把最近几天的估值同步进 fund_estimate_log 表，看板 (不在 runner 上) 从库里读。
+
+import os
+import shutil
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+STORE_DIR = os.path.join("data", "estimates")
+
+# 定长记录：基金代码 (6 位数字，直接存整数) + 估值时间 (epoch 秒) + 估值涨幅 (%)
+RECORD = np.dtype([('fund', '<u4'), ('ts', '<i8'), ('est', '<f4')])  # 4 + 8 + 4 = 16 字节
+
+COLUMNS = ('fund', 'ts', 'est')
+
+
+def _day_key(day):
+    return pd.Timestamp(day).strftime('%Y%m%d')
+
+
+def _to_epoch(gztime):
+    """fundgz 的 gztime 形如 '2024-05-20 14:50'，按北京时间存成 epoch 秒"""
+    ts = pd.Timestamp(gztime)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('Asia/Shanghai')
+    return int(ts.timestamp())
+
+
+class EstimateStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _log_path(self, key):
+        return os.path.join(self.root, f"{key}.bin")
+
+    def _col_dir(self, key):
+        return os.path.join(self.root, key)
+
+    # --- 写 ---
+
+    def append(self, code, est, gztime):
+        """追加一条估值 (同一只基金同一个估值时间重复写也没关系，压缩时去重)"""
+        ts = _to_epoch(gztime)
+        rec = np.zeros(1, dtype=RECORD)
+        rec['fund'], rec['ts'], rec['est'] = int(code), ts, est
+        key = _day_key(pd.Timestamp(ts, unit='s', tz='Asia/Shanghai'))
+        with self._lock, open(self._log_path(key), 'ab') as f:
+            f.write(rec.tobytes())
+
+    # --- 读 ---
+
+    def days(self):
+        """仓库里有哪些天 (日志和已压缩的都算)"""
+        keys = set()
+        for name in os.listdir(self.root):
+            if name.endswith('.bin'):
+                keys.add(name[:-4])
+            elif name.isdigit() and os.path.isdir(self._col_dir(name)):
+                keys.add(name)
+        return sorted(keys)
+
+    def _read_log(self, key):
+        path = self._log_path(key)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        n = size // RECORD.itemsize  # 写到一半断电留下的残缺尾巴直接忽略
+        if n == 0:
+            return None
+        mm = np.memmap(path, dtype=RECORD, mode='r', shape=(n,))
+        return {c: mm[c] for c in COLUMNS}
+
+    def _read_columns(self, key):
+        col_dir = self._col_dir(key)
+        if not os.path.isdir(col_dir):
+            return None
+        return {c: np.load(os.path.join(col_dir, f"{c}.npy"), mmap_mode='r') for c in COLUMNS}
+
+    def _read_raw(self, key):
+        """
+        一天的全部记录，都是内存映射
+        返回 (列字典, 是否已排序去重)：只有列文件时为 True；压缩后又补写了日志就拼起来，按未排序处理
+        """
+        cols, log = self._read_columns(key), self._read_log(key)
+        if log is None:
+            if cols is None:
+                return {c: np.empty(0, dtype=RECORD[c]) for c in COLUMNS}, True
+            return cols, True
+        if cols is None:
+            return log, False
+        return {c: np.concatenate([cols[c], log[c]]) for c in COLUMNS}, False
+
+    def read_day(self, day, codes=None, start=None, end=None):
+        """
+        读某一天的估值，可按基金、时间段 [start, end) 过滤
+        返回 DataFrame: fund_code, est_time, est_growth (按基金、时间排序)
+        """
+        key = _day_key(day)
+        cols, is_sorted = self._read_raw(key)
+        fund, ts = cols['fund'], cols['ts']
+
+        if is_sorted and codes is not None:
+            # 列文件按 (基金, 时间) 排好序，二分找每只基金的区间，不用扫全表
+            ids = np.sort(np.array([int(c) for c in codes], dtype=np.uint32))
+            lo = np.searchsorted(fund, ids, side='left')
+            hi = np.searchsorted(fund, ids, side='right')
+            idx = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)] or [np.empty(0, dtype=np.int64)])
+        else:
+            mask = np.ones(len(fund), dtype=bool)
+            if codes is not None:
+                mask &= np.isin(fund, np.array([int(c) for c in codes], dtype=np.uint32))
+            idx = np.flatnonzero(mask)
+
+        if start is not None:
+            idx = idx[ts[idx] >= _to_epoch(start)]
+        if end is not None:
+            idx = idx[ts[idx] < _to_epoch(end)]
+
+        df = pd.DataFrame({
+            'fund_code': np.char.zfill(np.asarray(fund[idx]).astype(str), 6),
+            'est_time': pd.to_datetime(np.asarray(ts[idx]), unit='s', utc=True).tz_convert('Asia/Shanghai').tz_localize(None),
+            'est_growth': np.asarray(cols['est'][idx], dtype=np.float64),
+        })
+        if not is_sorted:
+            df = df.drop_duplicates(['fund_code', 'est_time'], keep='last')
+        return df.sort_values(['fund_code', 'est_time'], kind='stable').reset_index(drop=True)
+
+    def read_range(self, start_day, end_day, codes=None):
+        """跨天读取 [start_day, end_day]"""
+        lo, hi = _day_key(start_day), _day_key(end_day)
+        frames = [self.read_day(k, codes) for k in self.days() if lo <= k <= hi]
+        if not frames:
+            return pd.DataFrame(columns=['fund_code', 'est_time', 'est_growth'])
+        return pd.concat(frames, ignore_index=True)
+
+    def last_estimates(self, day, codes=None):
+        """每只基金当天最后一条估值 (收盘前的最终估值)"""
+        df = self.read_day(day, codes)
+        return df.groupby('fund_code', sort=False).tail(1).reset_index(drop=True)
+
+    # --- 压缩 ---
+
+    def compact(self, day):
+        """
+        把一天的日志压成列文件 (fund.npy / ts.npy / est.npy)：
+        按 (基金, 时间) 排序 + 去重，之后按基金读只要二分
+        """
+        key = _day_key(day)
+        path = self._log_path(key)
+        if not os.path.exists(path):
+            return 0
+        cols, _ = self._read_raw(key)  # 已压缩过又有补写的，连同旧列文件一起重排
+        fund = np.asarray(cols['fund']).copy()
+        ts = np.asarray(cols['ts']).copy()
+        est = np.asarray(cols['est']).copy()
+
+        order = np.lexsort((ts, fund))
+        fund, ts, est = fund[order], ts[order], est[order]
+        # 同一基金同一时间只留最后写入的那条 (lexsort 是稳定排序)
+        keep = np.ones(len(fund), dtype=bool)
+        keep[:-1] = (fund[1:] != fund[:-1]) | (ts[1:] != ts[:-1])
+        fund, ts, est = fund[keep], ts[keep], est[keep]
+
+        # 先写到临时目录再改名，压缩到一半挂掉也不会留下半套列文件
+        col_dir = self._col_dir(key)
+        tmp = col_dir + '.tmp'
+        os.makedirs(tmp, exist_ok=True)
+        for name, arr in zip(COLUMNS, (fund, ts, est)):
+            np.save(os.path.join(tmp, f"{name}.npy"), arr)
+        del cols
+        if os.path.isdir(col_dir):
+            shutil.rmtree(col_dir)
+        os.replace(tmp, col_dir)
+        os.remove(path)
+        return len(fund)
+
+    def compact_all(self, before=None):
+        """压缩 before (默认今天) 之前所有还是日志形态的天；今天的还在写，不动"""
+        cutoff = _day_key(before or date.today())
+        done = {}
+        for name in os.listdir(self.root):
+            if name.endswith('.bin') and name[:-4] < cutoff:
+                done[name[:-4]] = self.compact(name[:-4])
+        if done:
+            print(f"🗜️ 估值日志已压缩: {', '.join(f'{k}({v}条)' for k, v in sorted(done.items()))}")
+        return done
+
+
+# --- 同步到数据库 (晚间任务) ---
+
+def init_table(engine):
+    with engine.connect() as conn:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fund_estimate_log (
+            fund_code VARCHAR(10),
+            est_time DATETIME,
+            est_growth DOUBLE
+        );
+        """))
+        conn.commit()
+
+
+def sync_to_db(engine, store=None, days=7):
+    """
+    把最近 days 天的估值写进 fund_estimate_log：按天先删后存，重复同步不会多出记录
+    返回同步的条数
+    """
+    store = store or get_store()
+    keys = store.days()[-days:]
+    if not keys:
+        return 0
+    init_table(engine)
+    total = 0
+    for key in keys:
+        df = store.read_day(key)
+        day = pd.Timestamp(key)
+        with engine.connect() as conn:
+            conn.execute(text("DELETE FROM fund_estimate_log WHERE est_time >= :lo AND est_time < :hi"),
+                         parameters={"lo": day.to_pydatetime(), "hi": (day + pd.Timedelta(days=1)).to_pydatetime()})
+            conn.commit()
+        if not df.empty:
+            df.to_sql('fund_estimate_log', engine, if_exists='append', index=False)
+        total += len(df)
+    print(f"🗃️ 盘中估值已同步到数据库: {len(keys)} 天 {total} 条")
+    return total
+
+
+def load_day_db(engine, codes):
+    """看板用：库里最近一天的估值，返回 (日期, DataFrame)；没有就是 (None, 空表)"""
+    stmt = text("""
+    SELECT fund_code, est_time, est_growth FROM fund_estimate_log
+    WHERE fund_code IN :codes AND est_time >= (
+        SELECT DATE(MAX(est_time)) FROM fund_estimate_log WHERE fund_code IN :codes)
+    ORDER BY fund_code, est_time
+    """).bindparams(bindparam('codes', expanding=True))
+    with engine.connect() as conn:
+        df = pd.read_sql(stmt, conn, params={"codes": list(codes)})
+    if df.empty:
+        return None, df
+    df['est_time'] = pd.to_datetime(df['est_time'])
+    return _day_key(df['est_time'].iloc[-1]), df
+
+
+# --- 全局默认仓库 (realtime.py 抓估值时顺手写入) ---
+_default = None
+
+
+def get_store():
+    global _default
+    if _default is None:
+        _default = EstimateStore()
+    return _default
+
+
+def record(code, est, gztime):
+    """记一条估值；落盘失败只打印，不影响盘中决策"""
+    try:
+        get_store().append(code, est, gztime)
+    except Exception as e:
+        print(f"⚠️ {code} 估值落盘失败: {e}")
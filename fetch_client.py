@@ -0,0 +1,366 @@
+# fetch_client.py
+# --- 抓取客户端：错误分类 + 抖动退避重试 + 按站点熔断 + AIMD 自适应并发 ---
+# 数据源一抖就重试，开始限流就自动降速，彻底挂了就熔断，健康的时候不再傻等 time.sleep(1)。
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+STATS_PATH = os.path.join("data", "fetch_stats.json")
+
+# akshare 的基金净值接口背后是天天基金 (东方财富)
+EASTMONEY_HOST = 'fund.eastmoney.com'
+# ETF 日线 (ak.fund_etf_hist_em) 走的是东方财富行情接口，单独熔断/限流
+EASTMONEY_QUOTE_HOST = 'push2his.eastmoney.com'
+
+
+def not_empty(df):
+    """validate 用：DataFrame 非空才算拿到数据"""
+    return df is not None and not df.empty
+
+
+# --- 1. 错误分类 ---
+
+class FetchError(Exception):
+    """抓取失败的基类；retryable 决定要不要重试"""
+    retryable = False
+    kind = 'error'
+
+
+class ThrottledError(FetchError):
+    """被限流 (HTTP 429 / 503)：重试，并且要降并发"""
+    retryable = True
+    kind = 'throttled'
+
+
+class UpstreamTimeout(FetchError):
+    """超时：重试，并且要降并发"""
+    retryable = True
+    kind = 'timeout'
+
+
+class TransientError(FetchError):
+    """连接被重置、5xx、返回空数据之类的偶发错误：重试"""
+    retryable = True
+    kind = 'transient'
+
+
+class EmptyPayloadError(FetchError):
+    """
+    返回了空数据/残缺数据，解析时炸了 (只认 akshare 里已知的几种：JSON 截断、KeyError: '单位净值'...，见 is_empty_payload)
+    东方财富限流时往往不给 429，而是给一个空壳：重试；整次调用都失败了才算一次拥塞
+    """
+    retryable = True
+    kind = 'empty_payload'
+
+
+class PermanentError(FetchError):
+    """4xx、代码/参数错误 (不认识的解析异常)：重试也没用，原始异常挂在 __cause__ 上"""
+    retryable = False
+    kind = 'permanent'
+
+
+class CircuitOpenError(FetchError):
+    """熔断中：直接拒绝，不去打扰上游"""
+    retryable = False
+    kind = 'circuit_open'
+
+
+# akshare 解析空壳/残缺返回时会碰到的字段：缺的是这些才算 "拿到了空数据"
+PAYLOAD_KEYS = {'data', 'Data_netWorthTrend', 'Data_ACWorthTrend', 'klines', 'diff',
+                '单位净值', '累计净值', '净值日期', '日增长率', '日期', '开盘', '收盘', '成交量', 'trade_date'}
+
+
+def is_empty_payload(exc):
+    """
+    akshare 拿到空壳/残缺返回时的几种已知报错：
+      JSON 截断或空响应 (JSONDecodeError)
+      缺数据字段 (KeyError: '单位净值'，或 pandas 的 "['单位净值'] not in index" / "None of [...] are in the [columns]")
+      空表改列名 (ValueError: Length mismatch: Expected axis has 0 elements)
+      整段 JSON 是 null ('NoneType' object is not subscriptable)
+    其余的 ValueError/KeyError/TypeError 多半是代码或参数写错了，不在这里
+    """
+    if isinstance(exc, json.JSONDecodeError):
+        return True
+    if isinstance(exc, KeyError) and exc.args:
+        key = str(exc.args[0])
+        missing = key.endswith('not in index') or key.endswith('are in the [columns]')  # pandas 取列的两种报法
+        return key in PAYLOAD_KEYS or (missing and any(k in key for k in PAYLOAD_KEYS))
+    if isinstance(exc, ValueError):
+        return str(exc).startswith('Length mismatch: Expected axis has 0 elements')
+    if isinstance(exc, TypeError):
+        return "'NoneType' object is not subscriptable" in str(exc)
+    return False
+
+
+def classify(exc):
+    """把各种异常归到上面几类"""
+    if isinstance(exc, FetchError):
+        return exc
+    if isinstance(exc, requests.Timeout):
+        return UpstreamTimeout(str(exc))
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        if status in (429, 503):
+            return ThrottledError(f"HTTP {status}")
+        if status >= 500:
+            return TransientError(f"HTTP {status}")
+        return PermanentError(f"HTTP {status}")
+    if isinstance(exc, requests.ConnectionError):
+        # 连接池里的读超时也会包成 ConnectionError
+        if 'timed out' in str(exc).lower():
+            return UpstreamTimeout(str(exc))
+        return TransientError(str(exc))
+    if is_empty_payload(exc):
+        return EmptyPayloadError(f"{type(exc).__name__}: {exc}")
+    if isinstance(exc, (ValueError, KeyError, IndexError, TypeError, AttributeError, NameError)):
+        # 不认识的解析异常 = 代码/参数错了 (比如代码写错、基金已退市)，不重试，也别连累同站点的其它请求
+        return PermanentError(f"{type(exc).__name__}: {exc}")
+    # akshare 内部抛出的其它异常大多是网络抖动，按偶发处理
+    return TransientError(f"{type(exc).__name__}: {exc}")
+
+
+# 这几类说明上游顶不住了：并发减半 (每次调用最多一次)，退避起步更慢
+CONGESTION = (ThrottledError, UpstreamTimeout, EmptyPayloadError)
+# 上游明确说了 "慢点" 的：哪怕重试成功了，这次调用也算一次拥塞；空壳返回只有整次调用失败才算
+EXPLICIT_CONGESTION = (ThrottledError, UpstreamTimeout)
+
+
+# --- 2. 熔断器 ---
+
+class CircuitBreaker:
+    def __init__(self, fail_threshold=5, reset_timeout=30):
+        """
+        连续失败 fail_threshold 次 -> 熔断 (open)
+        熔断 reset_timeout 秒后放一个请求试探 (half_open)，成功就恢复
+        """
+        self.fail_threshold = fail_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.fail_threshold:
+                if self.state != 'open':
+                    print(f"🔌 熔断器打开 (连续失败 {self.failures} 次)")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+# --- 3. AIMD 自适应并发 ---
+
+class AIMDLimiter:
+    def __init__(self, initial=4, min_limit=1, max_limit=16):
+        """
+        加性增：每成功一轮 (limit 个请求) 并发 +1
+        乘性减：遇到限流/超时并发减半
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.inflight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+
+    def release(self):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_congestion(self):
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit / 2)
+
+
+# --- 4. 站点统计 ---
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.success = 0
+        self.errors = {}
+        self.latencies = deque(maxlen=500)  # 只留最近 500 次，够算分位数
+
+    def record(self, latency, kind=None):
+        self.requests += 1
+        self.latencies.append(latency)
+        if kind is None:
+            self.success += 1
+        else:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def snapshot(self):
+        lat = sorted(self.latencies)
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else None
+        return {
+            'requests': self.requests,
+            'success': self.success,
+            'success_rate': round(self.success / self.requests, 4) if self.requests else None,
+            'errors': dict(self.errors),
+            'latency_p50_ms': pct(0.5),
+            'latency_p95_ms': pct(0.95),
+        }
+
+
+# --- 5. 客户端 ---
+
+class FetchClient:
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20, fail_threshold=5,
+                 reset_timeout=30, initial_concurrency=4, max_concurrency=16):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cfg = dict(fail_threshold=fail_threshold, reset_timeout=reset_timeout,
+                         initial=initial_concurrency, max_limit=max_concurrency)
+        self.session = requests.Session()
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = {
+                    'breaker': CircuitBreaker(self._cfg['fail_threshold'], self._cfg['reset_timeout']),
+                    'limiter': AIMDLimiter(self._cfg['initial'], max_limit=self._cfg['max_limit']),
+                    'stats': HostStats(),
+                }
+            return self._hosts[host]
+
+    def _sleep_before_retry(self, attempt, err):
+        """全抖动 (full jitter) 指数退避；被限流 (含空壳返回) 时起步更慢"""
+        base = self.base_delay * (4 if isinstance(err, (ThrottledError, EmptyPayloadError)) else 1)
+        time.sleep(random.uniform(0, min(self.max_delay, base * (2 ** attempt))))
+
+    def call(self, host, fn, *args, validate=None, **kwargs):
+        """
+        在 host 的熔断器/并发闸门保护下调用 fn(*args, **kwargs)
+        validate: 可选，检查返回值是否正常 (比如 DataFrame 不为空)，不正常按空壳返回 (疑似限流) 重试
+        全部重试失败后抛出 FetchError 的子类 (原始异常在 __cause__)
+        熔断器和并发闸门按 "一次调用" 记账：重试几次都只算一次失败 / 一次拥塞，
+        一只代码写错或已退市的基金不会把整个站点熔断、连累其它基金
+        """
+        h = self._host(host)
+        last_err, last_exc, congested = None, None, False
+        for attempt in range(self.max_attempts):
+            if not h['breaker'].allow():
+                raise CircuitOpenError(f"{host} 熔断中，暂停请求")
+
+            h['limiter'].acquire()
+            t0 = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+                if validate is not None and not validate(result):
+                    raise EmptyPayloadError("返回数据为空或不完整")
+            except Exception as e:
+                err = classify(e)
+                h['stats'].record(time.monotonic() - t0, err.kind)
+                congested = congested or isinstance(err, EXPLICIT_CONGESTION)
+                last_err, last_exc = err, e
+            else:
+                h['stats'].record(time.monotonic() - t0)
+                h['breaker'].record_success()
+                if congested:
+                    h['limiter'].on_congestion()
+                else:
+                    h['limiter'].on_success()
+                return result
+            finally:
+                h['limiter'].release()
+
+            if not last_err.retryable or attempt == self.max_attempts - 1:
+                break
+            self._sleep_before_retry(attempt, last_err)
+
+        if isinstance(last_err, PermanentError):
+            # 上游好好地回了话，是这次请求本身不对：站点是健康的
+            h['breaker'].record_success()
+        else:
+            h['breaker'].record_failure()
+        if congested or isinstance(last_err, CONGESTION):
+            h['limiter'].on_congestion()
+        if last_exc is last_err:
+            raise last_err
+        raise last_err from last_exc
+
+    def get(self, url, host=None, timeout=(3, 10), **kwargs):
+        """带保护的 GET，4xx/5xx 会按状态码分类"""
+        host = host or urlparse(url).netloc
+
+        def _do():
+            resp = self.session.get(url, timeout=timeout, **kwargs)
+            resp.raise_for_status()
+            return resp
+
+        return self.call(host, _do)
+
+    def concurrency(self, host):
+        """当前给 host 的并发上限 (给线程池定大小用)"""
+        return int(self._host(host)['limiter'].limit)
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            host: dict(h['stats'].snapshot(), breaker=h['breaker'].state, concurrency=round(h['limiter'].limit, 2))
+            for host, h in hosts.items()
+        }
+
+    def export_stats(self, path=STATS_PATH):
+        """把各站点成功率/延迟写到文件，方便事后排查"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def print_stats(self):
+        for host, s in self.stats().items():
+            print(f"📶 {host}: 成功率 {s['success_rate']} | p50 {s['latency_p50_ms']}ms | "
+                  f"p95 {s['latency_p95_ms']}ms | 并发 {s['concurrency']} | 熔断 {s['breaker']} | 错误 {s['errors']}")
+
+
+# --- 全局默认客户端 (同一进程共享熔断/并发状态) ---
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = FetchClient()
+        return _default
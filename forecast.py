@@ -0,0 +1,247 @@
+# forecast.py
+# --- 预测工坊：整个自选池批量 ARIMA，多进程并行 ---
+# 阶数 (p,d,q) 每周才重新搜索一次，平时直接用缓存的阶数；
+# 拟合从昨天的参数热启动，收敛快很多。结果存库，日报直接读。
+
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from fund_matrix import load_nav_long
+from planner import FreshnessPlanner
+
+try:
+    from statsmodels.tsa.arima.model import ARIMA
+except ImportError:  # statsmodels 是可选依赖，没装就跳过预测
+    ARIMA = None
+
+HORIZON = 5
+SEARCH_P = range(0, 4)
+SEARCH_Q = range(0, 3)
+SEARCH_D = (1,)
+
+
+def _fit(values, order, start_params=None):
+    model = ARIMA(values, order=order)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if start_params is not None and len(start_params) == len(model.start_params):
+            return model.fit(start_params=np.asarray(start_params))
+        return model.fit()
+
+
+def fit_one(task):
+    """
+    子进程里跑的活：(可选) 搜阶数 -> 拟合 -> 预测 HORIZON 天
+    task: dict(code, values, order, start_params, search)
+    出错不抛异常，返回 error 字段，免得一只基金拖垮整个进程池
+    """
+    code = task['code']
+    values = task['values']
+    try:
+        order, start_params = task['order'], task['start_params']
+        if task['search'] or order is None:
+            best = None
+            for d in SEARCH_D:
+                for p in SEARCH_P:
+                    for q in SEARCH_Q:
+                        try:
+                            res = _fit(values, (p, d, q))
+                        except Exception:
+                            continue
+                        if best is None or res.aic < best[1].aic:
+                            best = ((p, d, q), res)
+            if best is None:
+                raise ValueError("所有阶数都拟合失败")
+            order, res = best
+            searched = True
+        else:
+            res = _fit(values, tuple(order), start_params)
+            searched = False
+
+        fc = res.get_forecast(HORIZON)
+        conf = np.asarray(fc.conf_int(alpha=0.2))  # 80% 区间
+        return {
+            'code': code,
+            'order': list(order),
+            'params': np.asarray(res.params).tolist(),
+            'searched': searched,
+            'mean': np.asarray(fc.predicted_mean).tolist(),
+            'lower': conf[:, 0].tolist(),
+            'upper': conf[:, 1].tolist(),
+        }
+    except Exception as e:
+        return {'code': code, 'error': f"{type(e).__name__}: {e}"}
+
+
+class ForecastService:
+    def __init__(self, engine, lookback=120, search_every_days=7, workers=None, planner=None):
+        """
+        lookback: 每只基金用最近多少个净值来拟合
+        search_every_days: 阶数搜索的间隔 (天)
+        workers: 进程数，默认 = CPU 核数
+        planner: FreshnessPlanner，预测日期按它的交易日历往后数 (跳过节假日)；不传就自己建一个
+        """
+        self.engine = engine
+        self.planner = planner or FreshnessPlanner(engine)
+        self.lookback = lookback
+        self.search_every = timedelta(days=search_every_days)
+        self.workers = workers or os.cpu_count()
+        self._init_table()
+
+    def _init_table(self):
+        """内部方法：模型缓存表 + 预测结果表"""
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS fund_forecast_model (
+                fund_code VARCHAR(10),
+                arima_order VARCHAR(20),
+                params TEXT,
+                searched_at DATE,
+                fitted_at DATE
+            );
+            """))
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS fund_forecast (
+                fund_code VARCHAR(10),
+                base_date DATE,
+                horizon INT,
+                forecast_date DATE,
+                forecast_nav DECIMAL(10, 4),
+                lower_nav DECIMAL(10, 4),
+                upper_nav DECIMAL(10, 4)
+            );
+            """))
+            conn.commit()
+
+    def _load_models(self, codes):
+        df = pd.read_sql(text("SELECT * FROM fund_forecast_model"), self.engine)
+        models = {}
+        for _, row in df.iterrows():
+            if row['fund_code'] in codes:
+                models[row['fund_code']] = {
+                    'order': json.loads(row['arima_order']),
+                    'params': json.loads(row['params']),
+                    'searched_at': pd.Timestamp(row['searched_at']).date(),
+                }
+        return models
+
+    def _save(self, results, models, base_dates):
+        today = date.today()
+        model_rows, fc_rows = [], []
+        for r in results:
+            code = r['code']
+            searched_at = today if r['searched'] else models[code]['searched_at']
+            model_rows.append({
+                'fund_code': code,
+                'arima_order': json.dumps(r['order']),
+                'params': json.dumps(r['params']),
+                'searched_at': searched_at,
+                'fitted_at': today,
+            })
+            base = day = base_dates[code]
+            for h in range(HORIZON):
+                day = self.planner.next_trading_day(day)
+                fc_rows.append({
+                    'fund_code': code,
+                    'base_date': base.date(),
+                    'horizon': h + 1,
+                    'forecast_date': day.date(),
+                    'forecast_nav': r['mean'][h],
+                    'lower_nav': r['lower'][h],
+                    'upper_nav': r['upper'][h],
+                })
+        if not model_rows:
+            return
+
+        codes = [row['fund_code'] for row in model_rows]
+        with self.engine.connect() as conn:
+            # 先删后存 (跟净值表一个套路)
+            for table in ('fund_forecast_model', 'fund_forecast'):
+                stmt = text(f"DELETE FROM {table} WHERE fund_code IN :codes")
+                stmt = stmt.bindparams(bindparam('codes', expanding=True))
+                conn.execute(stmt, parameters={"codes": codes})
+            conn.commit()
+        pd.DataFrame(model_rows).to_sql('fund_forecast_model', self.engine, if_exists='append', index=False)
+        pd.DataFrame(fc_rows).to_sql('fund_forecast', self.engine, if_exists='append', index=False)
+
+    def load_latest(self, codes):
+        """直接读库里上次的预测结果 (净值没更新的基金不用重拟合)"""
+        codes = list(codes)
+        if not codes:
+            return {}
+        stmt = text("SELECT fund_code, horizon, forecast_nav, lower_nav, upper_nav FROM fund_forecast "
+                    "WHERE fund_code IN :codes ORDER BY fund_code, horizon")
+        stmt = stmt.bindparams(bindparam('codes', expanding=True))
+        with self.engine.connect() as conn:
+            df = pd.read_sql(stmt, conn, params={'codes': codes})
+        results = {}
+        for code, g in df.groupby('fund_code'):
+            if len(g) == HORIZON:
+                results[code] = {
+                    'code': code,
+                    'mean': pd.to_numeric(g['forecast_nav']).tolist(),
+                    'lower': pd.to_numeric(g['lower_nav']).tolist(),
+                    'upper': pd.to_numeric(g['upper_nav']).tolist(),
+                }
+        return results
+
+    def run(self, codes):
+        """
+        指挥官：取数 -> 分派到进程池 -> 存库
+        返回 {基金代码: 结果 dict}
+        """
+        if ARIMA is None:
+            print("⚠️ 未安装 statsmodels，跳过 ARIMA 预测")
+            return {}
+
+        codes = list(codes)
+        start = pd.Timestamp.today() - pd.Timedelta(days=self.lookback * 2 + 30)
+        # 用每只基金自己的净值序列 (不跟别的基金对齐，免得 QDII 休市日被填出一串平盘)
+        hist = load_nav_long(self.engine, codes, start_date=start)
+        models = self._load_models(codes)
+        today = date.today()
+
+        tasks, base_dates = [], {}
+        for code, g in hist.groupby('fund_code'):
+            values = g['nav_value'].to_numpy(dtype=np.float64)[-self.lookback:]
+            if len(values) < 30:
+                continue
+            base_dates[code] = g['nav_date'].iloc[-1]
+            cached = models.get(code)
+            tasks.append({
+                'code': code,
+                'values': values,
+                'order': cached['order'] if cached else None,
+                'start_params': cached['params'] if cached else None,
+                'search': cached is None or today - cached['searched_at'] >= self.search_every,
+            })
+
+        n_search = sum(t['search'] for t in tasks)
+        print(f"📈 ARIMA 预测: {len(tasks)} 只基金 (其中 {n_search} 只重新搜索阶数)，{self.workers} 个进程")
+
+        results, ok = {}, []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for r in pool.map(fit_one, tasks, chunksize=max(1, len(tasks) // (self.workers * 4))):
+                if 'error' in r:
+                    print(f"⚠️ {r['code']} 预测失败: {r['error']}")
+                    continue
+                results[r['code']] = r
+                ok.append(r)
+
+        self._save(ok, models, base_dates)
+        return results
+
+
+def format_forecast_line(result, last_price):
+    """日报用：5 日后的预测值和涨跌"""
+    target = result['mean'][-1]
+    pct = (target - last_price) / last_price * 100
+    return (f"📈 {HORIZON}日预测: {target:.4f} ({pct:+.2f}%) "
+            f"区间 [{result['lower'][-1]:.4f}, {result['upper'][-1]:.4f}]")
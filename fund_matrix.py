@@ -0,0 +1,101 @@
+# fund_matrix.py
+# --- 矩阵工厂：把数据库长表 (fund_code, nav_date, nav_value) 变成对齐的 基金×日期 价格矩阵 ---
+# 排行、相关性、风险指标等批量计算都从这里取数，只查一次库、只对齐一次。
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+
+def load_nav_long(engine, codes=None, start_date=None, value_col='nav_value'):
+    """从 fund_nav_history 读长表 (一次 SQL 取回所有基金)"""
+    sql = f"SELECT fund_code, nav_date, {value_col} FROM fund_nav_history"
+    where = []
+    params = {}
+    if codes:
+        where.append("fund_code IN :codes")
+        params['codes'] = list(codes)
+    if start_date is not None:
+        where.append("nav_date >= :start")
+        params['start'] = pd.Timestamp(start_date).date()
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY fund_code, nav_date"
+
+    stmt = text(sql)
+    if codes:
+        stmt = stmt.bindparams(bindparam('codes', expanding=True))
+    with engine.connect() as conn:
+        df = pd.read_sql(stmt, conn, params=params)
+    df['nav_date'] = pd.to_datetime(df['nav_date'])
+    df[value_col] = pd.to_numeric(df[value_col])
+    return df
+
+
+class PriceMatrix:
+    """
+    对齐后的价格矩阵：values[i, j] = 第 i 只基金在第 j 个日期的净值
+    codes: 行标签 (基金代码)，dates: 列标签 (交易日，升序)
+    """
+
+    def __init__(self, codes, dates, values):
+        self.codes = list(codes)
+        self.dates = pd.DatetimeIndex(dates)
+        self.values = np.asarray(values, dtype=np.float64)
+        self._pos = {c: i for i, c in enumerate(self.codes)}
+
+    @classmethod
+    def from_long(cls, df, value_col='nav_value', ffill=True):
+        """
+        长表 -> 矩阵
+        ffill=True: 某只基金某天没发净值 (停牌/QDII 休市)，沿用上一次的净值；
+        首个净值之前保持 NaN，不会凭空造数据。
+        """
+        wide = df.pivot_table(index='fund_code', columns='nav_date', values=value_col, aggfunc='last')
+        wide = wide.sort_index(axis=1)
+        if ffill:
+            wide = wide.ffill(axis=1)
+        return cls(wide.index.astype(str), wide.columns, wide.to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_db(cls, engine, codes=None, start_date=None, ffill=True):
+        """一步到位：查库 + 对齐"""
+        return cls.from_long(load_nav_long(engine, codes, start_date), ffill=ffill)
+
+    def index_of(self, code):
+        return self._pos[code]
+
+    def reindex(self, codes):
+        """按给定顺序重排行，库里没有的基金补一整行 NaN"""
+        out = np.full((len(codes), self.values.shape[1]), np.nan)
+        for i, c in enumerate(codes):
+            if c in self._pos:
+                out[i] = self.values[self._pos[c]]
+        return PriceMatrix(codes, self.dates, out)
+
+    def tail(self, n):
+        """只保留最近 n 列 (视图切片，不拷贝)"""
+        return PriceMatrix(self.codes, self.dates[-n:], self.values[:, -n:])
+
+    def returns(self):
+        """日收益率矩阵 (比价格少一列)"""
+        v = self.values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return v[:, 1:] / v[:, :-1] - 1
+
+    def own_returns(self):
+        """
+        每只基金按自己的净值日期算收益 (配合 from_long(ffill=False) 用)：
+        没发净值的那天是 NaN (不是 0)，发了的那天 = 相对上一个净值的涨跌 (中间隔了休市日也算在这一天)
+        """
+        v = self.values
+        last = pd.DataFrame(v).ffill(axis=1).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return v[:, 1:] / last[:, :-1] - 1
+
+    def to_frame(self):
+        """转回 日期×基金 的 DataFrame (画图/展示用)"""
+        return pd.DataFrame(self.values.T, index=self.dates, columns=self.codes)
+
+    def __len__(self):
+        return len(self.codes)
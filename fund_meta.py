@@ -0,0 +1,263 @@
+# fund_meta.py
+# --- 基金元数据：代码、名称、拼音缩写、类型、对应 ETF，本地缓存 + 内存索引 ---
+# 全市场一万多只基金的名录 (ak.fund_name_em) 一周刷新一次，存库 (fund_meta) 也存一份本地文件。
+# 内存里建三套索引：代码 -> 行 (O(1) 查类别)、代码/拼音的有序数组 (二分找前缀)、名称的二元组倒排 (子串搜索)，
+# 看板的基金搜索框每敲一个字都能即时给出候选；实时监控按类别分赛道，不用再靠名字里有没有 "纳" 字。
+
+import json
+import os
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from fetch_client import get_client, EASTMONEY_HOST, not_empty
+
+META_PATH = os.path.join("data", "fund_meta.csv")
+CATEGORY_PATH = os.path.join("data", "fund_categories.json")  # 只有自选基金，realtime.py 读
+COLUMNS = ['fund_code', 'fund_name', 'pinyin', 'fund_type', 'category', 'etf_code']
+SHARE_CLASS = re.compile(r"[A-Z]$")  # 份额类别后缀：A/C/E/I ...
+
+
+def fetch_fund_meta(client=None, etf_overrides=None):
+    """
+    拉全市场基金名录，整理成 COLUMNS
+    category 取基金类型 "-" 前面的大类 (QDII / 指数型 / 混合型 / 债券型 ...)
+    etf_code: 联接基金 -> 场内 ETF；名字去掉 "联接" 和份额后缀，跟名录里的 ETF 名字对上就算；
+              对不上的可以用 etf_overrides ({基金代码: ETF 代码}，即 config.FUND_ETF_MAP) 补
+    """
+    client = client or get_client()
+    raw = client.call(EASTMONEY_HOST, ak.fund_name_em, validate=not_empty)
+    df = pd.DataFrame({
+        'fund_code': raw['基金代码'].astype(str).str.zfill(6),
+        'fund_name': raw['基金简称'].astype(str),
+        'pinyin': raw['拼音缩写'].astype(str).str.upper(),
+        'fund_type': raw['基金类型'].fillna('').astype(str),
+    })
+    df['category'] = df['fund_type'].str.split('-').str[0]
+    df = df.drop_duplicates('fund_code').reset_index(drop=True)
+
+    # 联接基金 -> ETF：一次字典查找
+    etf_by_name = {name: code for code, name in zip(df['fund_code'], df['fund_name'])
+                   if name.endswith('ETF')}
+    stem = df['fund_name'].str.replace('联接', '', regex=False).str.replace(SHARE_CLASS, '', regex=True)
+    linked = df['fund_name'].str.contains('ETF联接', regex=False)
+    df['etf_code'] = np.where(linked, stem.map(etf_by_name), None)
+    for code, etf in (etf_overrides or {}).items():
+        df.loc[df['fund_code'] == code, 'etf_code'] = etf
+    return df[COLUMNS]
+
+
+class FundIndex:
+    """
+    基金名录的内存索引
+      lookup / category     代码 -> 一行，O(1)
+      search                代码前缀、拼音前缀、名称子串，按这个优先级排序
+    """
+
+    def __init__(self, meta):
+        meta = meta.reset_index(drop=True)
+        self.meta = meta
+        self.codes = meta['fund_code'].to_numpy(dtype=object)
+        self.names = meta['fund_name'].to_numpy(dtype=object)
+        self._row = {code: i for i, code in enumerate(self.codes)}
+
+        # 前缀：排好序的 (键, 行号)，前缀查询 = 二分出一个区间
+        self._code_keys, self._code_rows = self._sorted(self.codes)
+        self._pinyin_keys, self._pinyin_rows = self._sorted(meta['pinyin'].fillna('').str.upper())
+
+        # 子串：名称的单字/二元组倒排表，查询时取最短的几张表求交，再逐个确认
+        grams = defaultdict(list)
+        for i, name in enumerate(self.names):
+            for g in self._grams(name):
+                grams[g].append(i)
+        self._grams_index = {g: np.array(rows, dtype=np.int64) for g, rows in grams.items()}
+
+    @staticmethod
+    def _sorted(keys):
+        keys = np.asarray(keys, dtype=object)
+        order = np.argsort(keys, kind='stable')
+        return list(keys[order]), order
+
+    @staticmethod
+    def _grams(s):
+        s = s.upper()
+        return set(s) | {s[i:i + 2] for i in range(len(s) - 1)}
+
+    def __len__(self):
+        return len(self.codes)
+
+    # --- O(1) 查找 ---
+
+    def lookup(self, code):
+        """一只基金的元数据 (dict)，不在名录里返回 None"""
+        i = self._row.get(code)
+        return None if i is None else self.meta.iloc[i].to_dict()
+
+    def category(self, code, default=None):
+        i = self._row.get(code)
+        return default if i is None else self.meta.at[i, 'category']
+
+    def categories(self, codes):
+        """{代码: 大类}，给 StrategyRouter.assign_sectors 用"""
+        return {c: self.meta.at[self._row[c], 'category'] for c in codes if c in self._row}
+
+    def etf_links(self, codes=None):
+        """{联接基金代码: ETF 代码}"""
+        df = self.meta.dropna(subset=['etf_code'])
+        if codes is not None:
+            df = df[df['fund_code'].isin(list(codes))]
+        return dict(zip(df['fund_code'], df['etf_code']))
+
+    # --- 搜索 ---
+
+    def _prefix(self, keys, rows, prefix):
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + '\uffff')
+        return rows[lo:hi]
+
+    def _substring(self, query):
+        q = query.upper()
+        grams = [q] if len(q) == 1 else [q[i:i + 2] for i in range(len(q) - 1)]
+        postings = [self._grams_index.get(g) for g in set(grams)]
+        if any(p is None for p in postings):
+            return np.empty(0, dtype=np.int64)
+        postings.sort(key=len)
+        hits = postings[0]
+        for p in postings[1:]:
+            hits = np.intersect1d(hits, p, assume_unique=True)
+            if not len(hits):
+                return hits
+        return np.array([i for i in hits if q in self.names[i].upper()], dtype=np.int64)
+
+    def search(self, query, limit=20):
+        """
+        搜索框用：代码前缀 > 拼音缩写前缀 > 名称包含，去重后取前 limit 个
+        返回 DataFrame (COLUMNS)
+        """
+        query = (query or '').strip()
+        if not query:
+            return self.meta.iloc[0:0]
+        seen, picked = set(), []
+        sources = []
+        if query.isdigit():
+            sources.append(self._prefix(self._code_keys, self._code_rows, query))
+        if query.isascii() and query.isalnum():
+            sources.append(self._prefix(self._pinyin_keys, self._pinyin_rows, query.upper()))
+        sources.append(self._substring(query))
+        for rows in sources:
+            for i in rows:
+                if i not in seen:
+                    seen.add(i)
+                    picked.append(i)
+                    if len(picked) >= limit:
+                        return self.meta.iloc[picked]
+        return self.meta.iloc[picked]
+
+
+# --- 存取 ---
+
+def init_table(engine):
+    with engine.connect() as conn:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fund_meta (
+            fund_code VARCHAR(10) PRIMARY KEY,
+            fund_name VARCHAR(100),
+            pinyin VARCHAR(50),
+            fund_type VARCHAR(30),
+            category VARCHAR(20),
+            etf_code VARCHAR(10),
+            updated_at DATETIME
+        );
+        """))
+        conn.commit()
+
+
+def load_meta_db(engine):
+    return pd.read_sql(text(f"SELECT {', '.join(COLUMNS)} FROM fund_meta"), engine)
+
+
+def etf_map(engine, codes, overrides=None):
+    """{基金代码: ETF 代码}：名录里自动配上的联接关系 + 手动指定的 (手动优先)"""
+    init_table(engine)
+    stmt = text("SELECT fund_code, etf_code FROM fund_meta WHERE fund_code IN :codes AND etf_code IS NOT NULL")
+    stmt = stmt.bindparams(bindparam('codes', expanding=True))
+    with engine.connect() as conn:
+        df = pd.read_sql(stmt, conn, params={'codes': list(codes)})
+    links = dict(zip(df['fund_code'], df['etf_code']))
+    links.update(overrides or {})
+    return {c: s for c, s in links.items() if c in set(codes)}
+
+
+def save_meta_file(meta, path=META_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    meta.to_csv(path, index=False)
+
+
+def load_meta_file(path=META_PATH, max_age_days=None):
+    """本地缓存文件；不存在或者过期返回 None"""
+    if not os.path.exists(path):
+        return None
+    age = (datetime.now().timestamp() - os.path.getmtime(path)) / 86400
+    if max_age_days is not None and age > max_age_days:
+        return None
+    return pd.read_csv(path, dtype={'fund_code': str, 'etf_code': str})
+
+
+def refresh_fund_meta(engine, max_age_days=7, etf_overrides=None, force=False):
+    """
+    晚间任务：库里的名录超过 max_age_days 天才重新拉 (先删后存)，顺手写本地文件
+    返回名录 DataFrame
+    """
+    init_table(engine)
+    with engine.connect() as conn:
+        last = conn.execute(text("SELECT MAX(updated_at) FROM fund_meta")).scalar()
+    if not force and last is not None and datetime.now() - pd.Timestamp(last) < pd.Timedelta(days=max_age_days):
+        meta = load_meta_db(engine)
+        save_meta_file(meta)
+        return meta
+
+    meta = fetch_fund_meta(etf_overrides=etf_overrides)
+    with engine.connect() as conn:
+        conn.execute(text("DELETE FROM fund_meta"))
+        conn.commit()
+    meta.assign(updated_at=datetime.now()).to_sql(
+        'fund_meta', engine, if_exists='append', index=False, method='multi', chunksize=1000)
+    save_meta_file(meta)
+    print(f"📇 基金名录已刷新: {len(meta)} 只")
+    return meta
+
+
+def save_categories(meta, codes, path=CATEGORY_PATH):
+    """
+    晚间任务：只把自选基金的 {代码: 基金类型} 写成一个小 JSON，给不连库的 realtime.py 用 (CI 上随 data/ 缓存)
+    存完整的 "大类-小类" (比如 指数型-海外股票)，StrategyRouter 的 categories 既能按大类也能按小类匹配
+    """
+    rows = meta[meta['fund_code'].isin(set(codes))]
+    types = rows['fund_type'].fillna('').where(lambda t: t != '', rows['category'])
+    cats = {c: t for c, t in zip(rows['fund_code'], types) if isinstance(t, str) and t}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(cats, f, ensure_ascii=False, indent=2)
+    return len(cats)
+
+
+def load_categories(path=CATEGORY_PATH):
+    """
+    不连库的地方 (realtime.py) 用：读晚间写好的类别表，绝不现拉全市场名录
+    没有就返回空，调用方按名称关键字分赛道
+    """
+    if not os.path.exists(path):
+        print(f"⚠️ 没有基金类别表 ({path})，分赛道只按名称关键字")
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 基金类别表读取失败，分赛道只按名称关键字: {e}")
+        return {}
@@ -1,52 +1,126 @@
 # main.py
 # --- 终极指挥官：调度所有模块，一键运行 ---
 
-import time
-import requests
+import argparse
 import config
 from data_engine import DataEngine
 from analysis import FundAnalyzer
-
-def send_wechat(title, content):
-    """发送微信消息 (调用 PushPlus)"""
-    url = 'http://www.pushplus.plus/send'
-    data = {
-        "token": config.PUSH_CONFIG['token'],
-        "title": title,
-        "content": content,
-        "template": "html"
-    }
-    try:
-        resp = requests.post(url, json=data)
-        print(f"📨 微信推送状态: {resp.text}")
-    except Exception as e:
-        print(f"❌ 推送失败: {e}")
+import notifier
+from estimate_store import get_store, sync_to_db
+from planner import FreshnessPlanner, save_late, load_late, save_calendar
+from fund_meta import refresh_fund_meta, save_categories
+from volume_price import DEFAULT_FUND_ETF_MAP
+from notifier import send_wechat
+from watchlist import load_watchlists, union_funds, fan_out
 
 def job():
     print("\n⏰ ========= 量化机器人启动 =========")
     
+    # 0. 规划：哪些基金此刻理应有新净值、但库里还没有
+    # 多份自选清单只抓/算并集，最后再按清单分发
+    watchlists = load_watchlists()
+    funds = union_funds(watchlists)
+    print(f"📋 {len(watchlists)} 份自选清单，共 {len(funds)} 只不重复的基金")
+    engine = DataEngine()
+    planner = FreshnessPlanner(engine.engine)
+    plan = planner.plan(funds, engine.last_nav_dates())
+    # 盘中任务不连库：把交易日历抄一份进 data/ (随缓存带过去)，节假日就不轮询了
+    save_calendar(planner.calendar)
+    if not plan['due']:
+        reason = "休市日" if not plan['trading_day'] else "所有基金都已是最新"
+        print(f"😴 {reason}，今天不用跑")
+        # 不用跑也把信箱里以前没发出去的补发掉
+        notifier.flush()
+        return
+    print(f"🗓️ 需要更新 {len(plan['due'])} 只，已是最新 {len(plan['fresh'])} 只")
+
     # 1. 启动引擎：更新数据
     print("Step 1: 更新数据库...")
-    engine = DataEngine()
-    engine.run_all()
+    # 全市场基金名录 (类别、联接 ETF) 一周刷新一次
+    try:
+        meta = refresh_fund_meta(engine.engine, getattr(config, 'FUND_META_REFRESH_DAYS', 7),
+                                 getattr(config, 'FUND_ETF_MAP', DEFAULT_FUND_ETF_MAP))
+        # 盘中任务不连库也不拉名录，只读这份自选基金的类别表 (随 data/ 缓存带过去)
+        save_categories(meta, funds)
+    except Exception as e:
+        print(f"⚠️ 基金名录刷新失败，沿用旧的: {e}")
+    summary = engine.run_all(plan['due'])
+    planner.record(engine.fingerprints)
+
+    # 晚发布的基金 (QDII 之类) 不在这里干等：日报先发 (注明净值缺失)，记下来交给补抓任务 (main.py --late)
+    late = planner.behind(plan, engine.last_nav_dates())
+    save_late(late, plan)
+    if late:
+        print(f"⏳ {len(late)} 只基金净值还没出 ({', '.join(late.values())})，留给补抓任务")
+    # 顺手把前几天的盘中估值日志压成列文件，再把最近几天同步进库 (看板不在 runner 上，只能从库里读)
+    get_store().compact_all()
+    try:
+        sync_to_db(engine.engine, days=getattr(config, 'ESTIMATE_SYNC_DAYS', 7))
+    except Exception as e:
+        print(f"⚠️ 盘中估值同步失败: {e}")
     
     # 2. 启动大脑：分析数据
     print("\nStep 2: 量化分析中...")
     brain = FundAnalyzer()
-    report = brain.run_analysis()
+    # 净值没变化的基金，指标/图表直接复用上次的结果
+    result = brain.analyze(funds, changed=set(summary['updated']))
+
+    def render(wl):
+        # 还没出的放在日报最上面，补抓到了会另推一份
+        missing = [f"{name} (应有 {plan['expected'][code].date()})" for code, name in late.items() if code in wl['funds']]
+        note = "⚠️ 净值缺失: " + "、".join(missing) if missing else ""
+        # 汇总表 + 缩略图的 HTML，按推送长度上限分页
+        return brain.compose_pages(result, wl['funds'], note)
     
-    # 3. 发送报告
+    # 3. 发送报告：每份清单只拿自己那几只，用自己的 token
     print("\nStep 3: 推送微信...")
-    # 把换行符 \n 变成 HTML 的 <br>，这样微信里才能换行
-    wechat_content = report.replace('\n', '<br>')
-    
-    send_wechat(
-        title="符清华的基金日报",
-        content=wechat_content
-    )
+    fan_out(watchlists, render, "符清华的基金日报", send_wechat)
+    # 推送在后台发，这里最多等一会儿；没发完的留在信箱里 (data/outbox.db，CI 上随 data/ 缓存) 下次补发
+    notifier.flush()
     
     print("✅ ========= 任务全部完成 =========")
 
+def late_job():
+    """
+    补抓任务：主任务之后隔一会儿跑 (CI 上是单独的 cron)，只抓主任务记下的晚发布基金
+    抓到了就按主任务同样的流程分析 (只有这几只重算)，给关注它们的清单补推一份；还没出的继续留着
+    """
+    print("\n⏰ ========= 补抓晚发布的净值 =========")
+    pending = load_late()
+    if not pending:
+        print("😴 没有待补抓的基金")
+        notifier.flush()
+        return
+    watchlists = load_watchlists()
+    funds = union_funds(watchlists)
+    engine = DataEngine()
+    planner = FreshnessPlanner(engine.engine)
+    plan = planner.plan({c: n for c, n in pending.items() if c in funds}, engine.last_nav_dates())
+    summary = engine.run_all(plan['due'], with_etf=False) if plan['due'] else {'updated': []}
+    planner.record(engine.fingerprints)
+    late = planner.behind(plan, engine.last_nav_dates())
+    save_late(late, plan)
+
+    arrived = {c: n for c, n in pending.items() if c in funds and c not in late}
+    print(f"📥 补抓到 {len(arrived)} 只，还没出 {len(late)} 只")
+    if arrived:
+        brain = FundAnalyzer()
+        result = brain.analyze(funds, changed=set(summary['updated']))
+
+        def render(wl):
+            picked = {c: n for c, n in wl['funds'].items() if c in arrived}
+            return brain.compose_pages(result, picked) if picked else None
+
+        fan_out(watchlists, render, "符清华的基金日报 (补发: 晚到的净值)", send_wechat)
+    notifier.flush()
+    print("✅ ========= 补抓完成 =========")
+
 if __name__ == "__main__":
-    # 这里以后可以加定时任务，现在先手动跑一次
-    job()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="晚间复盘")
+    parser.add_argument('--late', action='store_true', help="补抓任务：只抓主任务记下的晚发布基金")
+    args = parser.parse_args()
+
+    if args.late:
+        late_job()
+    else:
+        job()
\ No newline at end of file
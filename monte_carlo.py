@@ -0,0 +1,133 @@
+# monte_carlo.py
+# --- 蒙特卡洛：策略跑赢死拿，是本事还是运气？ ---
+# Backtest.run 只有一条历史、一个收益数字。这里把历史日收益按块重抽样 (保留短期的涨跌惯性)，
+# 拼出成千上万条 "另一种可能的历史"，排成 路径×日期 的矩阵，策略在整块矩阵上一次向量化跑完，
+# 给出收益、回撤、超额收益的置信区间。路径按批生成，内存只跟批大小有关，跟总路径数无关。
+
+import numpy as np
+import pandas as pd
+
+from risk_metrics import TRADING_DAYS
+from strategy_lang import Strategy, StrategySyntaxError, equity_curves, positions
+
+METHODS = ('block', 'iid', 'shuffle')
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def daily_returns(prices):
+    """净值 -> 日收益 (去掉 NaN)"""
+    prices = np.asarray(prices, dtype=np.float64)
+    prices = prices[~np.isnan(prices)]
+    return prices[1:] / prices[:-1] - 1
+
+
+def sample_indices(rng, n_obs, n_paths, length, method='block', block=20):
+    """
+    抽样下标矩阵 (路径 × 天)
+      block    循环块自助法：随机起点连续取 block 天，首尾相接 (保留波动聚集和短期趋势)
+      iid      逐日有放回抽样 (不保留任何时序结构)
+      shuffle  历史收益原样打乱顺序 (长度只能等于历史长度；总收益不变，只看买卖时机的运气)
+    """
+    if method == 'block':
+        n_blocks = -(-length // block)
+        starts = rng.integers(0, n_obs, size=(n_paths, n_blocks))
+        idx = (starts[:, :, None] + np.arange(block)[None, None, :]) % n_obs
+        return idx.reshape(n_paths, -1)[:, :length]
+    if method == 'iid':
+        return rng.integers(0, n_obs, size=(n_paths, length))
+    if method == 'shuffle':
+        if length != n_obs:
+            raise ValueError("shuffle 只能打乱原样长度的历史 (years 请留空)")
+        return rng.permuted(np.broadcast_to(np.arange(n_obs), (n_paths, n_obs)), axis=1)
+    raise ValueError(f"未知的抽样方法: {method}")
+
+
+def price_paths(rets, idx, start=1.0):
+    """按下标取日收益，复利成净值路径 (第 0 天 = start)"""
+    paths = np.empty((idx.shape[0], idx.shape[1] + 1))
+    paths[:, 0] = start
+    np.cumprod(1 + rets[idx], axis=1, out=paths[:, 1:])
+    paths[:, 1:] *= start
+    return paths
+
+
+def _max_drawdown(curves):
+    """最大回撤 (负数)；模拟路径没有 NaN，用不着 risk_metrics.max_drawdown 的峰谷定位"""
+    return (curves / np.maximum.accumulate(curves, axis=1)).min(axis=1) - 1
+
+
+def simulate_chunk(strategy, paths):
+    """一批路径上跑策略：每条路径的策略/死拿 总收益和最大回撤"""
+    signals = strategy.evaluate(paths)
+    sell = signals.get('sell', np.zeros(paths.shape, dtype=bool))
+    equity = equity_curves(paths, positions(signals['buy'], sell))
+    hold = paths / paths[:, :1]
+    return {
+        'return': equity[:, -1] - 1,
+        'max_dd': _max_drawdown(equity),
+        'hold_return': hold[:, -1] - 1,
+        'hold_max_dd': _max_drawdown(hold),
+    }
+
+
+class MonteCarlo:
+    def __init__(self, strategy, n_paths=10000, years=None, method='block', block=20,
+                 chunk=1000, seed=None):
+        """
+        strategy: 规则文本或编译好的 Strategy
+        n_paths: 路径数
+        years: 每条路径多长 (年)，留空 = 跟历史一样长
+        method / block: 抽样方法和块长 (见 sample_indices)
+        chunk: 每批多少条路径 (内存 ≈ chunk × 天数 × 8 字节 × 十来个中间矩阵)
+        seed: 随机种子，固定后结果可复现
+        """
+        self.strategy = strategy if isinstance(strategy, Strategy) else Strategy(strategy)
+        if 'buy' not in self.strategy.outputs:
+            raise StrategySyntaxError("策略里至少要有一条 buy 规则")
+        if method not in METHODS:
+            raise ValueError(f"未知的抽样方法: {method}")
+        self.n_paths = n_paths
+        self.years = years
+        self.method = method
+        self.block = block
+        self.chunk = chunk
+        self.seed = seed
+
+    def run(self, prices):
+        """
+        prices: 一只基金的历史净值 (一维)
+        返回每条路径一行的 DataFrame: return, max_dd, hold_return, hold_max_dd, excess (都是小数)
+        """
+        rets = daily_returns(prices)
+        if len(rets) < self.block * 2:
+            raise ValueError(f"历史太短 ({len(rets)} 天)，不够做重抽样")
+        length = int(self.years * TRADING_DAYS) if self.years else len(rets)
+        rng = np.random.default_rng(self.seed)
+
+        parts = []
+        for done in range(0, self.n_paths, self.chunk):
+            n = min(self.chunk, self.n_paths - done)
+            idx = sample_indices(rng, len(rets), n, length, self.method, self.block)
+            parts.append(simulate_chunk(self.strategy, price_paths(rets, idx)))
+
+        out = pd.DataFrame({k: np.concatenate([p[k] for p in parts]) for k in parts[0]})
+        out['excess'] = out['return'] - out['hold_return']
+        return out
+
+
+def confidence_table(results, quantiles=QUANTILES):
+    """各指标的分位数和均值 (百分数)"""
+    table = (results.quantile(list(quantiles)) * 100).T
+    table.columns = [f"p{int(q * 100)}" for q in quantiles]
+    table['mean'] = results.mean() * 100
+    return table
+
+
+def beat_probability(results):
+    """策略跑赢死拿的路径占比"""
+    return float((results['excess'] > 0).mean())
+
+
+def actual_rank(results, actual_excess):
+    """真实历史的超额收益在模拟分布里排第几 (0~1)：太靠前要怀疑是运气好"""
+    return float((results['excess'] < actual_excess).mean())
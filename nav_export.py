@@ -0,0 +1,190 @@
+# nav_export.py
+# --- 净值历史导出：数据库 -> 本地分区文件 (Parquet/CSV)，流式读、分块写，内存只跟块大小有关 ---
+# pd.read_sql 一次把整张 fund_nav_history 读进内存，全市场历史在 CI runner 上吃不消。
+# 这里用服务端游标 (stream_results) 按块拉数据，每块按分区键 (基金代码 / 年份) 拆开各写一个 part 文件，
+# 目录是 hive 风格 (fund_code=012363/、year=2024/)。研究 notebook、参数优化直接用 scan() 只读要的那几片。
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 是可选依赖，没装就导出 CSV
+    pa = pq = None
+
+EXPORT_DIR = os.path.join("data", "nav_export")
+COLUMNS = ['fund_code', 'fund_name', 'nav_date', 'nav_value', 'daily_growth']
+PARTITIONS = ('fund_code', 'year')
+MANIFEST = "_manifest.json"
+
+
+def iter_history(engine, codes=None, start_date=None, chunksize=50000):
+    """
+    按块流式读取 fund_nav_history (服务端游标，不会一次取回整张表)
+    按 (基金, 日期) 排序：同一只基金的数据连续到达，按基金分区时每只基金只落在一两个块里
+    """
+    sql = f"SELECT {', '.join(COLUMNS)} FROM fund_nav_history"
+    where, params = [], {}
+    if codes:
+        where.append("fund_code IN :codes")
+        params['codes'] = list(codes)
+    if start_date is not None:
+        where.append("nav_date >= :start")
+        params['start'] = pd.Timestamp(start_date).date()
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY fund_code, nav_date"
+    stmt = text(sql)
+    if codes:
+        stmt = stmt.bindparams(bindparam('codes', expanding=True))
+
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(stmt, conn, params=params, chunksize=chunksize):
+            yield _normalize(chunk)
+
+
+def _normalize(chunk):
+    """DECIMAL 读回来是 object (Decimal)，转成定长 float64 / datetime64，列式写出时不用再逐个转换"""
+    chunk['nav_date'] = pd.to_datetime(chunk['nav_date'])
+    chunk['nav_value'] = pd.to_numeric(chunk['nav_value']).astype(np.float64)
+    chunk['daily_growth'] = pd.to_numeric(chunk['daily_growth']).astype(np.float64)
+    return chunk
+
+
+def _partition_keys(chunk, partition):
+    if partition == 'fund_code':
+        return chunk['fund_code']
+    return chunk['nav_date'].dt.year
+
+
+def _write_part(df, path, fmt):
+    if fmt == 'parquet':
+        # from_pandas 对 float64 / datetime64 列直接复用 numpy 缓冲区
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, path, compression='zstd')
+    else:
+        df.to_csv(path, index=False, date_format='%Y-%m-%d')
+
+
+def export_history(engine, root=EXPORT_DIR, partition='fund_code', fmt=None, codes=None,
+                   start_date=None, chunksize=50000):
+    """
+    导出到 root/<partition>=<值>/part-<块号>.<格式>
+    partition: 'fund_code' (按基金取数快) 或 'year' (按时间段取数快)
+    fmt: 'parquet' / 'csv'，默认有 pyarrow 就 parquet
+    先写临时目录，全部写完再换掉旧的，导出到一半失败不影响旧数据
+    返回清单 dict (行数、分区、格式)
+    """
+    if partition not in PARTITIONS:
+        raise ValueError(f"分区只能是 {PARTITIONS}: {partition}")
+    fmt = fmt or ('parquet' if pa is not None else 'csv')
+    if fmt == 'parquet' and pa is None:
+        print("⚠️ 没装 pyarrow，改为导出 CSV")
+        fmt = 'csv'
+
+    tmp = root.rstrip(os.sep) + '.tmp'
+    if os.path.isdir(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    rows, parts, values = 0, 0, set()
+    for i, chunk in enumerate(iter_history(engine, codes, start_date, chunksize)):
+        keys = _partition_keys(chunk, partition)
+        for key, df in chunk.groupby(keys, sort=False):
+            part_dir = os.path.join(tmp, f"{partition}={key}")
+            os.makedirs(part_dir, exist_ok=True)
+            _write_part(df, os.path.join(part_dir, f"part-{i:05d}.{fmt}"), fmt)
+            values.add(str(key))
+            parts += 1
+        rows += len(chunk)
+        print(f"📤 已导出 {rows} 行 ({len(values)} 个分区)")
+
+    manifest = {
+        'format': fmt,
+        'partition': partition,
+        'rows': rows,
+        'files': parts,
+        'partitions': sorted(values),
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(tmp, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    os.replace(tmp, root)
+    print(f"✅ 导出完成: {rows} 行 -> {root} ({fmt}, 按 {partition} 分区, {parts} 个文件)")
+    return manifest
+
+
+def read_manifest(root=EXPORT_DIR):
+    with open(os.path.join(root, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def scan(root=EXPORT_DIR, codes=None, start_date=None, end_date=None, columns=None):
+    """
+    从导出目录读一个切片，返回跟 fund_matrix.load_nav_long 一样的长表 (按基金、日期排好序)
+    按分区目录名先剪枝：按基金分区时只打开这几只基金的目录，按年分区时只打开涉及的年份
+    """
+    manifest = read_manifest(root)
+    partition, fmt = manifest['partition'], manifest['format']
+    if fmt == 'parquet' and pq is None:
+        raise ImportError("这份导出是 Parquet 格式，读取需要 pip install pyarrow")
+    columns = list(columns or ['fund_code', 'nav_date', 'nav_value'])
+    need = list(dict.fromkeys(columns + ['fund_code', 'nav_date']))
+    start = pd.Timestamp(start_date) if start_date is not None else None
+    end = pd.Timestamp(end_date) if end_date is not None else None
+
+    values = manifest['partitions']
+    if partition == 'fund_code' and codes:
+        wanted = set(codes)
+        values = [v for v in values if v in wanted]
+    elif partition == 'year':
+        values = [v for v in values
+                  if (start is None or int(v) >= start.year) and (end is None or int(v) <= end.year)]
+
+    frames = []
+    for value in values:
+        part_dir = os.path.join(root, f"{partition}={value}")
+        for name in sorted(os.listdir(part_dir)):
+            path = os.path.join(part_dir, name)
+            if fmt == 'parquet':
+                filters = [('fund_code', 'in', list(codes))] if codes and partition == 'year' else None
+                frames.append(pq.read_table(path, columns=need, filters=filters).to_pandas())
+            else:
+                frames.append(pd.read_csv(path, usecols=need, dtype={'fund_code': str}, parse_dates=['nav_date']))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.concat(frames, ignore_index=True)
+    mask = np.ones(len(df), dtype=bool)
+    if codes and partition == 'year':
+        mask &= df['fund_code'].isin(list(codes)).to_numpy()
+    if start is not None:
+        mask &= (df['nav_date'] >= start).to_numpy()
+    if end is not None:
+        mask &= (df['nav_date'] <= end).to_numpy()
+    df = df[mask].sort_values(['fund_code', 'nav_date'], kind='stable')
+    return df[columns].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from data_engine import DataEngine
+
+    parser = argparse.ArgumentParser(description="净值历史导出到本地分区文件")
+    parser.add_argument('--partition', choices=PARTITIONS, default='fund_code')
+    parser.add_argument('--format', choices=('parquet', 'csv'), default=None)
+    parser.add_argument('--root', default=EXPORT_DIR)
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    export_history(DataEngine().engine, args.root, args.partition, args.format, chunksize=args.chunksize)
@@ -0,0 +1,263 @@
+# notifier.py
+# --- 推送信箱：先落盘，再由后台线程慢慢发 ---
+# 主流程只负责往本地 SQLite 队列里扔消息，推送接口卡住/挂掉都不会拖住定时任务；
+# 没发出去的消息留在队列里，下次启动接着发。
+# 本地/常驻运行时 data/outbox.db 一直在；GitHub Actions 的 runner 用完即删，
+# 两个 workflow 都用 actions/cache 把 data/ 带到下一次运行 (缓存没命中时，上次没发完的就丢了)。
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import requests
+
+import config
+
+PUSHPLUS_URL = 'http://www.pushplus.plus/send'
+# PushPlus 返回码里只有 500 (系统异常，请稍后再试) 值得重试；
+# 903 无效令牌、900 账号受限、888 积分不足、905 未实名... 重试多少次结果都一样，直接判死
+PUSHPLUS_RETRYABLE = {500}
+OUTBOX_PATH = os.path.join("data", "outbox.db")
+
+
+def split_html(content, max_chars):
+    """
+    超长 HTML 按 <br> 切段，尽量不把标签劈成两半
+    单段本身就超长的，只能硬切
+    """
+    if len(content) <= max_chars:
+        return [content]
+    chunks, current = [], ""
+    for part in content.split('<br>'):
+        piece = part if not current else '<br>' + part
+        if len(current) + len(piece) <= max_chars:
+            current += piece
+            continue
+        if current:
+            chunks.append(current)
+        while len(part) > max_chars:
+            chunks.append(part[:max_chars])
+            part = part[max_chars:]
+        current = part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Outbox:
+    def __init__(self, path=OUTBOX_PATH, url=PUSHPLUS_URL, timeout=(3, 10), max_attempts=6,
+                 backoff=2.0, dedup_window=3600, max_chars=15000):
+        """
+        timeout: (连接超时, 读取超时) 秒
+        backoff: 第 n 次失败后等 backoff * 2^n 秒 (带随机抖动) 再重试
+        dedup_window: 同一条消息在这么多秒内只发一次
+        max_chars: 单条推送的最大字符数，超过就拆成几条
+        """
+        self.path = path
+        self.url = url
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.dedup_window = dedup_window
+        self.max_chars = max_chars
+
+        self.session = requests.Session()  # 复用 TCP 连接
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._init_table()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _init_table(self):
+        """内部方法：确保队列表存在"""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                token TEXT,
+                title TEXT,
+                content TEXT,
+                digest TEXT,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_try REAL,
+                created_at REAL,
+                sent_at REAL,
+                last_error TEXT
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, next_try)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_digest ON outbox (digest, created_at)")
+
+    # --- 生产者 ---
+
+    def enqueue(self, title, content, token=None):
+        """
+        消息入队 (立即返回，不等网络)
+        返回实际入队的条数：0 = 被去重 / 没配 token
+        """
+        token = token or config.PUSH_CONFIG.get('token')
+        if not token:
+            print("⚠️ 未配置 Push Token，跳过发送")
+            return 0
+
+        digest = hashlib.sha1(f"{token}|{title}|{content}".encode('utf-8')).hexdigest()
+        now = time.time()
+        with self._connect() as conn:
+            dup = conn.execute(
+                "SELECT 1 FROM outbox WHERE digest = ? AND created_at > ? AND status != 'dead' LIMIT 1",
+                (digest, now - self.dedup_window)
+            ).fetchone()
+            if dup:
+                print(f"🔁 相同消息 {self.dedup_window} 秒内已推送过，跳过: {title}")
+                return 0
+
+            chunks = split_html(content, self.max_chars)
+            rows = []
+            for i, chunk in enumerate(chunks, 1):
+                t = title if len(chunks) == 1 else f"{title} ({i}/{len(chunks)})"
+                rows.append((token, t, chunk, digest, now, now))
+            conn.executemany(
+                "INSERT INTO outbox (token, title, content, digest, next_try, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+        print(f"📮 已放入推送信箱: {title} ({len(rows)} 条)")
+        self._wake.set()
+        return len(rows)
+
+    # --- 消费者 ---
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def _next_due(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT id, token, title, content, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_try <= ? ORDER BY id LIMIT 1",
+                (time.time(),)
+            ).fetchone()
+
+    def _post(self, token, title, content):
+        """
+        真正发一条，返回 (错误描述, 能否重试)；成功返回 (None, False)
+        网络错误、超时、HTTP 429/5xx、PushPlus 500 算临时故障，其余 (令牌无效、账号受限...) 不重试
+        """
+        data = {"token": token, "title": title, "content": content, "template": "html"}
+        try:
+            resp = self.session.post(self.url, json=data, timeout=self.timeout)
+        except requests.RequestException as e:
+            return f"{type(e).__name__}: {e}", True
+        if resp.status_code != 200:
+            return f"HTTP {resp.status_code}", resp.status_code == 429 or resp.status_code >= 500
+        try:
+            body = resp.json()
+        except ValueError:
+            return f"非 JSON 响应: {resp.text[:100]}", True
+        if body.get('code') != 200:
+            return f"PushPlus 拒绝 ({body.get('code')}): {body.get('msg')}", body.get('code') in PUSHPLUS_RETRYABLE
+        return None, False
+
+    def process_once(self):
+        """发一条到期的消息；没有可发的返回 False"""
+        row = self._next_due()
+        if row is None:
+            return False
+        msg_id, token, title, content, attempts = row
+        error, retryable = self._post(token, title, content)
+        with self._connect() as conn:
+            if error is None:
+                conn.execute("UPDATE outbox SET status = 'sent', sent_at = ? WHERE id = ?", (time.time(), msg_id))
+                print(f"📨 微信推送成功: {title}")
+            else:
+                attempts += 1
+                if not retryable or attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                        (attempts, error, msg_id)
+                    )
+                    reason = f"已重试 {attempts} 次" if retryable else "不可重试"
+                    print(f"💀 推送彻底失败 ({reason}): {title} - {error}")
+                else:
+                    delay = self.backoff * (2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+                    conn.execute(
+                        "UPDATE outbox SET attempts = ?, next_try = ?, last_error = ? WHERE id = ?",
+                        (attempts, time.time() + delay, error, msg_id)
+                    )
+                    print(f"⏳ 推送失败，{delay:.1f} 秒后重试: {title} - {error}")
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if self.process_once():
+                continue
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+
+    def start(self):
+        """启动后台发送线程 (守护线程，主程序退出不会被它挡住)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='outbox-sender', daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self, timeout=30):
+        """
+        任务收尾时调用：最多等 timeout 秒，让队列尽量发完
+        返回还剩多少条没发 (留给下次运行：CI 上要靠 workflow 缓存 data/ 才能带过去)
+        """
+        self.start()
+        self._wake.set()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            left = self.pending_count()
+            if left == 0:
+                return 0
+            time.sleep(0.2)
+        left = self.pending_count()
+        print(f"⚠️ 还有 {left} 条推送未完成，留在信箱里下次再发")
+        return left
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.session.close()
+
+
+# --- 全局默认信箱 (main.py / realtime.py 共用) ---
+_default = None
+
+
+def get_outbox():
+    global _default
+    if _default is None:
+        _default = Outbox(
+            timeout=getattr(config, 'PUSH_TIMEOUT', (3, 10)),
+            dedup_window=getattr(config, 'PUSH_DEDUP_SECONDS', 3600),
+            max_chars=getattr(config, 'PUSH_MAX_CHARS', 15000),
+        ).start()
+    return _default
+
+
+def send_wechat(title, content, token=None):
+    """发送微信消息 (PushPlus)：入队后立刻返回，由后台线程负责投递"""
+    return get_outbox().enqueue(title, content, token)
+
+
+def flush(timeout=None):
+    """等信箱发完 (有上限)，脚本结束前调用"""
+    if timeout is None:
+        timeout = getattr(config, 'PUSH_FLUSH_SECONDS', 30)
+    return get_outbox().flush(timeout)
@@ -0,0 +1,150 @@
+# overview.py
+# --- 自选总览快照：晚间任务把每只基金的最新指标算好存一张表，看板总览页只读这一张表 ---
+# 看板以前只能一只一只看，每换一只都要查一次库、重算一遍指标。
+# 现在晚间分析顺手把 最新净值 / RSI / 距下轨 / 信号 / 策略 vs 持有 存进 fund_overview_snapshot，
+# 总览页一条 SELECT 取回整张表，基金再多打开也一样快；点某一行再进单只基金的详细页。
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from fund_matrix import load_nav_long
+
+COLUMNS = ['fund_code', 'fund_name', 'nav_date', 'nav_value', 'rsi', 'dist_to_low', 'signal_text',
+           'strategy_return', 'hold_return', 'excess', 'rsi_threshold']
+INDICATOR_DAYS = 120  # 跟日报一样，RSI/布林带只用最近 120 个净值算 (FundAnalyzer.get_fund_data)
+
+
+def classify(rsi, dist_to_low):
+    """日报 / 总览共用的信号判定"""
+    if rsi < 37:
+        return "💎 极度超卖"
+    if dist_to_low < 0:
+        return "🔥 跌破下轨"
+    if rsi > 70:
+        return "🚨 过热"
+    return "☁️ 观望"
+
+
+def _rsi(nav):
+    change = np.diff(nav, prepend=np.nan)
+    s = pd.Series(change)
+    avg_gain = s.clip(lower=0).ewm(alpha=1/14, adjust=False).mean()
+    avg_loss = s.clip(upper=0).abs().ewm(alpha=1/14, adjust=False).mean()
+    return (100 - 100 / (1 + avg_gain / avg_loss)).to_numpy()
+
+
+def fund_row(nav, rsi_threshold=37):
+    """
+    一只基金的净值序列 (升序 numpy 数组) -> 总览一行的数值部分
+    策略 vs 持有 跟看板的 "收益率大比拼" 一样：RSI < 阈值时持有，信号次日生效，全历史
+    """
+    recent = nav[-INDICATOR_DAYS:]
+    rsi = _rsi(recent)[-1]
+    lower = np.nan
+    if len(recent) >= 20:
+        window = recent[-20:]
+        lower = window.mean() - 2 * window.std(ddof=1)
+    dist = 0.0 if np.isnan(lower) else (recent[-1] - lower) / lower * 100
+
+    full_rsi = _rsi(nav)
+    rets = np.zeros(len(nav))
+    rets[1:] = nav[1:] / nav[:-1] - 1
+    held = np.zeros(len(nav))
+    held[1:] = full_rsi[:-1] < rsi_threshold
+    strategy = (np.prod(1 + held * rets) - 1) * 100
+    hold = (nav[-1] / nav[0] - 1) * 100
+    return {
+        'nav_value': float(nav[-1]),
+        'rsi': float(rsi),
+        'dist_to_low': float(dist),
+        'signal_text': classify(rsi, dist),
+        'strategy_return': float(strategy),
+        'hold_return': float(hold),
+        'excess': float(strategy - hold),
+    }
+
+
+def build_overview(long_df, names, rsi_threshold=37):
+    """长表 (load_nav_long) -> 总览 DataFrame (COLUMNS)，每只基金按它自己的净值日期算，不做跨基金对齐"""
+    rows = []
+    for code, g in long_df.groupby('fund_code', sort=False):
+        nav = g['nav_value'].to_numpy(dtype=np.float64)
+        if len(nav) < 2:
+            continue
+        row = fund_row(nav, rsi_threshold)
+        row.update(fund_code=code, fund_name=names.get(code, code),
+                   nav_date=g['nav_date'].iloc[-1].date(), rsi_threshold=rsi_threshold)
+        rows.append(row)
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+# --- 存取 ---
+
+def init_table(engine):
+    with engine.connect() as conn:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fund_overview_snapshot (
+            fund_code VARCHAR(10) PRIMARY KEY,
+            fund_name VARCHAR(100),
+            nav_date DATE,
+            nav_value DOUBLE,
+            rsi DOUBLE,
+            dist_to_low DOUBLE,
+            signal_text VARCHAR(50),
+            strategy_return DOUBLE,
+            hold_return DOUBLE,
+            excess DOUBLE,
+            rsi_threshold DOUBLE,
+            updated_at DATETIME
+        );
+        """))
+        conn.commit()
+
+
+def save_overview(engine, df):
+    """先删后存 (只动这次算了的基金)"""
+    if df.empty:
+        return
+    with engine.connect() as conn:
+        stmt = text("DELETE FROM fund_overview_snapshot WHERE fund_code IN :codes")
+        stmt = stmt.bindparams(bindparam('codes', expanding=True))
+        conn.execute(stmt, parameters={"codes": list(df['fund_code'])})
+        conn.commit()
+    df.assign(updated_at=datetime.now()).to_sql('fund_overview_snapshot', engine, if_exists='append', index=False)
+
+
+def load_overview(engine, codes=None):
+    """看板用：一条 SELECT 取回快照 (codes 为空就是整张表)"""
+    sql = f"SELECT {', '.join(COLUMNS)}, updated_at FROM fund_overview_snapshot"
+    params = {}
+    if codes:
+        sql += " WHERE fund_code IN :codes"
+        params['codes'] = list(codes)
+    stmt = text(sql)
+    if codes:
+        stmt = stmt.bindparams(bindparam('codes', expanding=True))
+    with engine.connect() as conn:
+        return pd.read_sql(stmt, conn, params=params)
+
+
+def update_overview(engine, funds, changed=None, rsi_threshold=37):
+    """
+    指挥官：晚间分析后调用
+    funds: {代码: 名称}；changed: 这次有新净值的基金，其余基金快照里已有就不重算 (None = 全部重算)
+    阈值改了的话整张快照重算
+    """
+    init_table(engine)
+    codes = list(funds)
+    if changed is not None:
+        have = load_overview(engine, codes)
+        stale = set(have.loc[have['rsi_threshold'] != rsi_threshold, 'fund_code'])
+        codes = [c for c in codes if c in changed or c in stale or c not in set(have['fund_code'])]
+    if not codes:
+        return pd.DataFrame(columns=COLUMNS)
+    df = build_overview(load_nav_long(engine, codes), funds, rsi_threshold)
+    save_overview(engine, df)
+    print(f"📋 总览快照已更新: {len(df)} 只")
+    return df
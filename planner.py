@@ -0,0 +1,225 @@
+# planner.py
+# --- 数据新鲜度规划：今天到底要抓哪些基金？ ---
+# 本地存一份交易日历 (trade_calendar)，再从历史里学每只基金的净值发布滞后 (A 股基金当晚出，QDII 常常 T+1/T+2)。
+# 晚上跑任务前先算：每只基金 "此刻理应能拿到" 的最新净值日期，库里已经有了就不抓；
+# 一只都不用抓 (休市日) 就整个任务跳过；抓完还没出的记进 data/late_funds.json，日报照常先发 (注明净值缺失)，
+# 由晚一点的补抓任务 (main.py --late) 再去抓，不在主任务里干等。
+
+import json
+import os
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import config
+from fetch_client import get_client
+
+SINA_HOST = 'finance.sina.com.cn'  # ak.tool_trade_date_hist_sina 的数据源
+LAG_HISTORY = 20     # 用最近多少次发布记录来学滞后
+LAG_QUANTILE = 0.8   # 取滞后的 80 分位：偶尔一次特别晚的不算数
+LATE_PATH = os.path.join("data", "late_funds.json")  # 还没追上的基金，留给补抓任务 (CI 上随 data/ 缓存)
+CALENDAR_PATH = os.path.join("data", "trade_calendar.json")  # 交易日历的小副本，给不连库的 realtime.py 用
+
+
+class FreshnessPlanner:
+    def __init__(self, engine):
+        self.engine = engine
+        self._init_table()
+        self.calendar = self._load_calendar()
+
+    def _init_table(self):
+        """内部方法：交易日历 + 发布记录 (某只基金某个净值日期第一次被抓到是哪天)"""
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS trade_calendar (
+                trade_date DATE PRIMARY KEY
+            );
+            """))
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS fund_publish_log (
+                fund_code VARCHAR(10),
+                nav_date DATE,
+                seen_date DATE,
+                lag_days INT
+            );
+            """))
+            conn.commit()
+
+    # --- 交易日历 ---
+
+    def _load_calendar(self):
+        """读本地日历；没有或者已经用到头了 (新浪的日历一次给到年底)，才去网上刷新"""
+        df = pd.read_sql(text("SELECT trade_date FROM trade_calendar ORDER BY trade_date"), self.engine)
+        cal = pd.DatetimeIndex(pd.to_datetime(df['trade_date']))
+        today = pd.Timestamp.today().normalize()
+        if len(cal) and cal[-1] >= today:
+            return cal
+
+        try:
+            fresh = get_client().call(SINA_HOST, ak.tool_trade_date_hist_sina)
+            dates = pd.to_datetime(fresh['trade_date']).drop_duplicates().sort_values()
+            with self.engine.connect() as conn:
+                conn.execute(text("DELETE FROM trade_calendar"))
+                conn.commit()
+            pd.DataFrame({'trade_date': dates.dt.date}).to_sql(
+                'trade_calendar', self.engine, if_exists='append', index=False, method='multi', chunksize=1000)
+            print(f"📆 交易日历已刷新 (到 {dates.iloc[-1].date()})")
+            return pd.DatetimeIndex(dates)
+        except Exception as e:
+            if len(cal):
+                print(f"⚠️ 交易日历刷新失败，继续用旧的: {e}")
+                return cal
+            # 一份都没有：先按工作日凑合 (节假日会被当成交易日，多抓一次而已)
+            print(f"⚠️ 交易日历获取失败，暂按工作日处理: {e}")
+            return pd.bdate_range('2015-01-01', today + pd.Timedelta(days=366))
+
+    def is_trading_day(self, day):
+        return pd.Timestamp(day).normalize() in self.calendar
+
+    def _pos(self, day):
+        """day 当天或之前最近一个交易日在日历里的位置"""
+        return int(self.calendar.searchsorted(pd.Timestamp(day).normalize(), side='right')) - 1
+
+    def next_trading_day(self, day=None):
+        """day (默认今天) 之后的下一个交易日；日历用到头了就按工作日推"""
+        day = pd.Timestamp(day if day is not None else pd.Timestamp.today()).normalize()
+        pos = int(self.calendar.searchsorted(day, side='right'))
+        return self.calendar[pos] if pos < len(self.calendar) else day + pd.offsets.BDay(1)
+
+    def days_left_in_month(self, day):
+        """day 所在的月份里，从 day (含) 起还剩几个交易日"""
+        day = pd.Timestamp(day).normalize()
+        month_end = day + pd.offsets.MonthEnd(0)
+        lo = self.calendar.searchsorted(day, side='left')
+        hi = self.calendar.searchsorted(month_end, side='right')
+        return int(hi - lo)
+
+    def trading_days_between(self, start, end):
+        """从 start 到 end 隔了几个交易日 (向量化，start/end 可以是数组)"""
+        s = self.calendar.searchsorted(pd.DatetimeIndex(pd.to_datetime(start)), side='right') - 1
+        e = self.calendar.searchsorted(pd.DatetimeIndex(pd.to_datetime(end)), side='right') - 1
+        return np.maximum(np.asarray(e) - np.asarray(s), 0)
+
+    # --- 发布滞后 ---
+
+    def publish_lags(self, codes):
+        """
+        每只基金的发布滞后 (交易日)：最近 LAG_HISTORY 次记录的 LAG_QUANTILE 分位
+        config.PUBLISH_LAG 可以手动指定某只基金；没有记录的默认 0 (当晚出)
+        """
+        df = pd.read_sql(text("SELECT fund_code, nav_date, lag_days FROM fund_publish_log"), self.engine)
+        df = df[df['fund_code'].isin(list(codes))].sort_values(['fund_code', 'nav_date'])
+        learned = (df.groupby('fund_code')['lag_days']
+                     .apply(lambda s: int(np.ceil(s.tail(LAG_HISTORY).quantile(LAG_QUANTILE))))
+                     .to_dict())
+        manual = getattr(config, 'PUBLISH_LAG', {})
+        return {c: manual.get(c, learned.get(c, 0)) for c in codes}
+
+    def record(self, fingerprints, today=None):
+        """
+        ETL 抓到新净值后记一笔：净值日期 -> 第一次看到的日子，滞后用交易日算
+        fingerprints: DataEngine.run_all 之后的 engine.fingerprints {基金代码: (最新日期, 行数, 哈希)}
+        """
+        if not fingerprints:
+            return
+        today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        df = pd.DataFrame({
+            'fund_code': list(fingerprints),
+            'nav_date': [pd.Timestamp(fp[0]) for fp in fingerprints.values()],
+        })
+        seen = pd.read_sql(text("SELECT fund_code, nav_date FROM fund_publish_log"), self.engine)
+        seen['nav_date'] = pd.to_datetime(seen['nav_date'])
+        df = df.merge(seen, on=['fund_code', 'nav_date'], how='left', indicator=True)
+        df = df[df['_merge'] == 'left_only'].drop(columns='_merge')
+        if df.empty:
+            return
+        df['seen_date'] = today
+        df['lag_days'] = self.trading_days_between(df['nav_date'], df['seen_date'])
+        df['nav_date'] = df['nav_date'].dt.date
+        df['seen_date'] = df['seen_date'].dt.date
+        df.to_sql('fund_publish_log', self.engine, if_exists='append', index=False)
+
+    # --- 规划 ---
+
+    def expected_dates(self, codes, today=None):
+        """按各自的滞后，每只基金此刻理应能拿到的最新净值日期"""
+        pos = self._pos(today or pd.Timestamp.today())
+        lags = self.publish_lags(codes)
+        return {c: self.calendar[max(pos - lags[c], 0)] for c in codes}
+
+    def plan(self, funds, last_dates, today=None):
+        """
+        funds: {基金代码: 名称}
+        last_dates: 库里每只基金的最新净值日期 (DataEngine 的指纹表里有)
+        返回 dict:
+          trading_day  今天是不是交易日
+          due          要抓的 {代码: 名称} (库里的还没追上理应有的日期)
+          fresh        不用抓的代码
+          expected     {代码: 理应有的日期}
+        """
+        today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        expected = self.expected_dates(list(funds), today)
+        due, fresh = {}, []
+        for code, name in funds.items():
+            last = last_dates.get(code)
+            if last is not None and pd.Timestamp(last) >= expected[code]:
+                fresh.append(code)
+            else:
+                due[code] = name
+        return {'trading_day': self.is_trading_day(today), 'due': due, 'fresh': fresh, 'expected': expected}
+
+    @staticmethod
+    def behind(plan, last_dates):
+        """抓完之后还没追上的 (晚发布的)"""
+        return {c: n for c, n in plan['due'].items()
+                if last_dates.get(c) is None or pd.Timestamp(last_dates[c]) < plan['expected'][c]}
+
+
+# --- 晚发布基金：主任务记下来，补抓任务接着抓 ---
+
+def save_late(late, plan, path=LATE_PATH):
+    """late: {代码: 名称}；记下名称和理应有的日期。一只都没有就把文件删掉"""
+    if not late:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {c: {'name': n, 'expected': str(pd.Timestamp(plan['expected'][c]).date())} for c, n in late.items()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_late(path=LATE_PATH):
+    """{代码: 名称}，没有待补抓的就是空"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return {c: v['name'] for c, v in json.load(f).items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+# --- 交易日历副本：晚间任务写，不连库的盘中任务读 ---
+
+def save_calendar(calendar, path=CALENDAR_PATH, since=None):
+    """只存 since (默认 30 天前) 以后的交易日，盘中任务只关心今天"""
+    since = pd.Timestamp(since or pd.Timestamp.today() - pd.Timedelta(days=30)).normalize()
+    days = pd.DatetimeIndex(calendar)
+    days = days[days >= since]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([str(d.date()) for d in days], f)
+
+
+def load_calendar(path=CALENDAR_PATH):
+    """DatetimeIndex；没有或者读不了返回 None，调用方按工作日凑合"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return pd.DatetimeIndex(pd.to_datetime(json.load(f)))
+    except (OSError, ValueError, TypeError):
+        return None
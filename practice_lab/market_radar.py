@@ -3,6 +3,13 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
+import os
+import sys
+
+# 复用主目录的排行引擎
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fund_matrix import PriceMatrix
+from ranking import MomentumRanker
 
 # Mac 字体设置
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']
@@ -21,47 +28,37 @@ sectors = {
 
 print("📡 正在扫描全市场热门赛道...")
 
-ranking_data = []
+frames = []
 
-# --- 2. 循环抓取数据 ---
+# --- 2. 循环抓取数据 (只负责下载，计算交给排行引擎) ---
 for code, name in sectors.items():
     print(f"   正在分析: {name}...")
     try:
         df = ak.fund_open_fund_info_em(symbol=code, indicator="单位净值走势")
-        df['净值日期'] = pd.to_datetime(df['净值日期'])
-        df['单位净值'] = pd.to_numeric(df['单位净值'])
-        df = df.sort_values('净值日期')
-        
-        # --- 3. 计算动量 (Momentum) ---
-        # 动量 = (现在的价格 - N天前的价格) / N天前的价格
-        # 我们看两个周期：
-        # 短期 (5天): 爆发力
-        # 中期 (20天): 趋势强度
-        
-        latest_price = df.iloc[-1]['单位净值']
-        
-        # 5日涨幅
-        price_5d_ago = df.iloc[-6]['单位净值'] # 倒数第6天
-        mom_5d = (latest_price - price_5d_ago) / price_5d_ago * 100
-        
-        # 20日涨幅
-        price_20d_ago = df.iloc[-21]['单位净值']
-        mom_20d = (latest_price - price_20d_ago) / price_20d_ago * 100
-        
-        ranking_data.append({
-            '板块': name,
-            '短期爆发 (5日)': mom_5d,
-            '中期趋势 (20日)': mom_20d,
-            '综合得分': mom_5d + mom_20d  # 简单加权
-        })
-        
+        df = df.rename(columns={'净值日期': 'nav_date', '单位净值': 'nav_value'})
+        df['nav_date'] = pd.to_datetime(df['nav_date'])
+        df['nav_value'] = pd.to_numeric(df['nav_value'])
+        df['fund_code'] = code
+        frames.append(df[['fund_code', 'nav_date', 'nav_value']])
     except Exception as e:
         print(f"❌ {name} 获取失败: {e}")
 
+# --- 3. 计算动量 (Momentum) ---
+# 动量 = (现在的价格 - N天前的价格) / N天前的价格
+# 我们看两个周期：短期 (5天) 爆发力 + 中期 (20天) 趋势强度，简单相加
+# 所有基金对齐成一个矩阵，一次切片算完
+matrix = PriceMatrix.from_long(pd.concat(frames, ignore_index=True))
+ranker = MomentumRanker({5: 1.0, 20: 1.0})
+result = ranker.rank(matrix, k=len(matrix))
+
 # --- 4. 生成排行榜 ---
-rank_df = pd.DataFrame(ranking_data)
-# 按综合得分从高到低排序
-rank_df = rank_df.sort_values('综合得分', ascending=False).reset_index(drop=True)
+rank_df = result['top'].rename(columns={
+    'mom_5d': '短期爆发 (5日)',
+    'mom_20d': '中期趋势 (20日)',
+    'score': '综合得分',
+})
+rank_df.insert(0, '板块', [sectors[c] for c in rank_df.index])
+rank_df = rank_df.reset_index(drop=True)
 
 print("\n🏆 全市场战力排行榜 (Momentum Ranking):")
 print(rank_df)
@@ -0,0 +1,120 @@
+# ranking.py
+# --- 动量排行引擎：一个价格矩阵 + 数组切片，一次算完所有基金的多周期动量 ---
+
+import numpy as np
+import pandas as pd
+
+from fund_matrix import PriceMatrix
+
+# 默认权重：5日爆发力 + 20日趋势 (跟 market_radar 的 "综合得分" 一样是简单相加)
+DEFAULT_WEIGHTS = {5: 1.0, 20: 1.0}
+
+
+class MomentumRanker:
+    def __init__(self, weights=None):
+        """
+        weights: {周期天数: 权重}，例如 {5: 0.3, 20: 0.5, 60: 0.2}
+        """
+        weights = weights or DEFAULT_WEIGHTS
+        self.horizons = np.array(sorted(weights), dtype=np.int64)
+        self.weights = np.array([weights[h] for h in self.horizons], dtype=np.float64)
+
+    def momentum(self, matrix):
+        """
+        多周期动量 (%)，返回 (基金数, 周期数) 的数组
+        动量 = (最新价 - N天前的价) / N天前的价，N 天前 = 倒数第 N+1 列
+        历史不够长的基金对应位置为 NaN
+        """
+        prices = matrix.values
+        n_dates = prices.shape[1]
+        mom = np.full((prices.shape[0], len(self.horizons)), np.nan)
+        ok = self.horizons < n_dates
+        if ok.any():
+            latest = prices[:, -1:]
+            past = prices[:, -1 - self.horizons[ok]]  # 花式索引：一次取出所有周期的起点列
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mom[:, ok] = (latest - past) / past * 100
+        return mom
+
+    def score(self, mom):
+        """加权综合得分 (任何一个周期缺数据 -> NaN，不参与排名)"""
+        return mom @ self.weights
+
+    @staticmethod
+    def top_k(scores, k):
+        """前 k 名下标 (argpartition 选出 k 个，再只对这 k 个排序)"""
+        valid = np.flatnonzero(~np.isnan(scores))
+        k = min(k, len(valid))
+        if k == 0:
+            return valid
+        part = valid[np.argpartition(-scores[valid], k - 1)[:k]]
+        return part[np.argsort(-scores[part], kind='stable')]
+
+    @staticmethod
+    def bottom_k(scores, k):
+        """后 k 名下标 (最弱的排最前)"""
+        valid = np.flatnonzero(~np.isnan(scores))
+        k = min(k, len(valid))
+        if k == 0:
+            return valid
+        part = valid[np.argpartition(scores[valid], k - 1)[:k]]
+        return part[np.argsort(scores[part], kind='stable')]
+
+    def top_k_by_sector(self, scores, codes, sectors, k):
+        """
+        分板块取前 k 名
+        sectors: {基金代码: 板块名}，没登记的基金归到 "其他"
+        """
+        labels = np.array([sectors.get(c, '其他') for c in codes])
+        names, group = np.unique(labels, return_inverse=True)
+        result = {}
+        for g, name in enumerate(names):
+            members = np.flatnonzero(group == g)
+            picked = self.top_k(scores[members], k)
+            result[str(name)] = members[picked]
+        return result
+
+    def rank(self, matrix, k=5, sectors=None):
+        """
+        指挥官：算动量 -> 打分 -> 选前/后 k 名
+        返回 dict: table (全部基金的动量表), top, bottom, by_sector
+        """
+        mom = self.momentum(matrix)
+        scores = self.score(mom)
+        codes = np.array(matrix.codes)
+
+        table = pd.DataFrame(mom, index=codes, columns=[f'mom_{h}d' for h in self.horizons])
+        table['score'] = scores
+
+        result = {
+            'table': table,
+            'top': table.iloc[self.top_k(scores, k)],
+            'bottom': table.iloc[self.bottom_k(scores, k)],
+        }
+        if sectors:
+            by_sector = self.top_k_by_sector(scores, matrix.codes, sectors, k)
+            result['by_sector'] = {name: table.iloc[idx] for name, idx in by_sector.items()}
+        return result
+
+
+# --- 测试代码 ---
+if __name__ == "__main__":
+    import config
+    from analysis import FundAnalyzer
+    from watchlist import union_funds
+
+    weights = getattr(config, 'MOMENTUM_WEIGHTS', DEFAULT_WEIGHTS)
+    sectors = getattr(config, 'FUND_SECTORS', None)
+
+    brain = FundAnalyzer()
+    # 最长周期再多留一些余量，节省读库量
+    start = pd.Timestamp.today() - pd.Timedelta(days=int(max(weights)) * 2 + 30)
+    matrix = PriceMatrix.from_db(brain.engine, start_date=start)
+
+    ranker = MomentumRanker(weights)
+    out = ranker.rank(matrix, k=5, sectors=sectors)
+    names = union_funds()
+    print("\n🏆 动量排行榜 (Top 5):")
+    print(out['top'].rename(index=lambda c: names.get(c, c)))
+    print("\n💩 垫底 (Bottom 5):")
+    print(out['bottom'].rename(index=lambda c: names.get(c, c)))
@@ -3,13 +3,34 @@
 # 修改日志：
 # 1. 移除数据库依赖，改用 Akshare 现场抓取历史数据，解决 GitHub Action 连不上库的问题。
 # 2. 增加 CPO/5G 策略通道。
+# 3. 策略分流改为配置表 (strategy_router.py)，向量化判定。
+# 4. 新增常驻模式 (--daemon)：开盘加载一次历史，盘中定时轮询，只在信号变化时推送。
+# 5. 抓到的估值写入 estimate_store (按天只追加的二进制日志)。
+# 6. 估值不靠谱的基金 (estimate_accuracy 体检结果) 先扣偏差，RSI 再打折。
+# 7. 基金类型从晚间任务写好的小类别表 (fund_meta.save_categories) 查，按类别分赛道；查不到才按名称关键字。
+# 8. 多份自选清单：估值只抓并集一次，信号按清单分发到各自的 token。
+# 9. 常驻模式按交易日历 (晚间任务抄进 data/ 的副本) 判断休市，节假日不预热也不轮询。
 
 import requests
 import json
 import re
+import signal
+import argparse
+import threading
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
 import pandas as pd
 import akshare as ak  # 必须确保 requirements.txt 里有 akshare
 import config 
+import notifier
+from notifier import send_wechat
+from fetch_client import get_client, EASTMONEY_HOST, not_empty
+from strategy_router import StrategyRouter
+import estimate_store
+from estimate_accuracy import load_reliability, debias, shrink_rsi
+from fund_meta import load_categories
+from planner import load_calendar
+from watchlist import load_watchlists, union_funds, fan_out, pick
 
 def get_realtime_estimate(code):
     """
@@ -17,11 +38,14 @@ def get_realtime_estimate(code):
     """
     url = f"http://fundgz.1234567.com.cn/js/{code}.js"
     try:
-        resp = requests.get(url, timeout=3)
+        resp = get_client().get(url, timeout=3)
         match = re.search(r'jsonpgz\((.*?)\);', resp.text)
         if match:
             data = json.loads(match.group(1))
-            return float(data['gszzl']), data['gztime']
+            growth, gztime = float(data['gszzl']), data['gztime']
+            # 每次抓到的估值都落盘，盘中走势/估值准确度分析都靠它
+            estimate_store.record(code, growth, gztime)
+            return growth, gztime
         return None, None
     except Exception as e:
         print(f"❌ {code} 实时估值抓取失败: {e}")
@@ -34,7 +58,10 @@ def calculate_realtime_rsi_online(code, current_growth):
     try:
         # 1. 临时抓取最近的历史净值 (利用 Akshare)
         # indicator="单位净值走势" 能抓到该基金所有历史数据
-        df_hist = ak.fund_open_fund_info_em(symbol=code, indicator="单位净值走势")
+        df_hist = get_client().call(
+            EASTMONEY_HOST, ak.fund_open_fund_info_em,
+            symbol=code, indicator="单位净值走势", validate=not_empty
+        )
         
         # 2. 清洗数据
         df_hist = df_hist[['净值日期', '单位净值']]
@@ -74,100 +101,219 @@ def calculate_realtime_rsi_online(code, current_growth):
         print(f"⚠️ {code} RSI 计算出错 (Akshare): {e}")
         return None
 
-def send_wechat(title, content):
-    """发送微信 (PushPlus)"""
-    if not config.PUSH_CONFIG['token']: 
-        print("⚠️ 未配置 Push Token，跳过发送")
-        return
-        
-    url = 'http://www.pushplus.plus/send'
-    data = {
-        "token": config.PUSH_CONFIG['token'],
-        "title": title,
-        "content": content,
-        "template": "html"
-    }
-    try:
-        requests.post(url, json=data)
-        print("📨 微信推送已发出")
-    except Exception as e:
-        print(f"❌ 推送报错: {e}")
+def format_rsi(rsi, adjusted=None, weight=1.0):
+    """RSI 文字：永远显示原始 RSI；打过折的另外注明打折后的值 (信号是按打折后的判的)"""
+    if pd.isna(rsi):
+        return "RSI:N/A"
+    msg = f"RSI:{rsi:.1f}"
+    if weight < 1 and adjusted is not None and not pd.isna(adjusted):
+        msg += f"，打折后 {adjusted:.1f}"
+    return msg
+
+def format_signal_line(code, name, growth, rsi, action, color, weight=1.0, adjusted=None):
+    """
+    构造 HTML 消息行  格式： 基金名: +1.5% (RSI:65.0) <br> [操作建议]
+    rsi 是原始 RSI；adjusted 是按估值可信度打折后的 RSI (weight < 1 时一起显示)
+    """
+    line = f"<b>{name}</b> ({code}): <span style='color:{'red' if growth>0 else 'green'}'>{growth}%</span> ({format_rsi(rsi, adjusted, weight)}) <br><span style='color:{color}'>{action}</span>"
+    if weight < 1:
+        line += f" <span style='color:gray'>(估值可信度 {weight:.0%}，信号按打折后的 RSI 判)</span>"
+    return line
+
+def fund_categories(codes):
+    """
+    基金类型 {代码: 大类-小类}：读晚间任务写好的小类别表 (data/fund_categories.json)，config.FUND_CATEGORIES 手动指定的优先
+    盘中不拉全市场名录；表里没有的基金交给 StrategyRouter 按名称关键字分
+    """
+    categories = {c: cat for c, cat in load_categories().items() if c in set(codes)}
+    categories.update(getattr(config, 'FUND_CATEGORIES', None) or {})
+    return categories
 
 def job_1450():
     print(f"⏰ 14:50 实时监控启动 (Cloud Mode)...")
-    msg_lines = []
     
-    # 遍历配置里的基金列表
-    for code, name in config.MY_FUNDS.items():
+    # 1. 侦察：先把所有基金的实时涨幅和 RSI 收集齐
+    reliability = load_reliability()
+    watchlists = load_watchlists()
+    codes, names, growths, rsis = [], [], [], []
+    for code, name in union_funds(watchlists).items():
         print(f"正在侦察: {name} ({code})...")
         growth, update_time = get_realtime_estimate(code)
         
         if growth is None:
             print(f"  -> 无法获取估值，跳过")
             continue
+        # 扣掉这只基金估值的历史系统偏差
+        growth = round(debias(code, growth, reliability), 2)
             
         # 算 RSI (云端版)
         real_rsi = calculate_realtime_rsi_online(code, growth)
         
-        # --- 决策逻辑 ---
-        action = "⚪ 观望"
-        color = "black"
-        rsi_msg = f"{real_rsi:.1f}" if real_rsi else "N/A"
-        
-        # =========== 🔥 策略分流 (Strategy Router) ===========
-        
-        # 1. 国泰证券 / 券商
-        if "证券" in name:
-            target_rsi = 37
-            if real_rsi and real_rsi < target_rsi:
-                action = f"🟢 【黄金坑! RSI<{target_rsi}】"
-                color = "#00CC00" # 亮绿
-            elif real_rsi and real_rsi > 75: 
-                action = "🔴 【过热! 建议止盈】"
-                color = "red"
-            elif growth < -1.2:
-                action = "🟢 【大跌博反弹】"
-                color = "green"
-
-        # 2. 纳指 / 美股 (防守)
-        elif "纳" in name or "标普" in name:
-            if real_rsi and real_rsi < 30: 
-                action = "💎 【罕见机会! 加仓!】" 
-                color = "purple"
-            else:
-                action = "🔵 【躺平持有】" 
-                color = "gray"
-        
-        # 3. CPO / 5G / 科技 (高波动新宠)
-        elif "5G" in name or "CPO" in name or "科技" in name:
-             if real_rsi and real_rsi < 35: 
-                 action = "🟢 【科技超跌】"
-                 color = "green"
-             elif real_rsi and real_rsi > 70:
-                 action = "🔥 【高危预警! 减仓】"
-                 color = "#FF4500" # 橙红
-             else:
-                 action = "😐 【震荡观察】"
-                 
-        # 4. 其他 (默认)
-        else:
-             if real_rsi and real_rsi < 30:
-                 action = "🟢 【RSI低位】"
-                 color = "green"
-        
-        # =======================================================
+        codes.append(code)
+        names.append(name)
+        growths.append(growth)
+        rsis.append(real_rsi if real_rsi is not None else float('nan'))
+
+    # =========== 🔥 策略分流 (Strategy Router) ===========
+    # 规则在 config.STRATEGY_TABLE 里配置，所有基金一次向量化判完
+    router = StrategyRouter(getattr(config, 'STRATEGY_TABLE', None))
+    sector_ids = router.assign_sectors(codes, names, fund_categories(codes))
+    # 估值不靠谱的基金，RSI 往 50 收缩：只有更极端的信号才能触发 (判信号用打折后的，显示两个都给)
+    adjusted, weights = shrink_rsi(codes, rsis, reliability)
+    actions, colors, sectors = router.route(sector_ids, growths, adjusted)
+    # =======================================================
 
-        print(f"  -> 结果: {growth}% (RSI:{rsi_msg}) -> {action}")
+    msg_lines = {}
+    for code, name, growth, real_rsi, adj, action, color, w in zip(codes, names, growths, rsis, adjusted, actions, colors, weights):
+        print(f"  -> {name} 结果: {growth}% ({format_rsi(real_rsi, adj, w)}) -> {action}")
         
-        # 构造 HTML 消息行
-        # 格式： 基金名: +1.5% (RSI: 65)
-        #       [操作建议]
-        line = f"<b>{name}</b> ({code}): <span style='color:{'red' if growth>0 else 'green'}'>{growth}%</span> (RSI:{rsi_msg}) <br>{action}"
-        msg_lines.append(line)
+        msg_lines[code] = format_signal_line(code, name, growth, real_rsi, action, color, w, adj)
 
     if msg_lines:
-        send_wechat("14:50 盘中信号", "<br><br>".join(msg_lines))
+        # 每份清单只收自己关注的那几只
+        fan_out(watchlists, lambda wl: pick(msg_lines, wl), "14:50 盘中信号", send_wechat)
+        notifier.flush()
         print("✅ 所有任务完成！")
+    get_client().print_stats()
+
+
+# =================== 常驻模式 (Daemon) ===================
+
+MARKET_TZ = ZoneInfo("Asia/Shanghai")
+SESSIONS = [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]
+RSI_PERIOD = 14
+RSI_WINDOW = 30  # 与 calculate_realtime_rsi_online 一样只看最近 30 个净值，保证两种模式信号一致
+
+class MonitorDaemon:
+    def __init__(self, watchlists, interval=300):
+        """
+        watchlists: load_watchlists() 的结果，监控所有清单的并集，信号变化按清单分发
+        interval: 轮询间隔 (秒)
+        """
+        self.watchlists = watchlists
+        self.funds = union_funds(watchlists)
+        self.interval = interval
+        self.router = StrategyRouter(getattr(config, 'STRATEGY_TABLE', None))
+        self.state = {}        # 代码 -> 昨日净值 + RSI 的 EWM 状态 (开盘加载一次，全天复用)
+        self.last_seen = {}    # 代码 -> 上次估值时间 (gztime 没变就不用重算)
+        self.last_action = {}  # 代码 -> 上次信号 (只有信号变了才推送)
+        self.reliability = load_reliability()  # 估值体检结果，开盘读一次
+        self.calendar = load_calendar()        # 交易日历副本 (planner.save_calendar 写的)
+        self._stop = threading.Event()
+
+    def warm_up(self):
+        """开盘前：每只基金的历史只下载这一次，算好 RSI 的平滑状态"""
+        print(f"🔥 预热中：加载 {len(self.funds)} 只基金的历史净值...")
+        for code, name in self.funds.items():
+            try:
+                df_hist = get_client().call(
+                    EASTMONEY_HOST, ak.fund_open_fund_info_em,
+                    symbol=code, indicator="单位净值走势", validate=not_empty
+                )
+                values = pd.to_numeric(df_hist['单位净值']).tail(RSI_WINDOW)
+                change = values.diff()
+                avg_gain = change.clip(lower=0).ewm(com=RSI_PERIOD - 1, adjust=False).mean().iloc[-1]
+                avg_loss = change.clip(upper=0).abs().ewm(com=RSI_PERIOD - 1, adjust=False).mean().iloc[-1]
+                self.state[code] = {'last_nav': float(values.iloc[-1]), 'avg_gain': avg_gain, 'avg_loss': avg_loss}
+            except Exception as e:
+                print(f"⚠️ {name} 预热失败，今天不监控它: {e}")
+        sectors = self.router.assign_sectors(list(self.state), [self.funds[c] for c in self.state],
+                                             fund_categories(list(self.state)))
+        self.sector_of = dict(zip(self.state, sectors))
+        print(f"✅ 预热完成：{len(self.state)}/{len(self.funds)} 只")
+
+    def live_rsi(self, code, growth):
+        """在昨天的 EWM 状态上补一步今天的估值：O(1)，不用再拉历史"""
+        st = self.state[code]
+        change = st['last_nav'] * growth / 100
+        a = 1 / RSI_PERIOD
+        avg_gain = st['avg_gain'] + a * (max(change, 0) - st['avg_gain'])
+        avg_loss = st['avg_loss'] + a * (max(-change, 0) - st['avg_loss'])
+        if avg_loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+    def poll(self):
+        """轮询一次：只重算估值有更新的基金，只推送信号有变化的基金"""
+        codes, growths, rsis = [], [], []
+        for code in self.state:
+            growth, gztime = get_realtime_estimate(code)
+            if growth is None or self.last_seen.get(code) == gztime:
+                continue
+            self.last_seen[code] = gztime
+            growth = round(debias(code, growth, self.reliability), 2)
+            codes.append(code)
+            growths.append(growth)
+            rsis.append(self.live_rsi(code, growth))
+        if not codes:
+            print("😴 估值没有更新")
+            return []
+
+        adjusted, weights = shrink_rsi(codes, rsis, self.reliability)
+        actions, colors, _ = self.router.route([self.sector_of[c] for c in codes], growths, adjusted)
+        lines = {}
+        for code, growth, rsi, adj, action, color, w in zip(codes, growths, rsis, adjusted, actions, colors, weights):
+            before = self.last_action.get(code)
+            self.last_action[code] = action
+            if action == before:
+                continue
+            name = self.funds[code]
+            print(f"🔔 {name}: {before or '开盘'} -> {action} ({growth}%, {format_rsi(rsi, adj, w)})")
+            lines[code] = format_signal_line(code, name, growth, rsi, action, color, w, adj)
+
+        if lines:
+            now = datetime.now(MARKET_TZ).strftime('%H:%M')
+            fan_out(self.watchlists, lambda wl: pick(lines, wl), f"{now} 盘中信号变化", send_wechat)
+        return list(lines.values())
+
+    def is_trading_day(self, now):
+        day = pd.Timestamp(now.date())
+        if self.calendar is None or not len(self.calendar) or self.calendar[-1] < day:
+            return now.weekday() < 5  # 没有日历副本 (或者已经用到头了)：按工作日凑合
+        return day in self.calendar
+
+    def in_session(self, now):
+        t = now.time()
+        return self.is_trading_day(now) and any(start <= t < end for start, end in SESSIONS)
+
+    def stop(self, *_):
+        print("🛑 收到退出信号，收尾中...")
+        self._stop.set()
+
+    def run(self):
+        """主循环：收盘 (或 Ctrl+C / SIGTERM) 后优雅退出"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        if not self.is_trading_day(datetime.now(MARKET_TZ)):
+            print("😴 今天休市，不盯盘")
+            return
+        self.warm_up()
+        close_at = SESSIONS[-1][1]
+
+        while not self._stop.is_set():
+            now = datetime.now(MARKET_TZ)
+            if now.time() >= close_at or not self.is_trading_day(now):
+                print("🔔 已收盘，今天的盯盘结束")
+                break
+            if self.in_session(now):
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"❌ 本轮轮询出错 (下一轮继续): {e}")
+            # 用 Event.wait 代替 sleep：收到退出信号能立刻醒
+            self._stop.wait(self.interval)
+
+        notifier.flush()
+        get_client().print_stats()
+        print("👋 常驻监控已退出")
 
 if __name__ == "__main__":
-    job_1450()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="盘中实时监控")
+    parser.add_argument('--daemon', action='store_true', help="常驻模式：开盘到收盘定时轮询")
+    parser.add_argument('--interval', type=int, default=getattr(config, 'MONITOR_INTERVAL', 300), help="轮询间隔 (秒)")
+    args = parser.parse_args()
+
+    if args.daemon:
+        MonitorDaemon(load_watchlists(), args.interval).run()
+    else:
+        job_1450()
\ No newline at end of file
@@ -0,0 +1,246 @@
+# report_builder.py
+# --- 日报排版：汇总表 + 每只基金一张小缩略图，控制在推送接口的长度限制以内 ---
+# 以前日报是纯文字把 \n 换成 <br>，plot_and_save 画的大图根本到不了手机上，基金一多消息就无限变长。
+# 这里每只基金画一张很小的走势缩略图 (低 DPI、调色板量化)，多进程并行画；
+# 文件名是画图数据的哈希，数据没变就直接复用上次的图。图以 base64 内嵌进 HTML (推送接口不能引用本地文件)。
+# 排版按优先级：汇总表永远在最前面，信号越强的基金越靠前；快超长度时先去掉低优先级的图，
+# 再把放不下的详情挪到下一页，页数也超了就截断并注明省略了几只。
+
+import base64
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+THUMB_DIR = os.path.join("data", "thumbs")
+THUMB_DAYS = 60            # 缩略图只画最近 60 个交易日
+THUMB_SIZE = (3.0, 1.2)    # 英寸
+THUMB_DPI = 72
+THUMB_COLORS = 16          # 调色板颜色数：折线图 16 色足够，体积能小好几倍
+STYLE_VERSION = 1          # 改了画法就 +1，旧缓存自动作废
+
+# 信号越靠前越要紧 (跟 FundAnalyzer.analyze_fund 里的信号文字对应)
+SIGNAL_PRIORITY = {"💎 极度超卖": 0, "🔥 跌破下轨": 1, "🚨 过热": 2}
+DEFAULT_PRIORITY = 9
+
+
+# --- 缩略图 ---
+
+def chart_payload(df, days=THUMB_DAYS):
+    """从算好指标的 DataFrame 里取画缩略图要用的几列 (numpy 数组，传给子进程很便宜)"""
+    tail = df.tail(days)
+    return {col: tail[col].to_numpy(dtype=np.float64) for col in ('nav_value', 'upper', 'lower', 'rsi')}
+
+
+def payload_hash(payload, fmt):
+    h = hashlib.sha1(f"{STYLE_VERSION}|{fmt}|{THUMB_SIZE}|{THUMB_DPI}|{THUMB_COLORS}".encode())
+    for col in ('nav_value', 'upper', 'lower', 'rsi'):
+        h.update(np.ascontiguousarray(payload[col]).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _render(task):
+    """子进程：画一张缩略图，返回 (文件名, 图片字节)"""
+    name, payload, fmt = task
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from PIL import Image
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=THUMB_SIZE, dpi=THUMB_DPI, sharex=True,
+                                   gridspec_kw={'height_ratios': [3, 1], 'hspace': 0.05})
+    x = np.arange(len(payload['nav_value']))
+    ax1.fill_between(x, payload['upper'], payload['lower'], color='#dddddd', linewidth=0)
+    ax1.plot(x, payload['nav_value'], color='black', linewidth=1)
+    ax2.plot(x, payload['rsi'], color='purple', linewidth=0.8)
+    ax2.axhline(30, color='green', linewidth=0.5)
+    ax2.axhline(70, color='red', linewidth=0.5)
+    ax2.set_ylim(0, 100)
+    for ax in (ax1, ax2):
+        ax.set_axis_off()
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=THUMB_DPI)
+    plt.close(fig)
+
+    # 调色板量化：RGBA -> 16 色索引图
+    img = Image.open(io.BytesIO(buf.getvalue())).convert('RGB').quantize(colors=THUMB_COLORS)
+    out = io.BytesIO()
+    if fmt == 'webp':
+        img.convert('RGB').save(out, format='WEBP', quality=60, method=6)
+    else:
+        img.save(out, format='PNG', optimize=True)
+    return name, out.getvalue()
+
+
+def _try_render(task):
+    """子进程：画一张图，出错只丢这一张 (返回 None)，不影响其它图"""
+    try:
+        return _render(task)[1]
+    except Exception as e:
+        print(f"⚠️ 缩略图 {task[0]} 画失败，这只基金只发文字: {e}")
+        return None
+
+
+class ThumbnailCache:
+    """
+    缩略图缓存：文件名 = 画图数据的哈希
+    index.json 记着每只基金最近一张图，净值没变、这次没重新算指标的基金也能找到它的图
+    """
+
+    def __init__(self, root=THUMB_DIR, fmt='png', workers=None):
+        self.root = root
+        self.fmt = fmt
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = {}
+
+    def render(self, charts, codes=()):
+        """
+        charts: {基金代码: chart_payload}，这次重新算过指标的基金
+        codes: 其余要用图的基金 (从 index 里找上次的图)
+        返回 {基金代码: 图片路径}
+        """
+        paths, todo = {}, []
+        for code, payload in charts.items():
+            name = f"{payload_hash(payload, self.fmt)}.{self.fmt}"
+            path = os.path.join(self.root, name)
+            paths[code] = path
+            self.index[code] = name
+            if not os.path.exists(path):
+                todo.append((name, payload, self.fmt))
+        for code in codes:
+            name = self.index.get(code)
+            if code not in paths and name and os.path.exists(os.path.join(self.root, name)):
+                paths[code] = os.path.join(self.root, name)
+
+        if todo:
+            print(f"🖼️ 缩略图: 新画 {len(todo)} 张，复用 {len(paths) - len(todo)} 张")
+            if len(todo) == 1 or self.workers == 1:
+                rendered = [_try_render(task) for task in todo]
+            else:
+                # with：哪张图出错都会等子进程收尾退出，不留孤儿进程
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(todo))) as pool:
+                    rendered = list(pool.map(_try_render, todo))
+            failed = set()
+            for (name, _, _), data in zip(todo, rendered):
+                if data is None:
+                    failed.add(name)
+                    continue
+                with open(os.path.join(self.root, name), 'wb') as f:
+                    f.write(data)
+            # 画坏的那几只只是没有图，日报照发
+            for code in [c for c, p in paths.items() if os.path.basename(p) in failed]:
+                del paths[code]
+                self.index.pop(code, None)
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        return paths
+
+
+def data_uri(path):
+    mime = 'image/webp' if path.endswith('.webp') else 'image/png'
+    with open(path, 'rb') as f:
+        return f"data:{mime};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+
+# --- 排版 ---
+
+def priority(row):
+    """排序键：信号越要紧越靠前，同一档里 RSI 离 50 越远越靠前"""
+    rsi = row.get('rsi')
+    rsi = 50.0 if rsi is None or np.isnan(rsi) else rsi
+    return SIGNAL_PRIORITY.get(row.get('signal_text'), DEFAULT_PRIORITY), -abs(rsi - 50)
+
+
+def summary_table(rows, names):
+    """汇总表：一只基金一行 (名称 / 日期 / 净值 / RSI / 信号)"""
+    cells = "".join(
+        f"<tr><td>{names.get(r['fund_code'], r['fund_code'])}</td>"
+        f"<td>{str(r['nav_date'])[5:10]}</td><td>{r['price']:.4f}</td>"
+        f"<td>{r['rsi']:.1f}</td><td>{r['signal_text']}</td></tr>"
+        for r in rows
+    )
+    return ("<table border='1' cellspacing='0' cellpadding='2' style='font-size:12px;border-collapse:collapse'>"
+            "<tr><th>基金</th><th>日期</th><th>净值</th><th>RSI</th><th>信号</th></tr>"
+            f"{cells}</table>")
+
+
+def _detail(text, thumb=None):
+    html = text.replace('\n', '<br>')
+    if thumb:
+        html += f"<br><img src='{thumb}' style='width:100%;max-width:300px'>"
+    return html
+
+
+def _truncate(html, limit):
+    """
+    放不下的一段按 <br> 截断 (同 notifier.split_html 的切法)，只留完整的行，不会切开标签或图片的 data URI
+    第一行本身就超长才硬切，切坏的半个标签整个丢掉
+    """
+    if len(html) <= limit:
+        return html
+    mark = "<br>……"
+    budget = max(limit - len(mark), 0)
+    cut = html.rfind('<br>', 0, budget + 1)
+    if cut > 0:
+        return html[:cut] + mark
+    head = html[:budget]
+    if head.rfind('<') > head.rfind('>'):
+        head = head[:head.rfind('<')]
+    return head + mark
+
+
+def build_pages(rows, items, names, thumbs=None, extras=(), max_chars=15000, max_pages=3, head_note=""):
+    """
+    rows: {基金代码: 指标行 (price/rsi/signal_text/nav_date)}
+    items: {基金代码: 单条报告文字}
+    thumbs: {基金代码: 图片路径}，缺了的基金就只有文字
+    extras: 附加段落 (相关性、估值可信度...)，排在基金详情后面，优先级最低
+    head_note: 放在汇总表上面的提示 (净值缺失之类)
+    返回 HTML 页列表，每页不超过 max_chars；放不下的按优先级从后往前：先去图，再换页，最后截掉
+    截断只按 <br> 整行截 (先丢图再截文字)，不会把标签或图片切成两半
+    """
+    thumbs = thumbs or {}
+    codes = sorted((c for c in items if c in rows), key=lambda c: priority(rows[c]))
+    head = summary_table([rows[c] for c in codes], names)
+    if head_note:
+        head = _detail(head_note) + "<br>" + head
+
+    blocks = []
+    for code in codes:
+        plain = _detail(items[code])
+        full = _detail(items[code], data_uri(thumbs[code])) if code in thumbs else plain
+        blocks.append((full, plain))
+    blocks += [(_detail(x), _detail(x)) for x in extras]
+
+    sep = "<br><br>"
+    limit = max_chars - 40  # 给最后的 "省略" 说明留位置
+    pages, current, shown = [], _truncate(head, limit), 0
+    for full, plain in blocks:
+        fitted = next((b for b in (full, plain) if len(current) + len(sep) + len(b) <= limit), None)
+        if fitted is not None:
+            current += sep + fitted
+        elif len(pages) + 1 < max_pages:
+            # 这一页满了，换页
+            pages.append(current)
+            current = next((b for b in (full, plain) if len(b) <= limit), None) or _truncate(plain, limit)
+        else:
+            break
+        shown += 1
+    pages.append(current)
+
+    if shown < len(blocks):
+        pages[-1] += f"{sep}…… 另有 {len(blocks) - shown} 段因长度限制省略"
+    return pages
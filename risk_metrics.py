@@ -0,0 +1,178 @@
+# risk_metrics.py
+# --- 风控体检：夏普、波动率、最大回撤、VaR/CVaR ---
+# 所有函数都吃 基金×日期 的矩阵 (一行一只基金)，沿时间轴一次性算完，几千只基金也不用写循环。
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def _nan_stats(rets):
+    """每行的有效样本数、均值、标准差 (样本标准差，忽略 NaN)"""
+    valid = ~np.isnan(rets)
+    n = valid.sum(axis=1)
+    x = np.where(valid, rets, 0.0)
+    s1 = x.sum(axis=1)
+    s2 = (x * x).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = s1 / n
+        var = (s2 - s1 * mean) / (n - 1)
+    return n, mean, np.sqrt(np.clip(var, 0, None))
+
+
+def annual_volatility(rets, periods=TRADING_DAYS):
+    """成立以来年化波动率"""
+    _, _, std = _nan_stats(rets)
+    return std * np.sqrt(periods)
+
+
+def sharpe_ratio(rets, rf=0.0, periods=TRADING_DAYS):
+    """成立以来年化夏普 (rf 为年化无风险利率)"""
+    _, mean, std = _nan_stats(rets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (mean - rf / periods) / std * np.sqrt(periods)
+
+
+def rolling_mean_std(rets, window):
+    """
+    滚动均值/标准差：前缀和相减，一遍扫完 (O(N·T)，与窗口长度无关)
+    窗口内有效样本不足一半的位置记为 NaN
+    """
+    valid = ~np.isnan(rets)
+    x = np.where(valid, rets, 0.0)
+    pad = np.zeros((rets.shape[0], 1))
+    c1 = np.concatenate([pad, np.cumsum(x, axis=1)], axis=1)
+    c2 = np.concatenate([pad, np.cumsum(x * x, axis=1)], axis=1)
+    cn = np.concatenate([pad, np.cumsum(valid, axis=1)], axis=1)
+
+    mean = np.full(rets.shape, np.nan)
+    std = np.full(rets.shape, np.nan)
+    if rets.shape[1] < window:
+        return mean, std
+
+    s1 = c1[:, window:] - c1[:, :-window]
+    s2 = c2[:, window:] - c2[:, :-window]
+    n = cn[:, window:] - cn[:, :-window]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m = s1 / n
+        v = (s2 - s1 * m) / (n - 1)
+    enough = n >= max(2, window // 2)
+    mean[:, window - 1:] = np.where(enough, m, np.nan)
+    std[:, window - 1:] = np.where(enough, np.sqrt(np.clip(v, 0, None)), np.nan)
+    return mean, std
+
+
+def rolling_volatility(rets, window=60, periods=TRADING_DAYS):
+    _, std = rolling_mean_std(rets, window)
+    return std * np.sqrt(periods)
+
+
+def rolling_sharpe(rets, window=60, rf=0.0, periods=TRADING_DAYS):
+    mean, std = rolling_mean_std(rets, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (mean - rf / periods) / std * np.sqrt(periods)
+
+
+def max_drawdown(prices):
+    """
+    最大回撤 (负数) 及其 峰值/谷底 的列下标
+    返回 (mdd, peak_idx, trough_idx)，没有数据的行下标为 -1
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    filled = np.where(np.isnan(prices), -np.inf, prices)
+    peak = np.maximum.accumulate(filled, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dd = np.where(np.isnan(prices), np.nan, prices / peak - 1)
+
+    has_data = ~np.all(np.isnan(dd), axis=1)
+    trough = np.where(has_data, np.argmin(np.nan_to_num(dd, nan=np.inf), axis=1), -1)
+    rows = np.arange(len(prices))
+    mdd = np.where(has_data, dd[rows, np.maximum(trough, 0)], np.nan)
+
+    # 峰值 = 谷底之前的最高点：把谷底之后的列屏蔽掉再 argmax
+    cols = np.arange(prices.shape[1])
+    before = np.where(cols[None, :] <= trough[:, None], filled, -np.inf)
+    peak_idx = np.where(has_data, np.argmax(before, axis=1), -1)
+    return mdd, peak_idx, trough
+
+
+def historical_var(rets, level=0.95):
+    """
+    历史模拟法 VaR / CVaR (正数 = 一天可能亏多少)
+    CVaR = 跌得比 VaR 还狠的那些天的平均亏损
+    """
+    # np.sort 会把 NaN 排到最后，按每行有效样本数线性插值取分位点 (比 nanquantile 快一个量级)
+    srt = np.sort(rets, axis=1)
+    n = (~np.isnan(rets)).sum(axis=1)
+    pos = np.clip((n - 1) * (1 - level), 0, None)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+    rows = np.arange(len(rets))
+    frac = pos - lo
+    q = srt[rows, lo] * (1 - frac) + srt[rows, hi] * frac
+    q = np.where(n > 0, q, np.nan)
+    tail = rets <= q[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cvar = np.where(tail, rets, 0.0).sum(axis=1) / tail.sum(axis=1)
+    return -q, -cvar
+
+
+def parametric_var(rets, level=0.95):
+    """参数法 (正态假设) VaR / CVaR"""
+    _, mean, std = _nan_stats(rets)
+    norm = NormalDist()
+    z = norm.inv_cdf(1 - level)
+    var = -(mean + z * std)
+    cvar = -(mean - std * norm.pdf(z) / (1 - level))
+    return var, cvar
+
+
+def risk_table(matrix, level=0.95, rf=0.0, window=60):
+    """
+    指挥官：对整个价格矩阵 (PriceMatrix) 出一张风险体检表
+    百分比字段单位均为 %；滚动指标只取最新一个窗口 (完整序列请用 rolling_*)
+    矩阵请用 ffill=False 的：收益按每只基金自己的净值日期算，别的市场交易、它休市的日子是 NaN，
+    不会被当成一串 0% 把 QDII 的波动/VaR 压低、夏普抬高
+    """
+    prices = matrix.values
+    rets = matrix.own_returns()
+    n_tail, mean_tail, std_tail = _nan_stats(rets[:, -window:])
+    enough = n_tail >= max(2, window // 2)
+    mdd, peak_idx, trough_idx = max_drawdown(prices)
+    h_var, h_cvar = historical_var(rets, level)
+    p_var, p_cvar = parametric_var(rets, level)
+
+    dates = matrix.dates
+
+    def pick(idx):
+        return [dates[i] if i >= 0 else pd.NaT for i in idx]
+
+    return pd.DataFrame({
+        'sharpe': sharpe_ratio(rets, rf),
+        'sharpe_recent': np.where(enough, (mean_tail - rf / TRADING_DAYS) / std_tail * np.sqrt(TRADING_DAYS), np.nan),
+        'volatility': annual_volatility(rets) * 100,
+        'volatility_recent': np.where(enough, std_tail * np.sqrt(TRADING_DAYS) * 100, np.nan),
+        'max_drawdown': mdd * 100,
+        'mdd_peak': pick(peak_idx),
+        'mdd_trough': pick(trough_idx),
+        'var_hist': h_var * 100,
+        'cvar_hist': h_cvar * 100,
+        'var_param': p_var * 100,
+        'cvar_param': p_cvar * 100,
+    }, index=matrix.codes)
+
+
+def format_risk_line(row):
+    """单只基金的风险摘要 (日报用)"""
+    if pd.isna(row['max_drawdown']):
+        return "📉 风险: 数据不足"
+    peak = row['mdd_peak'].strftime('%Y-%m-%d')
+    trough = row['mdd_trough'].strftime('%Y-%m-%d')
+    return (
+        f"📉 波动 {row['volatility']:.1f}% | 夏普 {row['sharpe']:.2f}\n"
+        f"🕳️ 最大回撤 {row['max_drawdown']:.1f}% ({peak}→{trough})\n"
+        f"🎯 VaR95 {row['var_hist']:.2f}% | CVaR95 {row['cvar_hist']:.2f}%"
+    )
@@ -0,0 +1,209 @@
+# seasonality.py
+# --- 日历效应：上/下半月、星期几、节前节后、月末，所有基金所有年份一次 groupby 算完 ---
+# december_magic.ipynb 是一只 ETF、按年份 for 循环；这里把每个交易日打上日历标签，
+# 按 (基金, 窗口, 第几次出现) 累加对数收益，再按 (基金, 窗口) 汇总胜率/均值/t 值。
+# 结果按基金缓存进库，净值没更新的基金直接读缓存；日报只查 "下一个交易日落在哪些窗口"。
+# 上/下半月跟 notebook 同一个切法：15 号及以后算下半月。notebook 用 ETF 的 第一天开盘 -> 最后一天收盘，
+# 基金只有净值、没有开盘价，这里的区间收益是 窗口前一天净值 -> 窗口最后一天净值 (按净值申购的实际持有收益)。
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from fund_matrix import load_nav_long
+
+HOLIDAY_GAP_DAYS = 4   # 两个交易日之间隔了 >= 4 个自然日 (比周末长) = 中间是节假日
+MONTH_END_DAYS = 2     # 月末窗口 = 每月最后 2 个交易日
+WEEKDAYS = ['周一', '周二', '周三', '周四', '周五']
+COLUMNS = ['cal_window', 'n', 'mean_ret', 'win_rate', 't_stat']
+
+
+def label_days(df, calendar=None):
+    """
+    给每个交易日打日历标签
+    df: fund_code, nav_date, ret (当天对数收益)
+    calendar: 交易日历 (FreshnessPlanner.calendar)。节前/节后/月末都按它算，
+              所以一只基金的标签跟这次和哪些基金一起算无关，它自己缺净值的日子也不会被当成节假日；
+              不给才退回用这批基金日期的并集 (只适合临时分析)
+    返回长表：fund_code, cal_window, occurrence (同一窗口第几次出现，用来把多天收益并成一次), ret
+    """
+    dates = df['nav_date']
+    year, month = dates.dt.year, dates.dt.month
+
+    # 节假日 = 相邻交易日间隔比周末还长
+    if calendar is None:
+        cal = pd.DatetimeIndex(np.sort(dates.unique()))
+    else:
+        cal = pd.DatetimeIndex(calendar).normalize().unique().sort_values()
+    gap_after = pd.Series(np.r_[(cal[1:] - cal[:-1]).days, 0], index=cal)
+    gap_before = pd.Series(np.r_[0, (cal[1:] - cal[:-1]).days], index=cal)
+    # 每月倒数第几个交易日
+    cal_month = cal.year * 100 + cal.month
+    from_end = pd.Series(cal_month).groupby(cal_month).cumcount(ascending=False).to_numpy()
+    from_end = pd.Series(from_end, index=cal)
+
+    parts = []
+    # 1. 上/下半月 (15 号起算下半月，同 notebook)：一次出现 = 某年某月的那半个月
+    second = dates.dt.day >= 15
+    half = np.where(second, '下半月', '上半月')
+    parts.append(pd.DataFrame({
+        'fund_code': df['fund_code'],
+        'cal_window': month.astype(str) + '月' + half,
+        'occurrence': (year * 100 + month) * 10 + second,
+        'ret': df['ret'],
+    }))
+    # 2. 星期几：一次出现 = 一天
+    wd = dates.dt.weekday
+    keep = wd < 5
+    parts.append(pd.DataFrame({
+        'fund_code': df['fund_code'][keep],
+        'cal_window': np.array(WEEKDAYS)[wd[keep]],
+        'occurrence': dates[keep].astype('int64'),
+        'ret': df['ret'][keep],
+    }))
+    # 3. 节前最后一天 / 节后第一天
+    pre = gap_after.reindex(dates).to_numpy() >= HOLIDAY_GAP_DAYS
+    post = gap_before.reindex(dates).to_numpy() >= HOLIDAY_GAP_DAYS
+    for mask, name in ((pre, '节前'), (post, '节后')):
+        parts.append(pd.DataFrame({
+            'fund_code': df['fund_code'][mask],
+            'cal_window': name,
+            'occurrence': dates[mask].astype('int64'),
+            'ret': df['ret'][mask],
+        }))
+    # 4. 月末：一次出现 = 某月最后 MONTH_END_DAYS 个交易日
+    me = from_end.reindex(dates).to_numpy() < MONTH_END_DAYS
+    parts.append(pd.DataFrame({
+        'fund_code': df['fund_code'][me],
+        'cal_window': '月末',
+        'occurrence': (year * 100 + month)[me],
+        'ret': df['ret'][me],
+    }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def seasonality_table(nav, calendar=None):
+    """
+    nav: load_nav_long 的长表 (fund_code, nav_date, nav_value)
+    calendar: 交易日历，见 label_days
+    返回每个 (基金, 窗口) 一行：n 次数, mean_ret 平均收益(%), win_rate 胜率, t_stat
+    """
+    nav = nav.sort_values(['fund_code', 'nav_date'])
+    ret = np.log(nav['nav_value']).groupby(nav['fund_code']).diff()
+    df = nav.assign(ret=ret).dropna(subset=['ret'])
+    if df.empty:
+        return pd.DataFrame(columns=['fund_code'] + COLUMNS)
+
+    labeled = label_days(df, calendar)
+    # 同一次出现的几天收益先复利合并 (对数收益直接相加)
+    occ = labeled.groupby(['fund_code', 'cal_window', 'occurrence'], sort=False)['ret'].sum()
+    occ = np.expm1(occ) * 100
+
+    g = occ.groupby(level=['fund_code', 'cal_window'])
+    out = pd.DataFrame({
+        'n': g.size(),
+        'mean_ret': g.mean(),
+        'win_rate': (occ > 0).groupby(level=['fund_code', 'cal_window']).mean(),
+        'std': g.std(),
+    })
+    out['t_stat'] = out['mean_ret'] / (out['std'] / np.sqrt(out['n']))
+    out = out.replace([np.inf, -np.inf], np.nan).drop(columns='std')
+    return out.reset_index()[['fund_code'] + COLUMNS]
+
+
+def upcoming_windows(next_day, last_days_of_month=None):
+    """
+    下一个交易日会落进哪些窗口 (日报用)
+    last_days_of_month: 本月从 next_day (含) 起还剩几个交易日，用 FreshnessPlanner.days_left_in_month 从交易日历取；
+                        不给才按工作日估 (节假日会算错)
+    节前/节后需要交易日历，这里不猜
+    """
+    d = pd.Timestamp(next_day)
+    windows = [f"{d.month}月{'下半月' if d.day >= 15 else '上半月'}"]
+    if d.weekday() < 5:
+        windows.append(WEEKDAYS[d.weekday()])
+    if last_days_of_month is None:
+        month_end = d + pd.offsets.BMonthEnd(0)
+        last_days_of_month = len(pd.bdate_range(d, month_end))
+    if last_days_of_month <= MONTH_END_DAYS:
+        windows.append('月末')
+    return windows
+
+
+class SeasonalityCache:
+    """
+    按基金缓存季节性结果 (表 fund_seasonality)
+    缓存里记着算的时候用到的最新净值日期，净值没更新的基金不重算
+    calendar: 交易日历 (FreshnessPlanner.calendar)，节前/节后/月末按它打标签，
+              每只基金的结果跟这次和谁一起重算无关，缓存才是确定的
+    """
+
+    def __init__(self, engine, calendar=None):
+        self.engine = engine
+        self.calendar = calendar
+        self._init_table()
+
+    def _init_table(self):
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS fund_seasonality (
+                fund_code VARCHAR(10),
+                cal_window VARCHAR(20),
+                n INT,
+                mean_ret DOUBLE,
+                win_rate DOUBLE,
+                t_stat DOUBLE,
+                last_nav_date DATE
+            );
+            """))
+            conn.commit()
+
+    def load(self, codes):
+        stmt = text("SELECT * FROM fund_seasonality WHERE fund_code IN :codes")
+        stmt = stmt.bindparams(bindparam('codes', expanding=True))
+        with self.engine.connect() as conn:
+            df = pd.read_sql(stmt, conn, params={'codes': list(codes)})
+        df['last_nav_date'] = pd.to_datetime(df['last_nav_date'])
+        return df
+
+    def refresh(self, codes):
+        """只重算净值有更新的基金，返回全部基金的结果"""
+        codes = list(codes)
+        cached = self.load(codes)
+        with self.engine.connect() as conn:
+            stmt = text("SELECT fund_code, MAX(nav_date) AS last_date FROM fund_nav_history "
+                        "WHERE fund_code IN :codes GROUP BY fund_code")
+            stmt = stmt.bindparams(bindparam('codes', expanding=True))
+            latest = pd.read_sql(stmt, conn, params={'codes': codes})
+        latest = dict(zip(latest['fund_code'], pd.to_datetime(latest['last_date'])))
+        cached_date = cached.groupby('fund_code')['last_nav_date'].max().to_dict()
+
+        stale = [c for c in codes if c in latest and cached_date.get(c) != latest[c]]
+        if not stale:
+            return cached
+
+        print(f"📅 季节性重算: {len(stale)} 只基金 (其余 {len(codes) - len(stale)} 只用缓存)")
+        table = seasonality_table(load_nav_long(self.engine, stale), self.calendar)
+        table['last_nav_date'] = table['fund_code'].map(latest)
+
+        with self.engine.connect() as conn:
+            stmt = text("DELETE FROM fund_seasonality WHERE fund_code IN :codes")
+            stmt = stmt.bindparams(bindparam('codes', expanding=True))
+            conn.execute(stmt, parameters={"codes": stale})
+            conn.commit()
+        table.to_sql('fund_seasonality', self.engine, if_exists='append', index=False)
+
+        fresh = cached[~cached['fund_code'].isin(stale)]
+        return pd.concat([fresh, table], ignore_index=True)
+
+
+def seasonal_hints(table, code, windows, min_n=5, min_t=2.0):
+    """某只基金在给定窗口里历史上显著偏涨/偏跌的，返回文字列表"""
+    rows = table[(table['fund_code'] == code) & table['cal_window'].isin(windows)
+                 & (table['n'] >= min_n) & (table['t_stat'].abs() >= min_t)]
+    hints = []
+    for _, r in rows.iterrows():
+        tag = "📅 偏涨" if r['mean_ret'] > 0 else "📅 偏跌"
+        hints.append(f"{tag}: {r['cal_window']} 平均 {r['mean_ret']:+.2f}% | 胜率 {r['win_rate']:.0%} "
+                     f"| t={r['t_stat']:.1f} ({int(r['n'])}次)")
+    return hints
@@ -0,0 +1,455 @@
+# strategy_lang.py
+# --- 策略表达式编译器：一行文字描述策略，编译一次，整矩阵向量化求值 ---
+#
+# 写法 (每行或用 ; 分隔一条规则，"名字: 表达式")：
+#     buy:  close > ma(20) and rsi(14) < 45
+#     sell: rsi(14) > 70 or cross_down(ma(5), ma(20))
+#
+# 变量：close (净值)、ret (日收益率)
+# 函数：ma / ema / std (n 或 (序列, n))、rsi(n)、chg(n) (n 日涨幅)、shift(序列, n)
+#       boll_up(n, k) / boll_low(n, k) (布林上下轨)、cross_up(a, b) / cross_down(a, b) (金叉/死叉)
+# 运算：+ - * /、< <= > >= == !=、and or not、括号
+#
+# 相同的子表达式只算一次：几条规则里都写了 ma(20)，实际只算一个 ma(20)。
+
+import re
+
+import numpy as np
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|([A-Za-z_]\w*)|(<=|>=|==|!=|[<>()+\-*/,]))")
+_VARS = ('close', 'ret')
+_SERIES_FUNCS = ('ma', 'ema', 'std', 'rsi', 'chg')
+
+
+class StrategySyntaxError(ValueError):
+    pass
+
+
+# --- 1. 词法 + 语法分析 (递归下降) ---
+
+class _Parser:
+    def __init__(self, text, intern, deref):
+        self.tokens = self._tokenize(text)
+        self.i = 0
+        self.intern = intern  # 节点去重表：同样的 (运算, 参数) 只建一个节点
+        self.deref = deref
+
+    @staticmethod
+    def _tokenize(text):
+        tokens, pos = [], 0
+        text = text.strip()
+        while pos < len(text):
+            m = _TOKEN.match(text, pos)
+            if not m or m.end() == pos:
+                raise StrategySyntaxError(f"看不懂的字符: {text[pos:pos + 10]!r}")
+            num, name, op = m.groups()
+            if num is not None:
+                tokens.append(('num', float(num)))
+            elif name is not None:
+                tokens.append(('name', name.lower()))
+            else:
+                tokens.append(('op', op))
+            pos = m.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        tok = self.peek()
+        if tok[0] is None or (value is not None and tok[1] != value):
+            raise StrategySyntaxError(f"期望 {value!r}，实际是 {tok[1]!r}")
+        self.i += 1
+        return tok
+
+    def parse(self):
+        node = self.or_expr()
+        if self.i != len(self.tokens):
+            raise StrategySyntaxError(f"多余的内容: {self.peek()[1]!r}")
+        return node
+
+    def or_expr(self):
+        node = self.and_expr()
+        while self.peek() == ('name', 'or'):
+            self.take()
+            node = self.intern(('or', node, self.and_expr()))
+        return node
+
+    def and_expr(self):
+        node = self.not_expr()
+        while self.peek() == ('name', 'and'):
+            self.take()
+            node = self.intern(('and', node, self.not_expr()))
+        return node
+
+    def not_expr(self):
+        if self.peek() == ('name', 'not'):
+            self.take()
+            return self.intern(('not', self.not_expr()))
+        return self.comparison()
+
+    def comparison(self):
+        node = self.arith()
+        tok = self.peek()
+        if tok[0] == 'op' and tok[1] in ('<', '<=', '>', '>=', '==', '!='):
+            self.take()
+            node = self.intern((tok[1], node, self.arith()))
+        return node
+
+    def arith(self):
+        node = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.take()[1]
+            node = self.intern((op, node, self.term()))
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            op = self.take()[1]
+            node = self.intern((op, node, self.factor()))
+        return node
+
+    def factor(self):
+        kind, value = self.peek()
+        if kind == 'num':
+            self.take()
+            return self.intern(('num', value))
+        if (kind, value) == ('op', '-'):
+            self.take()
+            return self.intern(('neg', self.factor()))
+        if (kind, value) == ('op', '('):
+            self.take()
+            node = self.or_expr()
+            self.take(')')
+            return node
+        if kind == 'name':
+            self.take()
+            if self.peek() == ('op', '('):
+                return self.call(value)
+            if value not in _VARS:
+                raise StrategySyntaxError(f"未知变量: {value}")
+            return self.intern(('var', value))
+        raise StrategySyntaxError(f"表达式不完整: {value!r}")
+
+    def _args(self):
+        self.take('(')
+        args = []
+        if self.peek() != ('op', ')'):
+            args.append(self.or_expr())
+            while self.peek() == ('op', ','):
+                self.take()
+                args.append(self.or_expr())
+        self.take(')')
+        return args
+
+    def _const(self, ref, fname):
+        """窗口长度之类的参数必须是数字常量"""
+        node = self.deref(ref)
+        if node[0] != 'num':
+            raise StrategySyntaxError(f"{fname} 的参数必须是数字")
+        return node[1]
+
+    def call(self, fname):
+        args = self._args()
+        close = self.intern(('var', 'close'))
+
+        if fname in _SERIES_FUNCS:
+            # ma(20) 等价于 ma(close, 20)
+            if len(args) == 1:
+                args = [close] + args
+            if len(args) != 2:
+                raise StrategySyntaxError(f"{fname} 需要 1~2 个参数")
+            n = int(self._const(args[1], fname))
+            if n < 1:
+                raise StrategySyntaxError(f"{fname} 的窗口必须 >= 1")
+            if fname == 'chg':
+                # n 日涨幅 = x / shift(x, n) - 1 (展开成基本运算，好跟别的规则共用 shift)
+                shifted = self.intern(('shift', args[0], n))
+                ratio = self.intern(('/', args[0], shifted))
+                return self.intern(('-', ratio, self.intern(('num', 1.0))))
+            return self.intern((fname, args[0], n))
+
+        if fname == 'shift':
+            if len(args) != 2:
+                raise StrategySyntaxError("shift 需要 2 个参数")
+            return self.intern(('shift', args[0], int(self._const(args[1], fname))))
+
+        if fname in ('boll_up', 'boll_low'):
+            # 布林带 = ma(n) ± k * std(n)，展开后 ma(n) 可以和其它规则共用
+            n = int(self._const(args[0], fname)) if len(args) > 0 else 20
+            k = self._const(args[1], fname) if len(args) > 1 else 2.0
+            mid = self.intern(('ma', close, n))
+            width = self.intern(('*', self.intern(('num', float(k))), self.intern(('std', close, n))))
+            return self.intern(('+' if fname == 'boll_up' else '-', mid, width))
+
+        if fname in ('cross_up', 'cross_down'):
+            if len(args) != 2:
+                raise StrategySyntaxError(f"{fname} 需要 2 个参数")
+            a, b = args
+            a1 = self.intern(('shift', a, 1))
+            b1 = self.intern(('shift', b, 1))
+            if fname == 'cross_up':
+                now, before = self.intern(('>', a, b)), self.intern(('<=', a1, b1))
+            else:
+                now, before = self.intern(('<', a, b)), self.intern(('>=', a1, b1))
+            return self.intern(('and', now, before))
+
+        raise StrategySyntaxError(f"未知函数: {fname}")
+
+
+# --- 2. 向量化算子 (沿日期轴，一行一只基金) ---
+
+def _rolling_sum(x, n):
+    """滚动求和 (前缀和相减)；窗口里有 NaN 的位置结果为 NaN"""
+    bad = np.isnan(x)
+    c = np.cumsum(np.where(bad, 0.0, x), axis=1)
+    cb = np.cumsum(bad, axis=1)
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] < n:
+        return out
+    s = c[:, n - 1:].copy()
+    s[:, 1:] -= c[:, :-n]
+    nb = cb[:, n - 1:].copy()
+    nb[:, 1:] -= cb[:, :-n]
+    out[:, n - 1:] = np.where(nb == 0, s, np.nan)
+    return out
+
+
+def _ma(x, n):
+    return _rolling_sum(x, n) / n
+
+
+def _std(x, n):
+    """滚动样本标准差 (ddof=1，与 pandas rolling().std() 一致)"""
+    if n < 2:
+        return np.full(x.shape, np.nan)
+    s1 = _rolling_sum(x, n)
+    s2 = _rolling_sum(x * x, n)
+    var = (s2 - s1 * s1 / n) / (n - 1)
+    return np.sqrt(np.clip(var, 0, None))
+
+
+def _ewm(x, alpha):
+    """
+    指数加权均值 (adjust=False)，时间方向递推、基金方向向量化
+    每行从第一个非 NaN 值起步，与 pandas ewm(adjust=False) 一致
+    """
+    out = np.empty_like(x)
+    state = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        col = x[:, t]
+        has = ~np.isnan(col)
+        fresh = has & np.isnan(state)
+        state = np.where(fresh, col, np.where(has, state + alpha * (col - state), state))
+        out[:, t] = state
+    return out
+
+
+def _rsi(x, n):
+    change = np.full(x.shape, np.nan)
+    change[:, 1:] = np.diff(x, axis=1)
+    gain = np.clip(change, 0, None)
+    loss = np.abs(np.clip(change, None, 0))
+    avg_gain = _ewm(gain, 1 / n)
+    avg_loss = _ewm(loss, 1 / n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def _shift(x, n):
+    out = np.full(x.shape, np.nan)
+    if n == 0:
+        return x
+    if n > 0:
+        out[:, n:] = x[:, :-n]
+    else:
+        out[:, :n] = x[:, -n:]
+    return out
+
+
+def _as_float(x):
+    return x.astype(np.float64) if isinstance(x, np.ndarray) and x.dtype == bool else x
+
+
+_BINARY = {
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide,
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '==': np.equal, '!=': np.not_equal,
+}
+
+
+# --- 3. 编译后的程序 ---
+
+class Strategy:
+    def __init__(self, source):
+        """
+        source: 规则文本，或 {名字: 表达式} 的 dict
+        所有规则共用一张节点表，公共子表达式只建一次
+        """
+        if isinstance(source, str):
+            source = self._split_rules(source)
+        self.source = dict(source)
+        self.nodes = []     # 拓扑序：子节点一定排在父节点前面
+        self._ids = {}
+        self.outputs = {}
+        for name, expr in self.source.items():
+            self.outputs[name] = _Parser(expr, self._intern, self._deref).parse()
+
+    @staticmethod
+    def _split_rules(text):
+        rules = {}
+        for line in re.split(r"[;\n]", text):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if ':' not in line:
+                raise StrategySyntaxError(f"规则缺少名字 (写成 buy: ...): {line!r}")
+            name, expr = line.split(':', 1)
+            rules[name.strip().lower()] = expr.strip()
+        return rules
+
+    def _intern(self, node):
+        if node not in self._ids:
+            self._ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return ('ref', self._ids[node])
+
+    def _deref(self, ref):
+        return self.nodes[ref[1]]
+
+    def evaluate(self, prices):
+        """
+        prices: 基金×日期 的净值矩阵 (一维数组视为单只基金)
+        返回 {规则名: 结果矩阵}
+        """
+        prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+        vals = []
+
+        def get(ref):
+            return vals[ref[1]]
+
+        for node in self.nodes:
+            op = node[0]
+            if op == 'num':
+                v = node[1]
+            elif op == 'var':
+                if node[1] == 'close':
+                    v = prices
+                else:
+                    v = np.full(prices.shape, np.nan)
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        v[:, 1:] = prices[:, 1:] / prices[:, :-1] - 1
+            elif op == 'neg':
+                v = -_as_float(get(node[1]))
+            elif op == 'not':
+                v = ~np.asarray(get(node[1]), dtype=bool)
+            elif op in ('and', 'or'):
+                a = np.asarray(get(node[1]), dtype=bool)
+                b = np.asarray(get(node[2]), dtype=bool)
+                v = (a & b) if op == 'and' else (a | b)
+            elif op in _BINARY:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    v = _BINARY[op](_as_float(get(node[1])), _as_float(get(node[2])))
+            elif op == 'ma':
+                v = _ma(_as_float(get(node[1])), node[2])
+            elif op == 'ema':
+                v = _ewm(_as_float(get(node[1])), 2 / (node[2] + 1))
+            elif op == 'std':
+                v = _std(_as_float(get(node[1])), node[2])
+            elif op == 'rsi':
+                v = _rsi(_as_float(get(node[1])), node[2])
+            elif op == 'shift':
+                v = _shift(_as_float(get(node[1])), node[2])
+            else:
+                raise StrategySyntaxError(f"未知节点: {op}")
+            vals.append(v)
+
+        out = {}
+        for name, ref in self.outputs.items():
+            v = get(ref)
+            out[name] = np.broadcast_to(v, prices.shape) if np.ndim(v) < 2 else v
+        return out
+
+
+def compile_strategy(source):
+    return Strategy(source)
+
+
+# --- 4. 信号 -> 持仓 -> 资金曲线 ---
+
+def positions(buy, sell):
+    """
+    买卖信号 -> 持仓 (1 满仓 / 0 空仓)
+    跟原来逐日循环 (if buy and cash>0 … elif sell and share>0) 一样，优先级取决于当前状态：
+    空仓时只看买点，持仓时只看卖点；买卖同一天都触发就是翻转 (空仓买入 / 持仓卖出)
+    向量化：只有买点 = 置 1，只有卖点 = 置 0，都有 = 翻转；
+    某天的持仓 = 最近一次置位的值 XOR 此后翻转次数的奇偶 (之前没有置位就从空仓算起)
+    """
+    buy = np.asarray(buy, dtype=bool)
+    sell = np.asarray(sell, dtype=bool)
+    toggle = buy & sell
+    flips = np.cumsum(toggle, axis=1)
+    setter = buy ^ sell
+    cols = np.arange(buy.shape[1])[None, :]
+    # 每个位置最近一次置位的下标 (向前填充)，没有置位 = -1
+    last = np.maximum.accumulate(np.where(setter, cols, -1), axis=1)
+    rows = np.arange(buy.shape[0])[:, None]
+    at = np.maximum(last, 0)
+    base = np.where(last >= 0, buy[rows, at], False)
+    since = flips - np.where(last >= 0, flips[rows, at], 0)
+    return (base ^ (since % 2 == 1)).astype(np.float64)
+
+
+def equity_curves(prices, position):
+    """
+    资金曲线 (从 1 开始)：今天收盘的持仓吃到明天的涨跌
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    ret = np.zeros(prices.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ret[:, 1:] = prices[:, 1:] / prices[:, :-1] - 1
+    ret = np.nan_to_num(ret)
+    held = np.zeros(prices.shape)
+    held[:, 1:] = position[:, :-1]
+    return np.cumprod(1 + held * ret, axis=1)
+
+
+def run_strategy(strategy, prices):
+    """
+    一步到位：编译好的策略 (或规则文本) 在整个净值矩阵上回测
+    返回 dict: position, equity，以及每条规则的原始信号
+    """
+    if not isinstance(strategy, Strategy):
+        strategy = Strategy(strategy)
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    signals = strategy.evaluate(prices)
+    if 'buy' not in signals:
+        raise StrategySyntaxError("策略里至少要有一条 buy 规则")
+    sell = signals.get('sell', np.zeros(prices.shape, dtype=bool))
+    pos = positions(signals['buy'], sell)
+    return dict(signals, position=pos, equity=equity_curves(prices, pos))
+
+
+def run_variants(variants, prices):
+    """
+    一次跑一批策略变体：{变体名: 规则文本}
+    所有变体编译进同一张节点表，rsi(14)、ma(20) 这类公共部分全批只算一次
+    返回 {变体名: 资金曲线矩阵}
+    """
+    merged = {}
+    for name, text in variants.items():
+        for rule, expr in Strategy._split_rules(text).items():
+            merged[f"{name}/{rule}"] = expr
+    program = Strategy(merged)
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    signals = program.evaluate(prices)
+
+    curves = {}
+    no_sell = np.zeros(prices.shape, dtype=bool)
+    for name in variants:
+        if f"{name}/buy" not in signals:
+            raise StrategySyntaxError(f"变体 {name} 缺少 buy 规则")
+        pos = positions(signals[f"{name}/buy"], signals.get(f"{name}/sell", no_sell))
+        curves[name] = equity_curves(prices, pos)
+    return curves
@@ -0,0 +1,119 @@
+# strategy_router.py
+# --- 策略分流器：规则写在配置表里，编译成数组，一次向量化判完所有基金 ---
+# 加一个赛道 = 在 config.STRATEGY_TABLE 里加一段配置，不用再改 if/elif。
+
+import numpy as np
+
+# 默认规则表 (与原来 job_1450 里写死的逻辑一致)
+# 每个赛道：按 codes / categories (基金类型，见 fund_meta.save_categories) / keywords (基金名包含) 匹配
+#           先按代码和类别在所有赛道里找，都对不上才看名称关键字 (名录里没有这只基金时的兜底)
+#           categories 写大类 ('QDII') 能匹配它下面所有小类 ('QDII-普通股票')，也可以写全 ('指数型-海外股票')
+#           没写任何匹配条件的赛道 = 兜底
+# 每条规则：rsi_below / rsi_above / growth_below / growth_above 都是开区间，可以组合成区间带
+#           赛道内从上往下，第一条满足的规则生效；都不满足就是默认的 "观望"
+DEFAULT_STRATEGY_TABLE = [
+    {'sector': '券商', 'keywords': ['证券'], 'rules': [
+        {'rsi_below': 37, 'action': '🟢 【黄金坑! RSI<37】', 'color': '#00CC00'},
+        {'rsi_above': 75, 'action': '🔴 【过热! 建议止盈】', 'color': 'red'},
+        {'growth_below': -1.2, 'action': '🟢 【大跌博反弹】', 'color': 'green'},
+    ]},
+    {'sector': '美股', 'categories': ['QDII', '指数型-海外股票'], 'keywords': ['纳', '标普'], 'rules': [
+        {'rsi_below': 30, 'action': '💎 【罕见机会! 加仓!】', 'color': 'purple'},
+        {'action': '🔵 【躺平持有】', 'color': 'gray'},
+    ]},
+    {'sector': '科技', 'keywords': ['5G', 'CPO', '科技'], 'rules': [
+        {'rsi_below': 35, 'action': '🟢 【科技超跌】', 'color': 'green'},
+        {'rsi_above': 70, 'action': '🔥 【高危预警! 减仓】', 'color': '#FF4500'},
+        {'action': '😐 【震荡观察】'},
+    ]},
+    {'sector': '其他', 'rules': [
+        {'rsi_below': 30, 'action': '🟢 【RSI低位】', 'color': 'green'},
+    ]},
+]
+
+DEFAULT_ACTION = "⚪ 观望"
+DEFAULT_COLOR = "black"
+
+
+def _category_match(cat, wanted):
+    """基金类型 cat ('QDII-普通股票') 跟规则里的类别对上：完全相同，或者规则写的是它的大类 ('QDII')"""
+    if not cat:
+        return False
+    return any(cat == w or cat.startswith(w + '-') for w in wanted)
+
+
+class StrategyRouter:
+    def __init__(self, table=None, default_action=DEFAULT_ACTION, default_color=DEFAULT_COLOR):
+        """编译规则表：每条规则变成几个数组里的一列，之后判定全靠广播"""
+        self.table = table or DEFAULT_STRATEGY_TABLE
+        self.sectors = [s['sector'] for s in self.table]
+
+        rule_sector, rsi_lo, rsi_hi, g_lo, g_hi = [], [], [], [], []
+        actions, colors = [], []
+        for sid, sector in enumerate(self.table):
+            for rule in sector['rules']:
+                rule_sector.append(sid)
+                rsi_lo.append(rule.get('rsi_above', -np.inf))
+                rsi_hi.append(rule.get('rsi_below', np.inf))
+                g_lo.append(rule.get('growth_above', -np.inf))
+                g_hi.append(rule.get('growth_below', np.inf))
+                actions.append(rule['action'])
+                colors.append(rule.get('color', default_color))
+
+        self.rule_sector = np.array(rule_sector, dtype=np.int64)[:, None]
+        self.rsi_lo = np.array(rsi_lo, dtype=np.float64)[:, None]
+        self.rsi_hi = np.array(rsi_hi, dtype=np.float64)[:, None]
+        self.g_lo = np.array(g_lo, dtype=np.float64)[:, None]
+        self.g_hi = np.array(g_hi, dtype=np.float64)[:, None]
+        # 没设 RSI 条件的规则，RSI 缺失 (NaN) 也照样生效
+        self.rsi_free = np.isinf(self.rsi_lo) & np.isinf(self.rsi_hi)
+        self.growth_free = np.isinf(self.g_lo) & np.isinf(self.g_hi)
+        # 最后多放一个 "默认" 选项，没有任何规则命中时落到这里
+        self.actions = np.array(actions + [default_action], dtype=object)
+        self.colors = np.array(colors + [default_color], dtype=object)
+
+    def assign_sectors(self, codes, names, categories=None):
+        """
+        给每只基金分赛道 (基金列表不变时只需算一次)
+        categories: 可选 {基金代码: 基金类型}，配合规则表里的 categories 字段
+        三轮匹配，前一轮对上了就不看后面的：代码/类别 -> 名称关键字 -> 没写条件的兜底赛道
+        """
+        categories = categories or {}
+        ids = np.full(len(codes), -1, dtype=np.int64)
+        for i, (code, name) in enumerate(zip(codes, names)):
+            cat = categories.get(code)
+            passes = (
+                lambda sector: code in sector.get('codes', ()) or _category_match(cat, sector.get('categories', ())),
+                lambda sector: any(k in name for k in sector.get('keywords', ())),
+                lambda sector: not any(k in sector for k in ('codes', 'categories', 'keywords')),
+            )
+            for match in passes:
+                sid = next((sid for sid, sector in enumerate(self.table) if match(sector)), None)
+                if sid is not None:
+                    ids[i] = sid
+                    break
+        return ids
+
+    def route(self, sector_ids, growth, rsi):
+        """
+        向量化判定：规则数 × 基金数 的布尔矩阵，每列取第一条命中的规则
+        growth / rsi: 与 sector_ids 等长的数组，缺失值用 NaN
+        返回 (actions, colors, sector 名称) 三个数组
+        """
+        sector_ids = np.asarray(sector_ids, dtype=np.int64)[None, :]
+        growth = np.asarray(growth, dtype=np.float64)[None, :]
+        rsi = np.asarray(rsi, dtype=np.float64)[None, :]
+
+        hit = (
+            (self.rule_sector == sector_ids)
+            & (self.rsi_free | ((rsi > self.rsi_lo) & (rsi < self.rsi_hi)))
+            & (self.growth_free | ((growth > self.g_lo) & (growth < self.g_hi)))
+        )
+        default = len(self.actions) - 1
+        if default == 0:
+            first = np.zeros(sector_ids.shape[1], dtype=np.int64)
+        else:
+            first = np.where(hit.any(axis=0), hit.argmax(axis=0), default)
+
+        names = np.array(self.sectors + ['未分类'], dtype=object)
+        return self.actions[first], self.colors[first], names[sector_ids[0]]
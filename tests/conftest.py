@@ -0,0 +1,16 @@
+# 测试公共设置：仓库根目录加进 sys.path；config.py 由 workflow 生成、不在仓库里，缺了就给一个最小的
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType('config')
+    config.PUSH_CONFIG = {'token': None}
+    config.MY_FUNDS = {}
+    sys.modules['config'] = config
@@ -0,0 +1,44 @@
+# 本地假上游：测试用的 HTTP 服务，按脚本返回 (状态码, 内容, 延迟秒数)，记录收到的每个请求
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubServer:
+    def __init__(self):
+        self.script = []      # 每个元素 (status, body, delay)；用完了就一直重复最后一个
+        self.requests = []    # 收到的 (path, body)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                stub.requests.append((self.path, body))
+                status, payload, delay = stub.script[min(len(stub.requests), len(stub.script)) - 1]
+                if delay:
+                    stub._release.wait(delay)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    pass  # 客户端已经超时断开
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self._release = threading.Event()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._release.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation import RollingCorrelation, complete_through
+from fund_matrix import PriceMatrix
+
+T, N, WINDOW = 200, 6, 60
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    r = rng.normal(0, 0.01, (T, 1)) + rng.normal(0, 0.01, (T, N))
+    r[:, 2] = -r[:, 0] + rng.normal(0, 0.003, T)  # 对冲的一对
+    r[rng.random((T, N)) < 0.1] = np.nan           # 零星没发净值的日子
+    r[:80, 5] = np.nan                              # 后来才成立的基金
+    return r
+
+
+def reference(returns, t, min_days=10):
+    """pandas 的滚动相关 (成对有效) 在第 t 天的 N×N 矩阵；对角线按 RollingCorrelation 的约定记 1"""
+    ref = pd.DataFrame(returns).rolling(WINDOW, min_periods=min_days).corr().loc[t].to_numpy().copy()
+    np.fill_diagonal(ref, 1.0)
+    return ref
+
+
+def test_incremental_matches_pandas_rolling_corr(returns):
+    rc = RollingCorrelation(list(range(N)), WINDOW)
+    ref = pd.DataFrame(returns).rolling(WINDOW, min_periods=10).corr()
+    for t in range(T):
+        rc.update(returns[t])
+        expected = ref.loc[t].to_numpy().copy()
+        np.fill_diagonal(expected, 1.0)
+        got = rc.correlation()
+        # 缺失的位置一模一样，有数的位置只差几个 ulp
+        np.testing.assert_array_equal(np.isnan(got), np.isnan(expected), err_msg=f"day {t}")
+        np.testing.assert_allclose(got, expected, rtol=0, atol=1e-14, equal_nan=True, err_msg=f"day {t}")
+
+
+def test_covariance_matches_pandas(returns):
+    rc = RollingCorrelation(list(range(N)), WINDOW)
+    rc.seed(returns.T)
+    expected = pd.DataFrame(returns[-WINDOW:]).cov(min_periods=2).to_numpy()
+    np.testing.assert_allclose(rc.covariance(), expected, rtol=1e-10, atol=1e-18, equal_nan=True)
+
+
+def test_seed_and_state_roundtrip(returns, tmp_path):
+    dates = pd.bdate_range('2024-01-02', periods=T)
+    rc = RollingCorrelation(list('ABCDEF'), WINDOW)
+    rc.seed(returns.T, dates)
+    np.testing.assert_allclose(rc.correlation(), reference(returns, T - 1), rtol=0, atol=1e-14)
+    assert rc.last_date == dates[-1]
+
+    path = str(tmp_path / 'corr_state.npz')
+    rc.save_state(path)
+    loaded = RollingCorrelation.load_state(path)
+    assert loaded.codes == rc.codes and loaded.last_date == rc.last_date
+    np.testing.assert_allclose(loaded.correlation(), rc.correlation(), rtol=0, atol=1e-14)
+
+
+def test_flag_pairs(returns):
+    rc = RollingCorrelation(list('ABCDEF'), WINDOW)
+    rc.seed(returns.T)
+    flags = rc.flag_pairs(hedge=-0.3, danger=0.8)
+    assert ('hedge', 'A', 'C') in [f[:3] for f in flags]
+    corr = reference(returns, T - 1)
+    for kind, a, b, v in flags:
+        assert v == pytest.approx(corr['ABCDEF'.index(a), 'ABCDEF'.index(b)], abs=1e-14)
+
+
+def test_complete_through_waits_for_late_funds():
+    dates = pd.bdate_range('2024-05-06', periods=6)
+    values = np.ones((3, 6))
+    values[1, -1] = np.nan            # QDII 晚一天
+    values[2, 2:] = np.nan            # 停牌很久，不拖住大家
+    m = PriceMatrix(['A', 'B', 'C'], dates, values)
+    assert complete_through(m, max_lag=2) == dates[-2]
@@ -0,0 +1,82 @@
+import argparse
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from fetch_client import FetchClient
+
+data_engine = pytest.importorskip('data_engine')  # data_engine 依赖 akshare
+
+FUNDS = {f"{i:06d}": f"基金{i}" for i in range(0, 600, 7)}
+
+
+@pytest.fixture
+def de(tmp_path, monkeypatch):
+    de = data_engine.DataEngine.__new__(data_engine.DataEngine)
+    de.engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    de.client = FetchClient()
+    monkeypatch.setattr(data_engine.DataEngine, '_init_table', lambda self: None)
+
+    def fake_update(self, code, name, last_fp=None, writer=None):
+        return 'skipped'
+
+    monkeypatch.setattr(data_engine.DataEngine, 'update_single_fund', fake_update)
+    return de
+
+
+def test_shard_of_is_stable():
+    # md5 取模，跟进程、PYTHONHASHSEED 都无关：写死几个已知值
+    assert [data_engine.shard_of('000001', n) for n in (2, 4, 7)] == [1, 3, 0]
+    assert [data_engine.shard_of('110011', n) for n in (2, 4, 7)] == [1, 1, 2]
+    assert [data_engine.shard_of('161725', n) for n in (2, 4, 7)] == [0, 0, 0]
+
+
+@pytest.mark.parametrize('n_shards', [1, 2, 3, 4, 8])
+def test_shards_cover_every_code_exactly_once(n_shards):
+    parts = [data_engine.select_shard(FUNDS, i, n_shards) for i in range(n_shards)]
+    codes = [c for part in parts for c in part]
+    assert sorted(codes) == sorted(FUNDS)
+    assert len(codes) == len(set(codes))
+    if n_shards > 1:
+        assert all(parts)  # 86 只基金分几片，不该有空片
+
+
+def test_parse_shard():
+    assert data_engine.parse_shard('0/4') == (0, 4)
+    assert data_engine.parse_shard('3/4') == (3, 4)
+    for bad in ('4/4', '-1/4', '0/0', 'a/4', '1'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            data_engine.parse_shard(bad)
+
+
+def test_merge_shards_resumes_from_progress(de):
+    for i in (0, 2):
+        de.run_all(FUNDS, with_etf=False, shard=(i, 3), run_id='r1')
+    result = de.merge_shards(3, run_id='r1', funds=FUNDS)
+    assert not result['complete'] and result['missing_shards'] == [1]
+
+    # 只补跑缺的那片，之前两片的进度还在库里，合并就齐了
+    de.run_all(FUNDS, with_etf=False, shard=(1, 3), run_id='r1')
+    result = de.merge_shards(3, run_id='r1', funds=FUNDS)
+    assert result['complete'] and result['missing_shards'] == [] and result['short_shards'] == []
+    assert result['summary']['skipped'] == len(FUNDS)
+
+    # 别的批次、别的分片数的进度不算
+    assert de.merge_shards(3, run_id='r2', funds=FUNDS)['missing_shards'] == [0, 1, 2]
+    assert de.merge_shards(4, run_id='r1', funds=FUNDS)['missing_shards'] == [0, 1, 2, 3]
+
+
+def test_rerun_shard_overwrites_short_progress(de):
+    for i in range(3):
+        de.run_all(FUNDS, with_etf=False, shard=(i, 3), run_id='r1')
+    # 第 1 片中途崩了只记下一只：合并时基金数对不上
+    crashed = {'updated': [], 'skipped': [], 'failed': ['000007']}
+    de._save_progress('r1', (1, 3), crashed, pd.Timestamp.now())
+    result = de.merge_shards(3, run_id='r1', funds=FUNDS)
+    assert result['short_shards'] == [1] and result['failed'] == ['000007']
+
+    # 重跑这一片，先删后存覆盖掉那行
+    de.run_all(FUNDS, with_etf=False, shard=(1, 3), run_id='r1')
+    result = de.merge_shards(3, run_id='r1', funds=FUNDS)
+    assert result['complete'] and result['failed'] == []
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import db_writer
+from db_writer import BatchWriter
+from fetch_client import FetchClient
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'w.db'}")
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TABLE fund_nav_history (fund_code VARCHAR(10), nav_date DATE, nav_value DOUBLE)"))
+        conn.commit()
+    return engine
+
+
+def nav(code, n=3, value=1.0):
+    return pd.DataFrame({'fund_code': code, 'nav_date': pd.date_range('2024-05-01', periods=n).date,
+                         'nav_value': value})
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return pd.read_sql(text("SELECT * FROM fund_nav_history ORDER BY fund_code, nav_date"), conn)
+
+
+def test_batches_replace_old_rows(engine):
+    nav('A', 5, 0.5).to_sql('fund_nav_history', engine, if_exists='append', index=False)
+    with BatchWriter(engine, batch_rows=4, flush_seconds=0.05) as writer:
+        writer.put('A', nav('A', 3))
+        writer.put('B', nav('B', 2))
+        writer.put('C', nav('C', 2))
+    df = rows(engine)
+    assert df.groupby('fund_code').size().to_dict() == {'A': 3, 'B': 2, 'C': 2}
+    assert set(df['nav_value']) == {1.0}
+    assert sorted(writer.written) == ['A', 'B', 'C'] and writer.failed == {}
+
+
+def test_failed_batch_rolls_back(engine):
+    nav('A', 5, 0.5).to_sql('fund_nav_history', engine, if_exists='append', index=False)
+    with BatchWriter(engine, batch_rows=1000, flush_seconds=10) as writer:
+        writer.put('A', nav('A', 3).assign(oops=1))  # 表里没有这一列，INSERT 会失败
+        writer.put('B', nav('B', 2))                 # 跟 A 同一批
+    assert set(writer.failed) == {'A', 'B'}
+    # DELETE 跟着回滚了：A 的旧数据还在，B 一行都没写
+    df = rows(engine)
+    assert df.groupby('fund_code').size().to_dict() == {'A': 5}
+    assert set(df['nav_value']) == {0.5}
+
+
+def test_backpressure_blocks_producer(engine):
+    writer = BatchWriter(engine, batch_rows=1, flush_seconds=0.01, max_pending=1)
+    flush = writer._flush
+
+    def slow_flush(pending):
+        time.sleep(0.05)
+        flush(pending)
+
+    writer._flush = slow_flush
+    with writer:
+        for i in range(6):
+            assert writer.put(f"{i:06d}", nav(f"{i:06d}", 1))
+    assert writer.wait_seconds > 0.05  # 队列只有 1 格，生产者被写库速度拖住
+    assert len(writer.written) == 6 and writer.batches == 6
+
+
+def test_dead_writer_does_not_hang_producers(engine, monkeypatch):
+    monkeypatch.setattr(db_writer, 'PUT_POLL_SECONDS', 0.02)
+    writer = BatchWriter(engine, batch_rows=1, flush_seconds=0.01, max_pending=1)
+
+    def broken(pending):
+        raise ConnectionError("Lost connection to MySQL server")  # 单批 try 之外漏出来的异常
+
+    writer._flush = broken
+    writer.start()
+    codes = [f"{i:06d}" for i in range(10)]
+    results = {}
+
+    def produce(code):
+        results[code] = writer.put(code, nav(code, 1))
+
+    threads = [threading.Thread(target=produce, args=(c,)) for c in codes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert not any(t.is_alive() for t in threads)  # 没有生产者卡死
+    writer.close()
+    assert isinstance(writer.error, ConnectionError)
+    assert set(writer.failed) == set(codes)       # 交上去的、没交上去的都记成失败
+    assert not any(results.values()) or len(results) == len(codes)
+    assert writer.put('999999', nav('999999')) is False
+
+
+def test_run_all_reports_writer_failures(engine, monkeypatch):
+    data_engine = pytest.importorskip('data_engine')  # data_engine 依赖 akshare
+    de = data_engine.DataEngine.__new__(data_engine.DataEngine)
+    de.engine = engine
+    de.client = FetchClient()
+    monkeypatch.setattr(data_engine.DataEngine, '_init_table', lambda self: None)
+
+    def fake_update(self, code, name, last_fp=None, writer=None):
+        df = nav(code, 2)
+        if code == 'BAD':
+            df = df.assign(oops=1)
+        writer.put(code, df)
+        self.fingerprints[code] = ('2024-05-02', 2, 'h')
+        return 'updated'
+
+    monkeypatch.setattr(data_engine.DataEngine, 'update_single_fund', fake_update)
+    monkeypatch.setattr(data_engine.config, 'DB_BATCH_ROWS', 1, raising=False)
+    summary = de.run_all({'GOOD': 'g', 'BAD': 'b'}, with_etf=False)
+    assert summary['updated'] == ['GOOD'] and summary['failed'] == ['BAD']
+    assert 'BAD' not in de.fingerprints
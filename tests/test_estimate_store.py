@@ -0,0 +1,23 @@
+from sqlalchemy import create_engine
+
+from estimate_store import EstimateStore, sync_to_db, load_day_db
+
+
+def test_sync_to_db_is_idempotent_and_feeds_dashboard(tmp_path):
+    store = EstimateStore(str(tmp_path / "est"))
+    store.append('012363', 0.5, '2024-05-17 14:30')
+    store.append('012363', 1.2, '2024-05-20 10:00')
+    store.append('012363', 1.5, '2024-05-20 14:45')
+    store.append('006479', -0.3, '2024-05-20 14:45')
+    store.compact('2024-05-17')
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+
+    assert sync_to_db(engine, store) == 4
+    assert sync_to_db(engine, store) == 4  # 按天先删后存，重复同步不翻倍
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM fund_estimate_log").scalar() == 4
+
+    day, df = load_day_db(engine, ['012363'])
+    assert day == '20240520'
+    assert list(df['est_growth'].round(4)) == [1.2, 1.5]
+    assert load_day_db(engine, ['000001'])[0] is None
@@ -0,0 +1,180 @@
+import json
+
+import pandas as pd
+import pytest
+import requests
+
+from fetch_client import (FetchClient, ThrottledError, TransientError, PermanentError, UpstreamTimeout,
+                          EmptyPayloadError, CircuitOpenError, not_empty)
+from stub_server import StubServer
+
+HOST = 'stub.local'
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client():
+    c = FetchClient(max_attempts=4, base_delay=0.001, max_delay=0.01, fail_threshold=5,
+                    reset_timeout=60, initial_concurrency=8)
+    yield c
+    c.session.close()
+
+
+def fetch_nav(client, stub, timeout=(1, 0.3)):
+    """模拟 akshare 的净值接口：拿 JSON -> DataFrame -> 取 '单位净值' 列"""
+    def _do():
+        resp = client.session.get(stub.url + "/nav", timeout=timeout)
+        resp.raise_for_status()
+        df = pd.DataFrame(json.loads(resp.text)['data'])
+        return df[['净值日期', '单位净值']]
+    return client.call(HOST, _do, validate=not_empty)
+
+
+GOOD = (200, {'data': [{'净值日期': '2024-05-20', '单位净值': 1.23}]}, 0)
+
+
+def test_throttled_then_ok_halves_concurrency(client, stub):
+    stub.script = [(429, b'slow down', 0), GOOD]
+    df = fetch_nav(client, stub)
+    assert len(df) == 1 and len(stub.requests) == 2
+    s = client.stats()[HOST]
+    assert s['errors'] == {'throttled': 1}
+    assert s['concurrency'] < 8
+
+
+@pytest.mark.parametrize('payload', [
+    b'',                                   # 空响应 -> JSONDecodeError (ValueError)
+    b'{"data": [{"x": 1}',                 # 截断的 JSON
+    {'data': []},                          # 空表 -> KeyError: 单位净值
+    {'data': [{'净值日期': '2024-05-20'}]},  # 缺列 -> KeyError
+    {},                                    # 没有 data -> KeyError
+])
+def test_empty_or_short_payload_is_retried(client, stub, payload):
+    stub.script = [(200, payload, 0), GOOD]
+    df = fetch_nav(client, stub)
+    assert len(df) == 1 and len(stub.requests) == 2
+    s = client.stats()[HOST]
+    assert s['errors'] == {'empty_payload': 1}
+    assert s['concurrency'] >= 8  # 空壳重试成功了不算拥塞 (也可能只是这只基金的问题)
+
+
+def test_validate_failure_is_retried(client):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return pd.DataFrame() if len(calls) < 3 else pd.DataFrame({'a': [1]})
+
+    assert len(client.call(HOST, fn, validate=not_empty)) == 1
+    assert len(calls) == 3
+
+
+def test_persistent_empty_payload_raises_after_retries(client, stub):
+    stub.script = [(200, {'data': []}, 0)]
+    with pytest.raises(EmptyPayloadError):
+        fetch_nav(client, stub)
+    assert len(stub.requests) == 4
+    s = client.stats()[HOST]
+    assert s['breaker'] == 'closed'
+    assert s['concurrency'] == 4  # 4 次重试只算一次拥塞：8 -> 4
+
+
+def test_programming_error_is_permanent_and_keeps_cause(client):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {'a': 1}['b']
+
+    with pytest.raises(PermanentError) as info:
+        client.call(HOST, fn)
+    assert len(calls) == 1
+    assert isinstance(info.value.__cause__, KeyError)
+    assert client.stats()[HOST]['breaker'] == 'closed'
+
+
+def test_bad_symbol_does_not_open_breaker_for_others(stub):
+    client = FetchClient(max_attempts=4, base_delay=0.001, max_delay=0.01, fail_threshold=3,
+                         reset_timeout=60, initial_concurrency=8)
+    try:
+        good = GOOD[1]
+        # 一只代码错了的基金永远只回空壳，其余基金正常；每只基金都按一次调用记账
+        for _ in range(2):
+            stub.script = [(200, b'', 0)]
+            with pytest.raises(EmptyPayloadError):
+                fetch_nav(client, stub)
+            stub.script = [(200, good, 0)]
+            assert len(fetch_nav(client, stub)) == 1
+        # 连着两只坏的也没到阈值 (旧做法每次重试都记一次失败，第一只就把站点熔断了)
+        for _ in range(2):
+            stub.script = [(200, b'', 0)]
+            with pytest.raises(EmptyPayloadError):
+                fetch_nav(client, stub)
+        assert client.stats()[HOST]['breaker'] == 'closed'
+        stub.script = [(200, good, 0)]
+        assert len(fetch_nav(client, stub)) == 1
+    finally:
+        client.session.close()
+
+
+def test_client_error_is_not_retried(client, stub):
+    stub.script = [(404, b'not found', 0)]
+    with pytest.raises(PermanentError):
+        fetch_nav(client, stub)
+    assert len(stub.requests) == 1
+
+
+def test_server_error_is_transient(client, stub):
+    stub.script = [(500, b'oops', 0), (502, b'oops', 0), GOOD]
+    assert len(fetch_nav(client, stub)) == 1
+    assert client.stats()[HOST]['errors'] == {'transient': 2}
+    assert client.stats()[HOST]['concurrency'] >= 8  # 5xx 不降并发
+
+
+def test_timeout_is_retried_and_congests(client, stub):
+    stub.script = [(200, GOOD[1], 2.0), GOOD]
+    assert len(fetch_nav(client, stub)) == 1
+    s = client.stats()[HOST]
+    assert s['errors'] == {'timeout': 1}
+    assert s['concurrency'] < 8
+
+
+def test_breaker_opens_after_consecutive_failures(client, stub):
+    stub.script = [(503, b'down', 0)]
+    for _ in range(5):                   # 连续 5 次调用失败 (每次内部重试 4 次) 才熔断
+        assert client.stats().get(HOST, {}).get('breaker', 'closed') == 'closed'
+        with pytest.raises(ThrottledError):
+            fetch_nav(client, stub)
+    assert len(stub.requests) == 20
+    n = len(stub.requests)
+    with pytest.raises(CircuitOpenError):
+        fetch_nav(client, stub)
+    assert len(stub.requests) == n      # 熔断中不再打上游
+    assert client.stats()[HOST]['breaker'] == 'open'
+
+
+def test_get_classifies_status(client, stub):
+    stub.script = [(503, b'', 0), (200, b'ok', 0)]
+    resp = client.get(stub.url + "/js/012363.js", host=HOST)
+    assert resp.text == 'ok'
+    assert client.stats()[HOST]['errors'] == {'throttled': 1}
+
+
+def test_classify_connection_errors():
+    from fetch_client import classify
+    assert isinstance(classify(requests.ConnectionError("Read timed out.")), UpstreamTimeout)
+    assert isinstance(classify(requests.ConnectionError("reset by peer")), TransientError)
+    assert isinstance(classify(KeyError('单位净值')), EmptyPayloadError)
+    assert isinstance(classify(KeyError("['单位净值'] not in index")), EmptyPayloadError)
+    assert isinstance(classify(json.JSONDecodeError('x', '', 0)), EmptyPayloadError)
+    assert isinstance(classify(ValueError('Length mismatch: Expected axis has 0 elements, new values have 7')),
+                      EmptyPayloadError)
+    assert isinstance(classify(KeyError('fund_code')), PermanentError)
+    assert isinstance(classify(TypeError("unsupported operand type(s) for +: 'int' and 'str'")), PermanentError)
+    assert isinstance(classify(IndexError('list index out of range')), PermanentError)
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+forecast = pytest.importorskip('forecast')  # forecast -> planner 依赖 akshare
+from planner import FreshnessPlanner
+
+HOLIDAY = pd.date_range('2024-10-01', '2024-10-07')  # 国庆
+
+
+def test_forecast_dates_skip_holidays(tmp_path):
+    days = pd.bdate_range('2024-09-01', '2024-12-31')
+    planner = FreshnessPlanner.__new__(FreshnessPlanner)
+    planner.calendar = days[~days.isin(HOLIDAY)]
+    service = forecast.ForecastService(create_engine(f"sqlite:///{tmp_path / 'f.db'}"), workers=1, planner=planner)
+
+    h = forecast.HORIZON
+    result = {'code': '012363', 'order': [1, 1, 0], 'params': [0.1, 0.01], 'searched': True,
+              'mean': [1.0] * h, 'lower': [0.9] * h, 'upper': [1.1] * h}
+    service._save([result], {}, {'012363': pd.Timestamp('2024-09-27')})
+
+    df = pd.read_sql("SELECT horizon, forecast_date FROM fund_forecast ORDER BY horizon", service.engine)
+    # 9/27 (周五) 之后：9/30 一个交易日，然后直接跳到节后
+    expected = ['2024-09-30', '2024-10-08', '2024-10-09', '2024-10-10', '2024-10-11'][:h]
+    assert list(df['horizon']) == list(range(1, h + 1))
+    assert [str(pd.Timestamp(d).date()) for d in df['forecast_date']] == expected
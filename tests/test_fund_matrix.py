@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from fund_matrix import PriceMatrix, load_nav_long
+
+
+def make_long():
+    # 三只基金、各自的净值日期：B 中间缺两天 (QDII 休市)，C 晚几天成立
+    dates = pd.bdate_range('2024-03-01', periods=12)
+    rng = np.random.default_rng(1)
+    rows = []
+    for code, keep in (('A', dates), ('B', dates.delete([4, 5])), ('C', dates[3:])):
+        nav = np.round(np.cumprod(1 + rng.normal(0, 0.01, len(keep))), 4)
+        rows.append(pd.DataFrame({'fund_code': code, 'nav_date': keep, 'nav_value': nav}))
+    return pd.concat(rows, ignore_index=True).sample(frac=1, random_state=0)  # 乱序进来
+
+
+def test_from_long_matches_pivot_ffill():
+    long = make_long()
+    m = PriceMatrix.from_long(long)
+    ref = long.pivot(index='nav_date', columns='fund_code', values='nav_value').sort_index().ffill()
+    pd.testing.assert_frame_equal(m.to_frame(), ref, check_names=False, check_freq=False)
+    assert np.isnan(m.values[m.index_of('C'), :3]).all()  # 成立前不会凭空造数据
+
+
+def test_returns_match_pct_change():
+    long = make_long()
+    m = PriceMatrix.from_long(long)
+    ref = m.to_frame().pct_change(fill_method=None).iloc[1:]
+    np.testing.assert_allclose(m.returns().T, ref.to_numpy(), rtol=1e-12, equal_nan=True)
+
+    # 不补值：每只基金按自己的日期算，跟单独拿出来 pct_change 一样，缺的那天是 NaN
+    raw = PriceMatrix.from_long(long, ffill=False)
+    own = pd.DataFrame(raw.own_returns().T, index=raw.dates[1:], columns=raw.codes)
+    for code, g in long.groupby('fund_code'):
+        s = g.set_index('nav_date')['nav_value'].sort_index()
+        pd.testing.assert_series_equal(own[code].dropna(), s.pct_change().dropna(),
+                                       check_names=False, check_freq=False, rtol=1e-12)
+    assert np.isnan(own.loc[raw.dates[4], 'B'])
+
+
+def test_reindex_and_tail():
+    m = PriceMatrix.from_long(make_long())
+    r = m.reindex(['C', 'X', 'A'])
+    assert r.codes == ['C', 'X', 'A'] and np.isnan(r.values[1]).all()
+    np.testing.assert_array_equal(r.values[2], m.values[m.index_of('A')])
+    t = m.tail(5)
+    assert t.values.base is not None and np.shares_memory(t.values, m.values)  # 视图，不拷贝
+    pd.testing.assert_frame_equal(t.to_frame(), m.to_frame().iloc[-5:], check_freq=False)
+
+
+def test_from_db_roundtrip(tmp_path):
+    long = make_long()
+    engine = create_engine(f"sqlite:///{tmp_path / 'nav.db'}")
+    long.assign(nav_date=long['nav_date'].dt.date).to_sql('fund_nav_history', engine, index=False)
+    got = load_nav_long(engine, ['A', 'B'], start_date='2024-03-05')
+    assert list(got['fund_code'].unique()) == ['A', 'B'] and got['nav_date'].min() == pd.Timestamp('2024-03-05')
+    m = PriceMatrix.from_db(engine)
+    pd.testing.assert_frame_equal(m.to_frame(), PriceMatrix.from_long(long).to_frame(), check_freq=False)
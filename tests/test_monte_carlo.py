@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from monte_carlo import MonteCarlo, confidence_table, price_paths, sample_indices, QUANTILES
+from risk_metrics import TRADING_DAYS
+
+RULE = "buy: rsi(14) < 35; sell: rsi(14) > 65"
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    return np.cumprod(1 + rng.normal(0.0004, 0.015, 400))
+
+
+@pytest.mark.parametrize('method', ['block', 'iid', 'shuffle'])
+def test_seeded_run_shape_and_drawdown(prices, method):
+    mc = MonteCarlo(RULE, n_paths=250, method=method, chunk=100, seed=42)  # 3 批，最后一批不满
+    out = mc.run(prices)
+    assert out.shape == (250, 5)
+    assert list(out.columns) == ['return', 'max_dd', 'hold_return', 'hold_max_dd', 'excess']
+    assert out.notna().all().all()
+    assert (out['max_dd'] <= 0).all() and (out['hold_max_dd'] <= 0).all()
+    assert (out['max_dd'] >= -1).all() and (out['hold_max_dd'] >= -1).all()
+    np.testing.assert_allclose(out['excess'], out['return'] - out['hold_return'])
+    # 同一个种子结果一模一样，换个种子就不一样
+    pd.testing.assert_frame_equal(out, MonteCarlo(RULE, n_paths=250, method=method, chunk=100, seed=42).run(prices))
+    if method != 'shuffle':  # 打乱顺序不改变死拿的总收益
+        assert not np.allclose(out['hold_return'], MonteCarlo(RULE, n_paths=250, method=method, chunk=100,
+                                                               seed=43).run(prices)['hold_return'])
+
+
+def test_shuffle_keeps_hold_return(prices):
+    out = MonteCarlo(RULE, n_paths=50, method='shuffle', seed=1).run(prices)
+    np.testing.assert_allclose(out['hold_return'], prices[-1] / prices[0] - 1)
+
+
+def test_years_sets_path_length(prices):
+    rng = np.random.default_rng(5)
+    idx = sample_indices(rng, 399, 7, int(0.5 * TRADING_DAYS), 'block', 20)
+    assert idx.shape == (7, 126) and idx.min() >= 0 and idx.max() < 399
+    paths = price_paths(np.diff(prices) / prices[:-1], idx)
+    assert paths.shape == (7, 127) and (paths[:, 0] == 1.0).all()
+
+
+def test_confidence_table_shape(prices):
+    out = MonteCarlo(RULE, n_paths=100, seed=3).run(prices)
+    table = confidence_table(out)
+    assert list(table.index) == list(out.columns)
+    assert list(table.columns) == [f"p{int(q * 100)}" for q in QUANTILES] + ['mean']
+    assert (table.loc['max_dd'] <= 0).all()
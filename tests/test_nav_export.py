@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import nav_export
+from fund_matrix import load_nav_long
+from nav_export import export_history, read_manifest, scan
+from walk_forward import walk_forward_db, walk_forward_files
+
+CODES = ['000001', '012363', '161725']
+WF = dict(grid={'n': [6, 14], 'lo': [30], 'hi': [70]}, train=120, test=40, workers=1)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nav.db'}")
+    rng = np.random.default_rng(11)
+    frames = []
+    for i, code in enumerate(CODES):
+        # 每只基金的起始日不同，跨两个年份
+        dates = pd.bdate_range('2023-03-01', '2024-09-30')[i * 15:]
+        nav = np.round(np.cumprod(1 + rng.normal(0.0003, 0.01, len(dates))), 4)
+        frames.append(pd.DataFrame({'fund_code': code, 'fund_name': f"基金{code}", 'nav_date': dates.date,
+                                    'nav_value': nav, 'daily_growth': np.r_[0, np.diff(nav) / nav[:-1] * 100]}))
+    pd.concat(frames).to_sql('fund_nav_history', engine, index=False)
+    return engine
+
+
+def _matrix(long):
+    return long.pivot(index='nav_date', columns='fund_code', values='nav_value')
+
+
+def _round_trip(engine, root, partition, fmt):
+    manifest = export_history(engine, root, partition, fmt, chunksize=97)  # 小块，一个分区拆成多个 part
+    assert read_manifest(root)['rows'] == manifest['rows'] == len(load_nav_long(engine))
+    pd.testing.assert_frame_equal(_matrix(scan(root)), _matrix(load_nav_long(engine)))
+    pd.testing.assert_frame_equal(_matrix(scan(root, CODES[1:], start_date='2024-01-01')),
+                                  _matrix(load_nav_long(engine, CODES[1:], start_date='2024-01-01')))
+
+    from_files = walk_forward_files(CODES, root=root, **WF)
+    from_db = walk_forward_db(engine, CODES, **WF)
+    assert sorted(from_files) == CODES
+    for code in CODES:
+        pd.testing.assert_frame_equal(from_files[code]['folds'], from_db[code]['folds'])
+        pd.testing.assert_series_equal(from_files[code]['oos_equity'], from_db[code]['oos_equity'])
+
+
+@pytest.mark.parametrize('partition', ['fund_code', 'year'])
+def test_round_trip_without_pyarrow(engine, tmp_path, monkeypatch, partition):
+    monkeypatch.setattr(nav_export, 'pa', None)
+    monkeypatch.setattr(nav_export, 'pq', None)
+    root = str(tmp_path / 'export')
+    _round_trip(engine, root, partition, 'parquet')  # 要 parquet 也会退回 CSV
+    assert read_manifest(root)['format'] == 'csv'
+
+
+@pytest.mark.parametrize('partition', ['fund_code', 'year'])
+def test_round_trip_parquet(engine, tmp_path, partition):
+    pytest.importorskip('pyarrow')
+    root = str(tmp_path / 'export')
+    _round_trip(engine, root, partition, None)
+    assert read_manifest(root)['format'] == 'parquet'
+
+
+def test_parquet_export_needs_pyarrow_to_read(engine, tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    root = str(tmp_path / 'export')
+    export_history(engine, root, 'fund_code', 'parquet')
+    monkeypatch.setattr(nav_export, 'pq', None)
+    with pytest.raises(ImportError):
+        scan(root)
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import notifier
+from notifier import Outbox, split_html
+from stub_server import StubServer
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def outbox(tmp_path, stub):
+    box = Outbox(path=str(tmp_path / "outbox.db"), url=stub.url + "/send", timeout=(1, 0.3),
+                 max_attempts=3, backoff=2.0, dedup_window=3600, max_chars=50)
+    yield box
+    box.session.close()
+
+
+def _status(box):
+    with box._connect() as conn:
+        return conn.execute("SELECT status, attempts, next_try, last_error FROM outbox ORDER BY id").fetchall()
+
+
+def test_split_html_keeps_chunks_under_limit():
+    content = "<br>".join(f"第{i}行<b>内容</b>" for i in range(40))
+    chunks = split_html(content, 60)
+    assert len(chunks) > 1
+    assert all(len(c) <= 60 for c in chunks)
+    assert "<br>".join(chunks) == content
+    assert split_html("短消息", 60) == ["短消息"]
+
+
+def test_split_html_hard_cuts_oversized_segment():
+    chunks = split_html("x" * 130, 50)
+    assert [len(c) for c in chunks] == [50, 50, 30]
+
+
+def test_sent_on_success(outbox, stub):
+    stub.script = [(200, {'code': 200, 'msg': 'ok'}, 0)]
+    assert outbox.enqueue("标题", "内容", token="t") == 1
+    assert outbox.process_once()
+    assert _status(outbox)[0][0] == 'sent'
+    assert b'"token": "t"' in stub.requests[0][1]
+
+
+def test_long_message_is_split_with_page_titles(outbox, stub):
+    stub.script = [(200, {'code': 200}, 0)]
+    content = "<br>".join("y" * 20 for _ in range(6))
+    assert outbox.enqueue("日报", content, token="t") > 1
+    while outbox.process_once():
+        pass
+    bodies = [body for _, body in stub.requests]
+    assert len(bodies) > 1 and b"(1/" in bodies[0]
+
+
+def test_duplicate_within_window_is_skipped(outbox):
+    assert outbox.enqueue("标题", "内容", token="t") == 1
+    assert outbox.enqueue("标题", "内容", token="t") == 0
+    assert outbox.enqueue("标题", "内容", token="other") == 1
+
+
+def test_timeout_is_retried_with_backoff(outbox, stub):
+    stub.script = [(200, {'code': 200}, 2.0)]  # 比读超时 0.3 秒慢
+    outbox.enqueue("标题", "内容", token="t")
+    before = time.time()
+    outbox.process_once()
+    status, attempts, next_try, error = _status(outbox)[0]
+    assert status == 'pending' and attempts == 1
+    assert 'Timeout' in error
+    # 第 1 次失败等 backoff * 2^0 * [0.5, 1.5] 秒
+    assert before + 1.0 - 0.1 <= next_try <= time.time() + 3.0 + 0.1
+    assert outbox.process_once() is False  # 没到点不会再发
+
+
+def test_backoff_grows_and_gives_up(outbox, stub, monkeypatch):
+    stub.script = [(503, b'busy', 0)]
+    monkeypatch.setattr(notifier.random, 'uniform', lambda a, b: 1.0)
+    outbox.enqueue("标题", "内容", token="t")
+    delays = []
+    for _ in range(3):
+        with outbox._connect() as conn:
+            conn.execute("UPDATE outbox SET next_try = 0")
+        now = time.time()
+        outbox.process_once()
+        status, attempts, next_try, _ = _status(outbox)[0]
+        if status == 'pending':
+            delays.append(next_try - now)
+    assert [round(d) for d in delays] == [2, 4]
+    assert status == 'dead' and attempts == 3
+
+
+@pytest.mark.parametrize('code', [903, 900, 888])
+def test_pushplus_rejection_is_dead_immediately(outbox, stub, code):
+    stub.script = [(200, {'code': code, 'msg': '无效的用户令牌'}, 0)]
+    outbox.enqueue("标题", "内容", token="bad")
+    outbox.process_once()
+    status, attempts, _, error = _status(outbox)[0]
+    assert status == 'dead' and attempts == 1
+    assert str(code) in error
+
+
+def test_pushplus_server_error_is_retried(outbox, stub):
+    stub.script = [(200, {'code': 500, 'msg': '系统异常'}, 0), (200, {'code': 200}, 0)]
+    outbox.enqueue("标题", "内容", token="t")
+    outbox.process_once()
+    assert _status(outbox)[0][0] == 'pending'
+    with outbox._connect() as conn:
+        conn.execute("UPDATE outbox SET next_try = 0")
+    outbox.process_once()
+    assert _status(outbox)[0][0] == 'sent'
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+planner_mod = pytest.importorskip('planner')  # planner 依赖 akshare
+FreshnessPlanner = planner_mod.FreshnessPlanner
+
+HOLIDAY = pd.date_range('2024-10-01', '2024-10-07')  # 国庆
+QDII, ASHR = '006479', '012363'
+
+
+@pytest.fixture
+def planner(tmp_path, monkeypatch):
+    monkeypatch.setattr(planner_mod.config, 'PUBLISH_LAG', {}, raising=False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'p.db'}")
+    # 日历一直铺到今天以后，_load_calendar 不会去网上刷新
+    days = pd.bdate_range('2024-06-01', pd.Timestamp.today() + pd.Timedelta(days=60))
+    days = days[~days.isin(HOLIDAY)]
+    pd.DataFrame({'trade_date': days.date}).to_sql('trade_calendar', engine, index=False)
+    return FreshnessPlanner(engine)
+
+
+def fp(day):
+    return (pd.Timestamp(day), 100, 'hash')
+
+
+def learn_qdii_lag(planner):
+    # QDII 一直是 T+1 才出：9 月每个交易日的净值，下一个交易日才第一次看到
+    days = planner.calendar[(planner.calendar >= '2024-09-02') & (planner.calendar <= '2024-09-27')]
+    for nav_day, seen in zip(days[:-1], days[1:]):
+        planner.record({QDII: fp(nav_day), ASHR: fp(seen)}, today=seen)
+
+
+def test_publish_lags_learned_and_manual(planner, monkeypatch):
+    learn_qdii_lag(planner)
+    assert planner.publish_lags([QDII, ASHR, '000001']) == {QDII: 1, ASHR: 0, '000001': 0}
+    monkeypatch.setattr(planner_mod.config, 'PUBLISH_LAG', {ASHR: 2})
+    assert planner.publish_lags([ASHR])[ASHR] == 2
+
+
+def test_publish_lags_ignores_rare_outliers(planner):
+    days = planner.calendar[(planner.calendar >= '2024-08-01')][:21]
+    for i, (nav_day, same) in enumerate(zip(days[:-1], days[:-1])):
+        seen = days[i + 1] if i == 5 else same  # 20 次里只有 1 次晚了一天
+        planner.record({ASHR: fp(nav_day)}, today=seen)
+    assert planner.publish_lags([ASHR])[ASHR] == 0
+
+
+def test_plan_weekend(planner):
+    # 周六：不是交易日，周五的净值已经在库里就不用抓
+    plan = planner.plan({ASHR: 'A'}, {ASHR: '2024-09-27'}, today='2024-09-28')
+    assert plan['trading_day'] is False
+    assert plan['due'] == {} and plan['fresh'] == [ASHR]
+    assert plan['expected'][ASHR] == pd.Timestamp('2024-09-27')
+
+
+def test_plan_holiday(planner):
+    # 国庆中间：理应有的是节前最后一个交易日
+    plan = planner.plan({ASHR: 'A'}, {ASHR: '2024-09-27'}, today='2024-10-03')
+    assert plan['trading_day'] is False
+    assert plan['expected'][ASHR] == pd.Timestamp('2024-09-30')
+    assert plan['due'] == {ASHR: 'A'}
+
+
+def test_plan_qdii_lag_and_behind(planner):
+    learn_qdii_lag(planner)
+    funds = {ASHR: 'A', QDII: 'Q'}
+    # 节后第一天：A 股理应有当天的；QDII 滞后一天，节前的就算最新
+    plan = planner.plan(funds, {ASHR: '2024-09-30', QDII: '2024-09-30'}, today='2024-10-08')
+    assert plan['trading_day'] is True
+    assert plan['expected'] == {ASHR: pd.Timestamp('2024-10-08'), QDII: pd.Timestamp('2024-09-30')}
+    assert plan['due'] == {ASHR: 'A'} and plan['fresh'] == [QDII]
+
+    plan = planner.plan(funds, {ASHR: '2024-10-08', QDII: '2024-09-30'}, today='2024-10-09')
+    assert plan['due'] == {ASHR: 'A', QDII: 'Q'}
+    # 抓完 A 股追上了、QDII 还没出 -> 只剩 QDII 留给补抓任务
+    late = FreshnessPlanner.behind(plan, {ASHR: '2024-10-09', QDII: '2024-09-30'})
+    assert late == {QDII: 'Q'}
+
+
+def test_late_roundtrip(planner, tmp_path):
+    path = str(tmp_path / 'late.json')
+    plan = {'expected': {QDII: pd.Timestamp('2024-10-08')}}
+    planner_mod.save_late({QDII: 'Q'}, plan, path)
+    assert planner_mod.load_late(path) == {QDII: 'Q'}
+    planner_mod.save_late({}, plan, path)
+    assert planner_mod.load_late(path) == {}
+
+
+def test_calendar_copy_roundtrip(planner, tmp_path):
+    path = str(tmp_path / 'trade_calendar.json')
+    planner_mod.save_calendar(planner.calendar, path, since='2024-09-20')
+    cal = planner_mod.load_calendar(path)
+    assert cal[0] == pd.Timestamp('2024-09-20') and cal[-1] == planner.calendar[-1]
+    assert pd.Timestamp('2024-09-30') in cal and pd.Timestamp('2024-10-01') not in cal
+    assert planner_mod.load_calendar(str(tmp_path / 'missing.json')) is None
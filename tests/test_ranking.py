@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from fund_matrix import PriceMatrix
+from ranking import MomentumRanker
+
+WEIGHTS = {5: 0.3, 20: 0.5, 60: 0.2}
+
+
+def make_matrix(n_funds=30, n_dates=80, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.cumprod(1 + rng.normal(0, 0.02, (n_funds, n_dates)), axis=1)
+    values[3, :30] = np.nan   # 新基金：历史不够 60 天
+    values[7, -1] = np.nan    # 最新一天没有净值
+    codes = [f"{i:06d}" for i in range(n_funds)]
+    return PriceMatrix(codes, pd.bdate_range('2024-01-02', periods=n_dates), values)
+
+
+def reference(matrix, weights):
+    """pandas 逐列 pct_change 的参照实现"""
+    frame = matrix.to_frame()
+    table = pd.DataFrame({f'mom_{h}d': frame.pct_change(h, fill_method=None).iloc[-1] * 100
+                          for h in sorted(weights)})
+    table['score'] = sum(table[f'mom_{h}d'] * w for h, w in weights.items())
+    return table
+
+
+def test_momentum_matches_pandas():
+    matrix = make_matrix()
+    table = MomentumRanker(WEIGHTS).rank(matrix)['table']
+    pd.testing.assert_frame_equal(table, reference(matrix, WEIGHTS), check_names=False, rtol=1e-12)
+    assert np.isnan(table.loc['000003', 'score']) and np.isnan(table.loc['000007', 'score'])
+
+
+def test_top_and_bottom_match_sort():
+    matrix = make_matrix()
+    out = MomentumRanker(WEIGHTS).rank(matrix, k=5)
+    ref = reference(matrix, WEIGHTS)['score'].dropna()
+    assert list(out['top'].index) == list(ref.sort_values(ascending=False, kind='stable').index[:5])
+    assert list(out['bottom'].index) == list(ref.sort_values(kind='stable').index[:5])
+
+
+def test_k_larger_than_valid_and_short_history():
+    matrix = make_matrix(n_funds=9, n_dates=70)
+    out = MomentumRanker(WEIGHTS).rank(matrix, k=10)
+    assert list(out['top'].index) == list(out['table']['score'].dropna().sort_values(ascending=False).index)
+    # 历史比最长周期还短：那一列全是 NaN，没人能上榜
+    short = MomentumRanker(WEIGHTS).rank(matrix.tail(30), k=3)
+    assert short['table']['mom_60d'].isna().all() and short['top'].empty
+
+
+def test_top_k_by_sector_matches_groupby():
+    matrix = make_matrix()
+    sectors = {c: ('A' if i % 3 else 'B') for i, c in enumerate(matrix.codes[:-5])}  # 最后 5 只归 "其他"
+    out = MomentumRanker(WEIGHTS).rank(matrix, k=3, sectors=sectors)
+    ref = reference(matrix, WEIGHTS)
+    ref['sector'] = [sectors.get(c, '其他') for c in ref.index]
+    expected = {name: list(g['score'].dropna().sort_values(ascending=False, kind='stable').index[:3])
+                for name, g in ref.groupby('sector')}
+    assert {name: list(t.index) for name, t in out['by_sector'].items()} == expected
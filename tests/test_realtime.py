@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+realtime = pytest.importorskip('realtime')  # realtime 依赖 akshare
+
+HOLIDAY = pd.date_range('2024-10-01', '2024-10-07')  # 国庆
+
+
+def make_daemon(calendar):
+    daemon = realtime.MonitorDaemon.__new__(realtime.MonitorDaemon)
+    daemon.calendar = calendar
+    return daemon
+
+
+def at(day, hh=10, mm=0):
+    return datetime.fromisoformat(f"{day} {hh:02d}:{mm:02d}").replace(tzinfo=realtime.MARKET_TZ)
+
+
+def test_in_session_follows_trade_calendar():
+    days = pd.bdate_range('2024-09-01', '2024-12-31')
+    daemon = make_daemon(days[~days.isin(HOLIDAY)])
+    assert daemon.in_session(at('2024-09-30'))
+    assert not daemon.in_session(at('2024-10-02'))   # 国庆周三：休市，不轮询
+    assert not daemon.in_session(at('2024-10-05'))   # 周六
+    assert daemon.in_session(at('2024-10-08', 13, 30))
+    assert not daemon.in_session(at('2024-10-08', 12, 0))  # 午休
+    assert not daemon.in_session(at('2024-10-08', 15, 0))
+
+
+def test_in_session_without_calendar_falls_back_to_weekdays():
+    for calendar in (None, pd.bdate_range('2024-01-01', '2024-06-28')):  # 没有副本 / 副本用到头了
+        daemon = make_daemon(calendar)
+        assert daemon.in_session(at('2024-10-02'))
+        assert not daemon.in_session(at('2024-10-05'))
+
+
+def test_run_skips_holiday(monkeypatch):
+    days = pd.bdate_range('2024-09-01', '2024-12-31')
+    daemon = make_daemon(days[~days.isin(HOLIDAY)])
+    daemon._stop = None
+    monkeypatch.setattr(realtime, 'datetime', type('FixedNow', (datetime,), {
+        'now': classmethod(lambda cls, tz=None: at('2024-10-02', 10))}))
+    monkeypatch.setattr(realtime.signal, 'signal', lambda *a: None)
+    monkeypatch.setattr(realtime.MonitorDaemon, 'warm_up', lambda self: pytest.fail("休市日不该预热"))
+    daemon.run()
@@ -0,0 +1,75 @@
+import os
+import re
+
+import numpy as np
+import pytest
+
+import report_builder
+from report_builder import ThumbnailCache, build_pages, _truncate
+
+
+def row(code, rsi, signal="☁️ 观望"):
+    return {'fund_code': code, 'nav_date': '2024-05-20', 'price': 1.0, 'rsi': rsi, 'signal_text': signal}
+
+
+def assert_well_formed(page):
+    # 没有被切开的标签：每个 '<' 后面都有对应的 '>'
+    assert page.count('<') == page.count('>')
+    for uri in re.findall(r"src='([^']*)'", page):
+        assert uri == FAKE_URI
+
+
+FAKE_URI = "data:image/png;base64," + "A" * 3000
+
+
+@pytest.fixture(autouse=True)
+def fake_thumbs(monkeypatch):
+    monkeypatch.setattr(report_builder, 'data_uri', lambda path: FAKE_URI)
+
+
+def test_oversized_block_is_cut_on_line_boundaries():
+    long_text = "\n".join(f"第 {i} 行 <b>要点</b> 说明文字" for i in range(400))
+    rows = {'A': row('A', 20, "💎 极度超卖"), 'B': row('B', 50)}
+    items = {'A': "短", 'B': long_text}
+    pages = build_pages(rows, items, {}, thumbs={'A': 'a.png', 'B': 'b.png'}, max_chars=4000, max_pages=3)
+    assert len(pages) == 2
+    for page in pages:
+        assert len(page) <= 4000
+        assert_well_formed(page)
+    assert FAKE_URI not in pages[1]           # 先丢图
+    assert pages[1].endswith("<br>……")        # 再按整行截
+    assert pages[1].startswith("第 0 行")
+
+
+def test_truncate_single_long_line_drops_partial_tag():
+    html = "x" * 95 + "<b>tail</b>"
+    out = _truncate(html, 100)
+    assert len(out) <= 100
+    assert_well_formed(out)
+
+
+def test_fitting_block_keeps_thumbnail():
+    rows = {'A': row('A', 20), 'B': row('B', 50)}
+    pages = build_pages(rows, {'A': "a", 'B': "b"}, {}, thumbs={'A': 'a.png', 'B': 'b.png'},
+                        max_chars=8000, max_pages=3)
+    assert all(len(p) <= 8000 for p in pages)
+    assert sum(p.count(FAKE_URI) for p in pages) == 2
+    for page in pages:
+        assert_well_formed(page)
+
+
+def payload(n=30, rsi_len=None):
+    x = np.linspace(1, 1.2, n)
+    return {'nav_value': x, 'upper': x + 0.05, 'lower': x - 0.05, 'rsi': np.full(rsi_len or n, 50.0)}
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_broken_chart_only_drops_its_thumbnail(tmp_path, workers):
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('PIL')
+    cache = ThumbnailCache(root=str(tmp_path / 'thumbs'), workers=workers)
+    # B 的 RSI 长度跟净值对不上，画图时会报错
+    paths = cache.render({'A': payload(), 'B': payload(rsi_len=5), 'C': payload(40)})
+    assert set(paths) == {'A', 'C'}
+    assert all(os.path.exists(p) for p in paths.values())
+    assert 'B' not in cache.index
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fund_matrix import PriceMatrix
+from risk_metrics import TRADING_DAYS, historical_var, max_drawdown, risk_table, rolling_mean_std
+
+
+def make_long(seed=0, n=300):
+    # A 每天有净值；B 是 QDII，国内交易日里零星休市 (NaN，不是 0%)；C 成立得晚
+    dates = pd.bdate_range('2023-01-02', periods=n)
+    rng = np.random.default_rng(seed)
+    rows = []
+    for code, keep in (('A', dates), ('B', dates[rng.random(n) > 0.1]), ('C', dates[120:])):
+        nav = np.cumprod(1 + rng.normal(0.0004, 0.015, len(keep)))
+        rows.append(pd.DataFrame({'fund_code': code, 'nav_date': keep, 'nav_value': nav}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def reference(long, level=0.95, window=60):
+    """pandas 逐只基金算的参照值 (收益按各自的净值日期)"""
+    rows = {}
+    for code, g in long.groupby('fund_code'):
+        s = g.set_index('nav_date')['nav_value'].sort_index()
+        r = s.pct_change().dropna()
+        dd = s / s.cummax() - 1
+        q = r.quantile(1 - level)
+        rows[code] = {
+            'sharpe': r.mean() / r.std() * np.sqrt(TRADING_DAYS),
+            'volatility': r.std() * np.sqrt(TRADING_DAYS) * 100,
+            'max_drawdown': dd.min() * 100,
+            'mdd_peak': s[:dd.idxmin()].idxmax(),
+            'mdd_trough': dd.idxmin(),
+            'var_hist': -q * 100,
+            'cvar_hist': -r[r <= q].mean() * 100,
+        }
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def test_risk_table_matches_pandas():
+    long = make_long()
+    matrix = PriceMatrix.from_long(long, ffill=False)
+    table = risk_table(matrix)
+    ref = reference(long)
+    for col in ('sharpe', 'volatility', 'max_drawdown', 'var_hist', 'cvar_hist'):
+        np.testing.assert_allclose(table[col], ref.loc[table.index, col], rtol=1e-9, err_msg=col)
+    for col in ('mdd_peak', 'mdd_trough'):
+        assert list(table[col]) == list(ref.loc[table.index, col]), col
+
+
+def test_drawdown_reference_values():
+    # 1.3 -> 0.65 是最深的一次：-50%，峰在第 4 列、谷在第 5 列；前面 1.2 -> 0.9 只有 -25%
+    prices = np.array([[1.0, 1.2, 0.9, 1.0, 1.3, 0.65, 0.8],
+                       [np.nan, np.nan, 2.0, 2.5, np.nan, 2.0, 3.0],
+                       [np.nan] * 7,
+                       [1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6]])
+    mdd, peak, trough = max_drawdown(prices)
+    np.testing.assert_allclose(mdd[[0, 1, 3]], [-0.5, -0.2, 0.0])
+    assert np.isnan(mdd[2])
+    assert list(peak) == [4, 3, -1, 0] and list(trough) == [5, 5, -1, 0]
+
+
+def test_historical_var_reference_values():
+    # 20 个收益 -1% ... -20% 打乱：5% 分位 = 第 0.95 个位置线性插值 = -19.05%，CVaR = 最差那一天 -20%
+    rets = -np.arange(1, 21) / 100.0
+    rng = np.random.default_rng(4)
+    row = rng.permutation(rets)
+    var, cvar = historical_var(np.vstack([row, np.r_[row[:10], [np.nan] * 10]]), 0.95)
+    assert var[0] == pytest.approx(0.1905) and cvar[0] == pytest.approx(0.20)
+    half = pd.Series(row[:10])
+    assert var[1] == pytest.approx(-half.quantile(0.05))
+    assert cvar[1] == pytest.approx(-half[half <= half.quantile(0.05)].mean())
+
+
+def test_rolling_mean_std_matches_pandas():
+    long = make_long()
+    rets = PriceMatrix.from_long(long, ffill=False).own_returns()
+    mean, std = rolling_mean_std(rets, 20)
+    assert np.isnan(mean[:, :19]).all()  # 不满一个窗口的不算
+    # 满窗口之后：有效样本过半才出数，跟 pandas 的 min_periods=10 一样
+    roll = pd.DataFrame(rets.T).rolling(20, min_periods=10)
+    np.testing.assert_allclose(mean[:, 19:].T, roll.mean().to_numpy()[19:], rtol=1e-9, atol=1e-15, equal_nan=True)
+    np.testing.assert_allclose(std[:, 19:].T, roll.std().to_numpy()[19:], rtol=1e-6, atol=1e-12, equal_nan=True)
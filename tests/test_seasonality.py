@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from seasonality import seasonality_table, upcoming_windows
+
+
+def make_planner(calendar):
+    FreshnessPlanner = pytest.importorskip('planner').FreshnessPlanner  # planner 依赖 akshare
+    planner = FreshnessPlanner.__new__(FreshnessPlanner)
+    planner.calendar = pd.DatetimeIndex(calendar)
+    return planner
+
+
+def test_december_second_half_matches_notebook_split():
+    # 15 号算下半月 (notebook: day >= 15)；区间收益 = 14 号净值 -> 月底最后一个净值
+    dates = pd.bdate_range('2023-12-01', '2023-12-29')
+    nav = pd.Series(np.linspace(1.0, 1.2, len(dates)), index=dates)
+    long = pd.DataFrame({'fund_code': '512880', 'nav_date': dates, 'nav_value': nav.to_numpy()})
+    table = seasonality_table(long).set_index('cal_window')
+    expected = (nav.iloc[-1] / nav[:'2023-12-14'].iloc[-1] - 1) * 100
+    assert np.isclose(table.loc['12月下半月', 'mean_ret'], expected)
+    assert upcoming_windows('2023-12-15', 10)[0] == '12月下半月'
+    assert upcoming_windows('2023-12-14', 11)[0] == '12月上半月'
+
+
+def test_month_end_uses_trade_calendar():
+    # 2024-09-30 是交易日，之后国庆休市：9/27 是倒数第二个交易日
+    cal = [d for d in pd.bdate_range('2024-09-01', '2024-10-31') if not ('2024-10-01' <= str(d.date()) <= '2024-10-07')]
+    planner = make_planner(cal)
+    assert planner.next_trading_day('2024-09-30') == pd.Timestamp('2024-10-08')
+    assert planner.days_left_in_month('2024-09-27') == 2
+    assert '月末' in upcoming_windows('2024-09-27', planner.days_left_in_month('2024-09-27'))
+    # 10 月最后两个交易日按日历是 30、31 号；8 号起还剩 18 个交易日，不是月末
+    assert '月末' not in upcoming_windows('2024-10-08', planner.days_left_in_month('2024-10-08'))
+
+
+def test_stats_do_not_depend_on_batch():
+    # 交易日历：工作日去掉国庆；稀疏基金 (QDII 类) 只有一部分交易日有净值
+    cal = pd.DatetimeIndex([d for d in pd.bdate_range('2020-01-01', '2023-12-31')
+                            if not (d.month == 10 and d.day <= 7)])
+    rng = np.random.default_rng(3)
+    sparse_days = cal[rng.random(len(cal)) < 0.4]
+    sparse = pd.DataFrame({'fund_code': 'QDII', 'nav_date': sparse_days,
+                           'nav_value': np.cumprod(1 + rng.normal(0, 0.01, len(sparse_days)))})
+    dense = pd.DataFrame({'fund_code': 'ASHR', 'nav_date': cal,
+                          'nav_value': np.cumprod(1 + rng.normal(0, 0.01, len(cal)))})
+
+    alone = seasonality_table(sparse, cal).set_index('cal_window')
+    batch = seasonality_table(pd.concat([sparse, dense]), cal)
+    batch = batch[batch['fund_code'] == 'QDII'].set_index('cal_window')
+    pd.testing.assert_frame_equal(alone.sort_index(), batch.sort_index())
+    # 自己缺净值的日子不算节假日：节前只有真正的节前 (每年国庆前一天，有净值的那几年)
+    assert alone['n'].get('节前', 0) <= 4
+    assert seasonality_table(sparse).set_index('cal_window').loc['节前', 'n'] > 50  # 旧做法：缺净值被当成节假日
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy_lang import positions, run_strategy, equity_curves
+
+
+def reference_positions(buy, sell):
+    """原来 backtest.py 的逐日循环：if buy and cash>0 … elif sell and share>0"""
+    out = np.zeros(len(buy))
+    held = False
+    for i in range(len(buy)):
+        if buy[i] and not held:
+            held = True
+        elif sell[i] and held:
+            held = False
+        out[i] = held
+    return out
+
+
+def reference_backtest(nav, cash=1000.0):
+    """原来 Backtest.prepare_data + run：算 RSI、dropna，再逐日全仓买卖"""
+    df = pd.DataFrame({'nav_value': nav})
+    change = df['nav_value'].diff()
+    avg_gain = change.clip(lower=0).ewm(alpha=1/14, adjust=False).mean()
+    avg_loss = change.clip(upper=0).abs().ewm(alpha=1/14, adjust=False).mean()
+    df['rsi'] = 100 - (100 / (1 + avg_gain / avg_loss))
+    df = df.dropna()
+    share, values = 0.0, []
+    for price, rsi in zip(df['nav_value'], df['rsi']):
+        if rsi < 30 and cash > 0:
+            share, cash = cash / price, 0
+        elif rsi > 70 and share > 0:
+            cash, share = share * price, 0
+        values.append(cash + share * price)
+    return np.array(values)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_positions_match_reference_loop(seed):
+    rng = np.random.default_rng(seed)
+    buy = rng.random((3, 200)) < 0.2
+    sell = rng.random((3, 200)) < 0.2
+    pos = positions(buy, sell)
+    for i in range(3):
+        np.testing.assert_array_equal(pos[i], reference_positions(buy[i], sell[i]))
+
+
+def test_both_signals_flip_state():
+    buy = np.array([[1, 1, 0, 1, 1, 0, 0]], dtype=bool)
+    sell = np.array([[0, 1, 0, 1, 1, 1, 1]], dtype=bool)
+    # 空仓买入 -> 持仓时都触发 = 卖出 -> 空仓时都触发 = 买入 -> 再卖出 -> 只有卖点空仓不动
+    np.testing.assert_array_equal(positions(buy, sell)[0], [1, 0, 0, 1, 0, 0, 0])
+
+
+def test_sell_without_position_is_ignored():
+    buy = np.array([[0, 0, 1, 0]], dtype=bool)
+    sell = np.array([[1, 1, 0, 0]], dtype=bool)
+    np.testing.assert_array_equal(positions(buy, sell)[0], [0, 0, 1, 1])
+
+
+def test_backtest_matches_reference_loop():
+    rng = np.random.default_rng(7)
+    nav = np.cumprod(1 + rng.normal(0, 0.02, 600)) + 0.5
+    expected = reference_backtest(nav)
+
+    # Backtest.run 的做法：整段算信号，丢掉第一行再算资金曲线
+    result = run_strategy("buy: rsi(14) < 30; sell: rsi(14) > 70", nav)
+    equity = 1000 * equity_curves(nav[1:], result['position'][:, 1:])[0]
+    assert len(equity) == len(expected)
+    np.testing.assert_allclose(equity, expected, rtol=1e-9)
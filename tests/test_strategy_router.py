@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy_router import StrategyRouter
+
+
+def sector_names(router, codes, names, categories=None):
+    return [router.sectors[i] for i in router.assign_sectors(codes, names, categories)]
+
+
+def test_category_routes_fund_without_keyword():
+    router = StrategyRouter()
+    codes = ['000001', '000002', '000003']
+    names = ['易方达全球成长精选', '某某海外指数', '某某稳健债券']
+    cats = {'000001': 'QDII-普通股票', '000002': '指数型-海外股票', '000003': '债券型-长债'}
+    assert sector_names(router, codes, names, cats) == ['美股', '美股', '其他']
+    # 没有类别数据时只能靠名称关键字：这几只名字里都没有 "纳"/"标普"
+    assert sector_names(router, codes, names) == ['其他', '其他', '其他']
+
+
+def test_category_beats_keyword_and_keyword_is_fallback():
+    router = StrategyRouter()
+    codes = ['000004', '012363', '006479']
+    names = ['广发全球科技', '国泰证券', '广发纳指100']
+    # QDII 科技基金按类别进美股，不会被名字里的 "科技" 抢走；A 股指数基金对不上类别，按关键字进券商
+    cats = {'000004': 'QDII-普通股票', '012363': '指数型-股票'}
+    assert sector_names(router, codes, names, cats) == ['美股', '券商', '美股']
+
+
+def test_route_uses_category_sector_rules():
+    router = StrategyRouter()
+    ids = router.assign_sectors(['000001'], ['易方达全球成长精选'], {'000001': 'QDII-普通股票'})
+    actions, _, sectors = router.route(ids, [0.5], [28.0])
+    assert sectors[0] == '美股' and '罕见机会' in actions[0]
+
+
+def test_save_categories_keeps_full_fund_type(tmp_path):
+    fund_meta = pytest.importorskip('fund_meta')  # fund_meta 依赖 akshare
+    meta = pd.DataFrame({'fund_code': ['000001', '000002', '000003'],
+                         'fund_type': ['QDII-普通股票', '', None],
+                         'category': ['QDII', '混合型', np.nan]})
+    path = str(tmp_path / 'c.json')
+    assert fund_meta.save_categories(meta, ['000001', '000002', '000003'], path) == 2
+    assert fund_meta.load_categories(path) == {'000001': 'QDII-普通股票', '000002': '混合型'}
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from walk_forward import WalkForward, make_folds
+
+TRAIN, TEST = 80, 30
+GRID = {'n': [6, 14], 'lo': [30, 40], 'hi': [60, 70]}
+
+
+def make_series(seed, n=320):
+    rng = np.random.default_rng(seed)
+    prices = 1.0 * np.cumprod(1 + rng.normal(0.0003, 0.012, n))
+    return pd.DataFrame({'nav_date': pd.bdate_range('2022-01-03', periods=n), 'nav_value': prices})
+
+
+def run(series):
+    return WalkForward(grid=GRID, train=TRAIN, test=TEST, workers=2).run(series)
+
+
+def test_folds_do_not_overlap():
+    folds = make_folds(320, TRAIN, TEST)
+    assert folds[0] == (0, TRAIN, TRAIN + TEST)
+    for (s, tr, te), nxt in zip(folds, folds[1:] + [None]):
+        assert tr - s == TRAIN and te - tr == TEST
+        if nxt is not None:
+            assert nxt[1] == te  # 下一段测试窗接着上一段，样本外曲线不重不漏
+    assert folds[-1][2] <= 320
+
+
+def test_oos_params_come_only_from_train_window():
+    # 把某个切点之后的净值整个换掉：切点前训练完的窗口，挑出来的参数和训练分一点都不能变
+    base = make_series(7)
+    cut = TRAIN + 2 * TEST  # 第 3 个窗口的训练窗正好截止在这里
+    shocked = base.copy()
+    tail = make_series(99)['nav_value'].to_numpy()[cut:]
+    shocked.loc[cut:, 'nav_value'] = shocked['nav_value'].iloc[cut - 1] * tail / tail[0] * 1.3
+
+    a = run({'A': base, 'B': shocked})
+    fa, fb = a['A']['folds'], a['B']['folds']
+    assert len(fa) == len(fb) == len(make_folds(len(base), TRAIN, TEST))
+
+    before = fa['test_from'] <= base['nav_date'][cut]
+    assert before.sum() == 3
+    cols = ['train_from', 'test_from', 'params', 'train_score']
+    pd.testing.assert_frame_equal(fa.loc[before, cols], fb.loc[before, cols])
+    # 测试窗整个在切点前的，样本外收益也一样；跨过切点的那一段只有收益会变
+    done = fa['test_to'] < base['nav_date'][cut]
+    assert np.allclose(fa.loc[done, 'test_return'], fb.loc[done, 'test_return'])
+    assert (fa['test_return'] != fb['test_return']).any()
+
+
+def test_oos_equity_covers_test_windows_only():
+    series = make_series(3)
+    r = run({'A': series})['A']
+    folds = r['folds']
+    first_test = series['nav_date'][TRAIN]
+    assert r['oos_equity'].index[0] == first_test  # 第一个训练窗不进样本外曲线
+    assert r['oos_equity'].index.is_monotonic_increasing and r['oos_equity'].index.is_unique
+    assert len(r['oos_equity']) == len(folds) * TEST
+    assert r['oos_equity'].index.equals(r['hold_equity'].index)
@@ -0,0 +1,90 @@
+# volume_price.py
+# --- 量价雷达：用库里的 ETF 日线算 OBV 和量价背离，不用每次在 notebook 里现抓 ---
+# 联接基金没有成交量，所以看它背后的场内 ETF (对应关系在 config.FUND_ETF_MAP)。
+# 所有 ETF 拼成 代码×日期 矩阵，OBV 一次 cumsum 算完。
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+TREND_NAMES = {1: '涨', -1: '跌', 0: '平'}
+
+# 联接基金 -> 场内 ETF (联接基金本身没有成交量)，可在 config.FUND_ETF_MAP 覆盖
+DEFAULT_FUND_ETF_MAP = {
+    '012363': '512880',  # 国泰证券联接 -> 证券ETF
+}
+
+
+def load_etf_bars(engine, symbols, start_date=None):
+    """从 etf_daily_bar 读收盘价和成交量 (一次 SQL)"""
+    sql = "SELECT symbol, bar_date, close, volume FROM etf_daily_bar WHERE symbol IN :symbols"
+    params = {'symbols': list(symbols)}
+    if start_date is not None:
+        sql += " AND bar_date >= :start"
+        params['start'] = pd.Timestamp(start_date).date()
+    sql += " ORDER BY symbol, bar_date"
+    stmt = text(sql).bindparams(bindparam('symbols', expanding=True))
+    with engine.connect() as conn:
+        df = pd.read_sql(stmt, conn, params=params)
+    df['bar_date'] = pd.to_datetime(df['bar_date'])
+    df['close'] = pd.to_numeric(df['close'])
+    df['volume'] = pd.to_numeric(df['volume'])
+    return df
+
+
+def obv(close, volume):
+    """
+    OBV 矩阵 (代码 × 日期)：涨的日子加成交量，跌的日子减，平的不动
+    停牌 (NaN) 当天按不动处理
+    """
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.nan_to_num(np.asarray(volume, dtype=np.float64))
+    direction = np.zeros_like(close)
+    direction[:, 1:] = np.nan_to_num(np.sign(np.diff(close, axis=1)))
+    return np.cumsum(direction * volume, axis=1)
+
+
+def _last_valid(values):
+    """每行最后一个非 NaN 的位置"""
+    valid = ~np.isnan(values)
+    return values.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+
+
+def divergence(close, obv_values, lookback=20):
+    """
+    近 lookback 天的价格趋势 vs 资金趋势 (跟 obv_analysis.ipynb 的判定一致)
+    返回 (价格趋势, OBV 趋势, 背离) 三个数组：趋势取 1/-1/0；背离 'top' 顶背离 / 'bottom' 底背离 / '' 无
+    """
+    close = np.asarray(close, dtype=np.float64)
+    end = _last_valid(close)
+    start = np.maximum(end - (lookback - 1), 0)
+    rows = np.arange(close.shape[0])
+    price_trend = np.sign(close[rows, end] - close[rows, start]).astype(int)
+    obv_trend = np.sign(obv_values[rows, end] - obv_values[rows, start]).astype(int)
+    div = np.where((price_trend > 0) & (obv_trend < 0), 'top',
+                   np.where((price_trend < 0) & (obv_trend > 0), 'bottom', ''))
+    return price_trend, obv_trend, div
+
+
+def obv_table(bars, lookback=20):
+    """每个 ETF 一行：最新 OBV、价格/资金趋势、背离"""
+    close = bars.pivot(index='symbol', columns='bar_date', values='close').sort_index(axis=1)
+    volume = bars.pivot(index='symbol', columns='bar_date', values='volume').reindex_like(close)
+    values = obv(close.to_numpy(), volume.to_numpy())
+    price_trend, obv_trend, div = divergence(close.to_numpy(), values, lookback)
+    return pd.DataFrame({
+        'obv': values[:, -1],
+        'price_trend': price_trend,
+        'obv_trend': obv_trend,
+        'divergence': div,
+    }, index=close.index)
+
+
+def format_obv_line(symbol, row):
+    """日报用的一行"""
+    msg = f"🌊 量价({symbol}): 价格{TREND_NAMES[row['price_trend']]} / 资金{TREND_NAMES[row['obv_trend']]}"
+    if row['divergence'] == 'top':
+        msg += " 🚨 顶背离 (价涨钱跑)"
+    elif row['divergence'] == 'bottom':
+        msg += " 💎 底背离 (价跌钱进)"
+    return msg
@@ -0,0 +1,242 @@
+# walk_forward.py
+# --- 滚动前推 (walk-forward)：训练窗里挑参数，紧接着的测试窗里验货，只看样本外的成绩 ---
+# Backtest.run 是整段历史一套参数，"策略有效" 全是样本内的结论；这里把历史切成一段段
+# [训练 | 测试]，每段在训练窗上从参数网格里挑最好的，再拿去跑下一段测试窗，样本外曲线首尾拼起来。
+# 多只基金用进程池并行；净值放在共享内存里，子进程直接映射只读数组，任务本身只传几个整数。
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from fund_matrix import load_nav_long
+from nav_export import EXPORT_DIR, scan
+from strategy_lang import Strategy, StrategySyntaxError, positions
+
+TRADING_DAYS = 252
+
+# 默认参数网格：RSI 周期 × 超卖线 × 超买线
+DEFAULT_TEMPLATE = "buy: rsi({n}) < {lo}; sell: rsi({n}) > {hi}"
+DEFAULT_GRID = {'n': [6, 14, 21], 'lo': [25, 30, 35, 40], 'hi': [60, 65, 70, 75]}
+
+
+def expand_grid(template, grid):
+    """模板 + 参数网格 -> {参数名: 规则文本}"""
+    keys = list(grid)
+    variants = {}
+    for combo in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, combo))
+        name = ",".join(f"{k}={v}" for k, v in params.items())
+        variants[name] = template.format(**params)
+    return variants
+
+
+def make_folds(length, train=504, test=126, step=None):
+    """
+    切窗口：[(train_start, train_end, test_end)]，区间左闭右开，测试窗紧跟训练窗
+    step 默认 = test，测试窗首尾相接不重叠，方便拼样本外曲线
+    """
+    step = step or test
+    folds = []
+    start = 0
+    while start + train + test <= length:
+        folds.append((start, start + train, start + train + test))
+        start += step
+    return folds
+
+
+def _score(ret, objective):
+    """一段日收益 (变体 × 天) 的得分"""
+    if objective == 'return':
+        return np.prod(1 + ret, axis=1) - 1
+    if objective == 'sharpe':
+        sd = ret.std(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = ret.mean(axis=1) / sd * np.sqrt(TRADING_DAYS)
+        return np.where(sd > 0, s, -np.inf)
+    raise ValueError(f"未知的优化目标: {objective}")
+
+
+# --- 子进程 ---
+
+_W = {}
+
+
+def _attach(shm_name, shape, variants):
+    """子进程初始化：映射共享内存里的净值矩阵，编译一次全部参数变体"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _W['shm'] = shm  # 留着引用，防止被回收
+    _W['nav'] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _W['names'] = list(variants)
+    merged = {}
+    for name, text in variants.items():
+        for rule, expr in Strategy._split_rules(text).items():
+            merged[f"{name}/{rule}"] = expr
+    _W['program'] = Strategy(merged)
+
+
+def _variant_returns(prices):
+    """
+    一只基金、所有变体的策略日收益 (变体 × 天)
+    信号只用到当天及以前的数据，所以整段算一次、各个窗口切片，跟每个窗口单独重算结果一样
+    """
+    signals = _W['program'].evaluate(prices[None, :])
+    names = _W['names']
+    buy = np.vstack([signals[f"{n}/buy"] for n in names])
+    no_sell = np.zeros_like(buy)
+    sell = np.vstack([signals[f"{n}/sell"] if f"{n}/sell" in signals else no_sell[:1] for n in names])
+    pos = positions(buy, sell)
+
+    ret = np.zeros(len(prices))
+    ret[1:] = prices[1:] / prices[:-1] - 1
+    held = np.zeros_like(pos)
+    held[:, 1:] = pos[:, :-1]
+    return held * ret[None, :], ret
+
+
+def _run_fund(task):
+    """一只基金的全部窗口 (同一只基金的窗口共用一次信号计算)"""
+    row, length, folds, objective = task
+    prices = np.array(_W['nav'][row, :length])  # 拷一份这只基金自己的，几 KB
+    strat, hold = _variant_returns(prices)
+
+    records, oos = [], []
+    for train_start, train_end, test_end in folds:
+        scores = _score(strat[:, train_start:train_end], objective)
+        best = int(np.argmax(scores))
+        test_ret = strat[best, train_end:test_end]
+        records.append({
+            'train_start': train_start, 'train_end': train_end, 'test_end': test_end,
+            'params': _W['names'][best],
+            'train_score': float(scores[best]),
+            'test_return': float(np.prod(1 + test_ret) - 1),
+            'hold_return': float(np.prod(1 + hold[train_end:test_end]) - 1),
+        })
+        oos.append(test_ret)
+    return row, records, np.concatenate(oos) if oos else np.empty(0)
+
+
+# --- 主进程 ---
+
+class WalkForward:
+    def __init__(self, template=DEFAULT_TEMPLATE, grid=None, train=504, test=126, step=None,
+                 objective='sharpe', workers=None):
+        """
+        template / grid: 参数化的策略文本和参数网格 (见 expand_grid)
+        train / test / step: 训练窗、测试窗、步长 (交易日)
+        objective: 训练窗上挑参数的标准，'sharpe' 或 'return'
+        """
+        self.variants = expand_grid(template, grid or DEFAULT_GRID)
+        # 先在主进程里编译一遍，语法错误当场报出来，别等到子进程里
+        rules = Strategy._split_rules(template.format(**{k: v[0] for k, v in (grid or DEFAULT_GRID).items()}))
+        if 'buy' not in rules:
+            raise StrategySyntaxError("模板里至少要有一条 buy 规则")
+        Strategy(rules)
+        self.train, self.test, self.step = train, test, step
+        self.objective = objective
+        self.workers = workers or os.cpu_count()
+
+    def run(self, series):
+        """
+        series: {基金代码: DataFrame(nav_date, nav_value)}，每只基金用自己的交易日
+        返回 {基金代码: {'folds': DataFrame, 'oos_equity': Series, 'hold_equity': Series}}
+        """
+        codes = [c for c, df in series.items() if len(df) >= self.train + self.test]
+        if not codes:
+            return {}
+        lengths = [len(series[c]) for c in codes]
+        shape = (len(codes), max(lengths))
+
+        # 净值矩阵只写一次共享内存，子进程按行号取，不用每个任务 pickle 一遍 DataFrame
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+        try:
+            nav = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            nav[:] = np.nan
+            for i, c in enumerate(codes):
+                nav[i, :lengths[i]] = series[c]['nav_value'].to_numpy(dtype=np.float64)
+
+            tasks = [(i, lengths[i], make_folds(lengths[i], self.train, self.test, self.step), self.objective)
+                     for i in range(len(codes))]
+            n_folds = sum(len(t[2]) for t in tasks)
+            print(f"🧪 Walk-forward: {len(codes)} 只基金 × {n_folds} 个窗口 × {len(self.variants)} 组参数，"
+                  f"{self.workers} 个进程")
+
+            results = {}
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_attach,
+                                     initargs=(shm.name, shape, self.variants)) as pool:
+                for row, records, oos in pool.map(_run_fund, tasks):
+                    results[codes[row]] = self._assemble(series[codes[row]], records, oos)
+            del nav
+        finally:
+            shm.close()
+            shm.unlink()
+        return results
+
+    @staticmethod
+    def _assemble(df, records, oos):
+        dates = df['nav_date'].reset_index(drop=True)
+        folds = pd.DataFrame(records)
+        folds['train_from'] = dates[folds['train_start']].values
+        folds['test_from'] = dates[folds['train_end']].values
+        folds['test_to'] = dates[folds['test_end'] - 1].values
+        folds['excess'] = folds['test_return'] - folds['hold_return']
+
+        oos_index = pd.DatetimeIndex(np.concatenate(
+            [dates[a:b].values for a, b in zip(folds['train_end'], folds['test_end'])]))
+        prices = df['nav_value'].to_numpy(dtype=np.float64)
+        hold_ret = np.concatenate([prices[a:b] / prices[a - 1:b - 1] - 1
+                                   for a, b in zip(folds['train_end'], folds['test_end'])])
+        return {
+            'folds': folds[['train_from', 'test_from', 'test_to', 'params', 'train_score',
+                            'test_return', 'hold_return', 'excess']],
+            'oos_equity': pd.Series(np.cumprod(1 + oos), index=oos_index),
+            'hold_equity': pd.Series(np.cumprod(1 + hold_ret), index=oos_index),
+        }
+
+
+def summarize(results):
+    """每只基金一行：样本外总收益、同期死拿、窗口胜率、最常被选中的参数"""
+    rows = {}
+    for code, r in results.items():
+        folds = r['folds']
+        rows[code] = {
+            'folds': len(folds),
+            'oos_return%': (r['oos_equity'].iloc[-1] - 1) * 100,
+            'hold_return%': (r['hold_equity'].iloc[-1] - 1) * 100,
+            'fold_win_rate': (folds['excess'] > 0).mean(),
+            'top_params': folds['params'].mode().iloc[0],
+        }
+    table = pd.DataFrame.from_dict(rows, orient='index')
+    if not table.empty:
+        table['excess%'] = table['oos_return%'] - table['hold_return%']
+    return table
+
+
+def _split_series(hist):
+    return {code: g[['nav_date', 'nav_value']].dropna().reset_index(drop=True)
+            for code, g in hist.groupby('fund_code')}
+
+
+def walk_forward_db(engine, codes, **kwargs):
+    """从数据库读净值 (一次 SQL)，对一批基金跑 walk-forward"""
+    return WalkForward(**kwargs).run(_split_series(load_nav_long(engine, codes)))
+
+
+def walk_forward_files(codes, root=EXPORT_DIR, **kwargs):
+    """从 nav_export 导出的本地文件读净值 (不连库)，对一批基金跑 walk-forward"""
+    return WalkForward(**kwargs).run(_split_series(scan(root, codes)))
+
+
+if __name__ == "__main__":
+    from backtest import Backtest
+    from watchlist import union_funds
+
+    funds = union_funds()
+    engine = Backtest(next(iter(funds))).engine  # 借用回测里的数据库连接
+    results = walk_forward_db(engine, list(funds))
+    table = summarize(results)
+    table.insert(0, 'name', [funds.get(c, c) for c in table.index])
+    print(table.round(2))
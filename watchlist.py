@@ -0,0 +1,70 @@
+# watchlist.py
+# --- 多份自选：每个订阅人一份基金清单 + 自己的推送 token ---
+# config.WATCHLISTS 里写多份清单；抓取、分析、估值只对所有清单的并集跑一次，
+# 算完再按清单把各自的那几行拼成报告，用各自的 token 推送。成本只跟不重复的基金数有关，跟订阅人数无关。
+# 没配 WATCHLISTS 时，就是 MY_FUNDS + PUSH_CONFIG 这一份 (跟以前一样)。
+#
+# 配置示例：
+# WATCHLISTS = {
+#     'me':   {'funds': {'012363': '国泰证券', '006479': '广发纳指100'}, 'token': 'xxx'},
+#     'mom':  {'funds': {'006479': '广发纳指100'}, 'token': 'yyy', 'label': '妈妈'},
+# }
+
+import config
+
+
+def load_watchlists():
+    """
+    返回 {清单名: {'funds': {代码: 名称}, 'token': ..., 'label': ...}}
+    token 没写的用 PUSH_CONFIG 里的；label 会加在推送标题后面，方便区分是谁的清单
+    """
+    default_token = getattr(config, 'PUSH_CONFIG', {}).get('token')
+    lists = getattr(config, 'WATCHLISTS', None)
+    if not lists:
+        return {'default': {'funds': dict(getattr(config, 'MY_FUNDS', {})), 'token': default_token, 'label': None}}
+    return {
+        name: {
+            'funds': dict(wl.get('funds', {})),
+            'token': wl.get('token') or default_token,
+            'label': wl.get('label'),
+        }
+        for name, wl in lists.items()
+    }
+
+
+def union_funds(watchlists=None):
+    """所有清单的并集 {代码: 名称}，按第一次出现的顺序；同一只基金名字写得不一样时以先出现的为准"""
+    watchlists = watchlists if watchlists is not None else load_watchlists()
+    funds = {}
+    for wl in watchlists.values():
+        for code, name in wl['funds'].items():
+            funds.setdefault(code, name)
+    return funds
+
+
+def fan_out(watchlists, render, title, send):
+    """
+    按清单分发：render(清单) 用已经算好的结果拼出这份清单的内容 (没有内容返回空)，用各自的 token 发
+    render 也可以返回一个页列表 (report_builder.build_pages)，多页时标题后面加 (1/3) 这样的页码
+    send: send_wechat 之类 (title, content, token)
+    返回 {清单名: send 的返回值 (多页时是列表)}，没有内容的清单不推
+    """
+    sent = {}
+    for name, wl in watchlists.items():
+        content = render(wl)
+        if not content:
+            continue
+        full_title = f"{title} ({wl['label']})" if wl['label'] else title
+        if isinstance(content, str):
+            sent[name] = send(full_title, content, wl['token'])
+        elif len(content) == 1:
+            sent[name] = [send(full_title, content[0], wl['token'])]
+        else:
+            sent[name] = [send(f"{full_title} ({i}/{len(content)})", page, wl['token'])
+                          for i, page in enumerate(content, 1)]
+    return sent
+
+
+def pick(per_fund, wl, joiner="<br><br>"):
+    """per_fund {基金代码: 一段内容} 里挑出这份清单关注的，按清单顺序拼起来"""
+    return joiner.join(per_fund[c] for c in wl['funds'] if c in per_fund)